@@ -0,0 +1,95 @@
+"""
+Startup-time benchmark for the command-line tool.
+
+Times `python src/app_cli.py --help` and a minimal one-target recipe run
+(against a warm parsed-stocks cache), each in a fresh interpreter.
+
+    python benchmarks/bench_startup.py --runs 20
+    python benchmarks/bench_startup.py --max-help-ms 150 --max-compute-ms 250
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_CLI = os.path.join(ROOT, "src", "app_cli.py")
+
+
+def _write_workbook(path: str) -> None:
+    import pandas as pd
+
+    pd.DataFrame(
+        [
+            {"name": "Tris-HCl", "type": "stock_solution", "concentration_value": 1, "concentration_unit": "M"},
+            {"name": "NaCl", "type": "powder", "mw_g_per_mol": 58.44},
+        ]
+    ).to_excel(path, sheet_name="stocks", index=False)
+
+
+def _time_command(cmd: List[str], runs: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return {
+        "runs": runs,
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "max_ms": max(samples),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark app_cli startup time")
+    p.add_argument("--runs", type=int, default=10, help="Runs per command (default 10)")
+    p.add_argument("--json", default="", help="Write results to this JSON file (optional)")
+    p.add_argument("--max-help-ms", type=float, default=0.0, help="Fail if median --help time exceeds this")
+    p.add_argument("--max-compute-ms", type=float, default=0.0, help="Fail if median compute time exceeds this")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stocks = os.path.join(tmp, "stocks.xlsx")
+        cache_dir = os.path.join(tmp, "cache")
+        _write_workbook(stocks)
+
+        help_cmd = [sys.executable, APP_CLI, "--help"]
+        compute_cmd = [
+            sys.executable, APP_CLI,
+            "--stocks", stocks,
+            "--cache-dir", cache_dir,
+            "--final-volume", "100",
+            "--target", "NaCl,150,mM",
+        ]
+        # Warm the parsed-stocks cache so the compute run measures startup, not Excel parsing
+        subprocess.run(compute_cmd, check=True, stdout=subprocess.DEVNULL)
+
+        results = {
+            "help": _time_command(help_cmd, args.runs),
+            "compute": _time_command(compute_cmd, args.runs),
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    for key, limit in (("help", args.max_help_ms), ("compute", args.max_compute_ms)):
+        if limit and results[key]["median_ms"] > limit:
+            print(f"REGRESSION: {key} median {results[key]['median_ms']:.1f} ms > {limit:g} ms", file=sys.stderr)
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Speed benchmarks for calculator, units, fuzzy_match, bulk_match, stocks_io,
+columnar_store and export.
+
+    python benchmarks/bench_suite.py --sizes 100,1000,10000 --out bench.json
+    python benchmarks/bench_suite.py --sizes 100,1000,10000,100000 --save-baseline baseline.json
+    python benchmarks/bench_suite.py --compare baseline.json --threshold 0.25
+
+Results are JSON: {"meta": {...}, "results": {"<bench>[n=<size>]": {"median_s", "min_s", "repeat"}}}.
+--compare exits with status 1 when any benchmark's median is slower than the
+baseline by more than --threshold (a fraction, 0.25 = 25%).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_catalog, make_target_sets, write_catalog_xlsx  # noqa: E402
+
+import units  # noqa: E402
+from stocks_io import read_stocks_xlsx, stocks_to_dict  # noqa: E402
+from calculator import compute_recipe  # noqa: E402
+from batch_calculator import compute_recipes_batch  # noqa: E402
+from fuzzy_match import CandidateIndex, best_match, top_matches  # noqa: E402
+from bulk_match import BulkMatcher  # noqa: E402
+from columnar_store import ColumnarStockStore, write_columnar  # noqa: E402
+from export import export_recipe_csv  # noqa: E402
+
+Result = Dict[str, float]
+
+QUERIES = ["tris ph 8", "nacl", "glycrol", "triton x100", "guanidine hcl", "imidazol", "hepes 7.5", "edta"]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Result:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "repeat": repeat}
+
+
+def bench_units(calls: int) -> Callable[[], object]:
+    conversions = [
+        (units.to_liters, "mL"), (units.from_liters, "uL"), (units.to_grams, "mg"),
+        (units.from_grams, "ug"), (units.molar_to_M, "mM"), (units.massvol_to_g_per_L, "mg/mL"),
+        (units.volvol_to_fraction, "%"), (units.parse_concentration, "µM"),
+    ]
+
+    def run():
+        for i in range(calls):
+            fn, unit = conversions[i % len(conversions)]
+            fn(1.5, unit)
+    return run
+
+
+def run_suite(sizes: List[int], repeat: int, max_xlsx: int, max_linear: int) -> Dict[str, Result]:
+    results: Dict[str, Result] = {}
+
+    def record(name: str, size: int, fn: Callable[[], object], rep: int = repeat) -> None:
+        key = f"{name}[n={size}]"
+        results[key] = measure(fn, rep)
+        print(f"{key:45s} median {results[key]['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+
+    record("units.convert", 100_000, bench_units(100_000))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            items = make_catalog(n)
+            stocks = stocks_to_dict(items)
+            target_sets = make_target_sets(items, n_recipes=n, per_recipe=5)
+
+            record("compute_recipe", n, lambda: [compute_recipe(stocks, t, 100) for t in target_sets])
+            record("compute_recipes_batch", n, lambda: compute_recipes_batch(stocks, target_sets, 100))
+
+            names = list(stocks)
+            if n <= max_linear:
+                record("best_match.linear", n, lambda: [best_match(q, names) for q in QUERIES[:4]])
+                record("top_matches.linear", n, lambda: [top_matches(q, names, n=5) for q in QUERIES[:4]])
+            record("CandidateIndex.build", n, lambda: CandidateIndex(names), rep=1)
+            index = CandidateIndex(names)
+            record("best_match.indexed", n, lambda: [best_match(q, index) for q in QUERIES])
+            record("top_matches.indexed", n, lambda: [top_matches(q, index, n=5) for q in QUERIES])
+            matcher = BulkMatcher(index)
+            record("bulk_match", n, lambda: [matcher.match(q, k=5) for q in QUERIES])
+
+            if n <= max_xlsx:
+                xlsx = os.path.join(tmp, f"stocks_{n}.xlsx")
+                write_catalog_xlsx(items, xlsx)
+                cache_dir = os.path.join(tmp, f"cache_{n}")
+                record("read_stocks_xlsx", n, lambda: read_stocks_xlsx(xlsx), rep=max(1, repeat // 2))
+                read_stocks_xlsx(xlsx, cache_dir=cache_dir)
+                record("read_stocks_xlsx.cached", n, lambda: read_stocks_xlsx(xlsx, cache_dir=cache_dir))
+
+            cols = os.path.join(tmp, f"stocks_{n}.cols")
+            write_columnar(items, cols)
+            record("ColumnarStockStore.open", n, lambda: ColumnarStockStore(cols))
+            recipe_names = [t.name for t in target_sets[0]]
+            record("ColumnarStockStore.open+fetch", n, lambda: ColumnarStockStore(cols).fetch(recipe_names))
+
+            results_to_export = [compute_recipe(stocks, t, 100) for t in target_sets[:1000]]
+            out_csv = os.path.join(tmp, "recipe.csv")
+            record(
+                "export_recipe_csv", len(results_to_export),
+                lambda: [export_recipe_csv(r, out_csv) for r in results_to_export],
+            )
+    return results
+
+
+def compare(current: Dict[str, Result], baseline: Dict[str, Result], threshold: float) -> List[Tuple[str, float]]:
+    """Benchmarks whose median is slower than baseline by more than `threshold`, with their ratio."""
+    regressions = []
+    for key, res in sorted(current.items()):
+        base = baseline.get(key)
+        if not base or base["median_s"] <= 0:
+            continue
+        ratio = res["median_s"] / base["median_s"]
+        if ratio > 1.0 + threshold:
+            regressions.append((key, ratio))
+    return regressions
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Buffer Builder benchmark suite")
+    p.add_argument("--sizes", default="100,1000,10000", help="Comma-separated catalog/batch sizes")
+    p.add_argument("--repeat", type=int, default=5, help="Repetitions per benchmark (default 5)")
+    p.add_argument("--max-xlsx", type=int, default=10000, help="Largest catalog written to .xlsx (default 10000)")
+    p.add_argument("--max-linear", type=int, default=10000, help="Largest catalog for linear fuzzy scans")
+    p.add_argument("--out", default="", help="Write results JSON here (default: stdout)")
+    p.add_argument("--save-baseline", default="", help="Also write results JSON as a baseline file")
+    p.add_argument("--compare", default="", help="Baseline JSON to compare against")
+    p.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (default 0.25)")
+    args = p.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    payload = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": args.repeat,
+        },
+        "results": run_suite(sizes, args.repeat, args.max_xlsx, args.max_linear),
+    }
+
+    text = json.dumps(payload, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(payload["results"], baseline, args.threshold)
+        for key, ratio in regressions:
+            print(f"REGRESSION: {key} is {ratio:.2f}x the baseline median", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
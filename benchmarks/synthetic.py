@@ -0,0 +1,95 @@
+"""Synthetic stock catalogs and recipe batches for the benchmarks."""
+from __future__ import annotations
+
+import os
+import random
+import sys
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from stocks_io import StockItem  # noqa: E402
+from units import parse_concentration  # noqa: E402
+from calculator import TargetComponent  # noqa: E402
+
+_BASES = [
+    "Tris-HCl", "HEPES", "MOPS", "MES", "NaCl", "KCl", "MgCl2", "CaCl2", "ZnSO4", "EDTA", "EGTA",
+    "DTT", "TCEP", "Imidazole", "Glycerol", "Tween-20", "Triton X-100", "BSA", "Sucrose",
+    "Guanidine-HCl", "Urea", "L-Arginine", "Sodium acetate", "Potassium phosphate",
+]
+_SUFFIXES = ["", "pH 7.5", "pH 8.0", "stock", "lot", "sterile", "filtered"]
+
+# kind -> (stock unit, stock value, target unit, target range)
+_SOLUTION_KINDS = {
+    "molar": ("M", 1.0, "mM", (1, 200)),
+    "massvol": ("mg/mL", 10.0, "ug/mL", (1, 500)),
+    "volvol": ("%", 100.0, "%", (1, 20)),
+}
+
+
+def make_catalog(n: int, seed: int = 0) -> List[StockItem]:
+    """n unique stock items: roughly 70% solutions (all kinds) and 30% powders."""
+    rng = random.Random(seed)
+    items: List[StockItem] = []
+    for i in range(n):
+        base = _BASES[i % len(_BASES)]
+        suffix = rng.choice(_SUFFIXES)
+        name = " ".join(p for p in (base, suffix, f"#{i}") if p)
+        if rng.random() < 0.7:
+            kind = rng.choice(list(_SOLUTION_KINDS))
+            unit, value, _, _ = _SOLUTION_KINDS[kind]
+            items.append(
+                StockItem(
+                    name=name,
+                    type="stock_solution",
+                    concentration=parse_concentration(value * rng.choice([0.5, 1, 2, 5]), unit),
+                    notes=kind,
+                )
+            )
+        else:
+            items.append(
+                StockItem(
+                    name=name,
+                    type="powder",
+                    mw_g_per_mol=round(rng.uniform(40, 600), 2),
+                    purity_fraction=rng.choice([1.0, 1.0, 0.99, 0.95]),
+                    notes="powder",
+                )
+            )
+    return items
+
+
+def make_target_sets(items: List[StockItem], n_recipes: int, per_recipe: int = 5, seed: int = 0) -> List[List[TargetComponent]]:
+    """Random recipes whose target units always suit the chosen stock."""
+    rng = random.Random(seed)
+    sets: List[List[TargetComponent]] = []
+    for _ in range(n_recipes):
+        targets = []
+        for item in rng.sample(items, min(per_recipe, len(items))):
+            if item.type == "powder":
+                targets.append(TargetComponent(item.name, round(rng.uniform(1, 100), 3), "mM"))
+            else:
+                _, _, unit, (lo, hi) = _SOLUTION_KINDS[item.concentration.kind]
+                targets.append(TargetComponent(item.name, round(rng.uniform(lo, hi) / per_recipe, 3), unit))
+        sets.append(targets)
+    return sets
+
+
+def write_catalog_xlsx(items: List[StockItem], path: str, sheet_name: str = "stocks") -> None:
+    import pandas as pd
+
+    rows = []
+    for i in items:
+        rows.append(
+            {
+                "name": i.name,
+                "type": i.type,
+                "concentration_value": i.concentration.value if i.concentration else None,
+                "concentration_unit": i.concentration.unit if i.concentration else None,
+                "mw_g_per_mol": i.mw_g_per_mol,
+                "purity_fraction": i.purity_fraction if i.type == "powder" else None,
+                "solvent": i.solvent,
+                "notes": i.notes,
+            }
+        )
+    pd.DataFrame(rows).to_excel(path, sheet_name=sheet_name, index=False)
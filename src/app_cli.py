@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 import argparse
+import os
+import sys
+from dataclasses import replace
 from typing import List
 
-from stocks_io import read_stocks_xlsx, stocks_to_dict
+from stock_store import open_stocks
 from calculator import TargetComponent, compute_recipe
 from export import export_recipe_csv
+from jobs import export_outcomes_xlsx, iter_jobs, write_outcomes
+from batch_executor import run_jobs_parallel
+from match_cache import MatchCache
+import profiling
 
 
 def parse_targets(target_args: List[str]) -> List[TargetComponent]:
@@ -26,19 +33,115 @@ def parse_targets(target_args: List[str]) -> List[TargetComponent]:
 
 def main() -> None:
     p = argparse.ArgumentParser(description="Buffer Builder (stocks + targets -> recipe)")
-    p.add_argument("--stocks", required=True, help="Path to stocks .xlsx")
+    p.add_argument(
+        "--stocks", action="append", required=True,
+        help="Stocks .xlsx ('file.xlsx#sheet', '#*' = all sheets) or a catalog (.db/.cols); "
+             "repeat to merge several sources",
+    )
     p.add_argument("--sheet", default="stocks", help="Sheet name inside the xlsx (default: stocks)")
-    p.add_argument("--final-volume", required=True, type=float, help="Final volume value")
+    p.add_argument(
+        "--on-conflict", choices=["first", "last", "error"], default=None,
+        help="With several --stocks, which definition of a duplicated name wins (default: last)",
+    )
+    p.add_argument("--final-volume", type=float, help="Final volume value (required unless --jobs)")
     p.add_argument("--final-unit", default="mL", help="Final volume unit (e.g., mL, uL, L)")
     p.add_argument("--target", action="append", default=[], help="Target 'Name,value,unit' (repeatable)")
-    p.add_argument("--out", default="", help="Output CSV path (optional)")
+    p.add_argument("--out", default="", help="Output CSV path (optional; with --jobs, replaces stdout; "
+                                             "with --plate, per-well CSV or .xlsx report)")
     p.add_argument("--vol-unit", default="uL", help="Output volume unit for additions (default uL)")
     p.add_argument("--mass-unit", default="mg", help="Output mass unit for powders (default mg)")
+    p.add_argument("--min-volume", type=float, default=0.0,
+                   help="Smallest pipettable volume in --vol-unit; smaller additions get intermediate dilutions")
+    p.add_argument("--max-volume", type=float, default=1000.0,
+                   help="Largest pipettable volume in --vol-unit, with --min-volume (default 1000)")
+    p.add_argument("--max-dilution-steps", type=int, default=3, help="Serial dilution steps allowed (default 3)")
+    p.add_argument("--cache-dir", default="", help="Directory for the parsed-stocks cache (optional)")
+    p.add_argument("--jobs", default="", help="JSONL file of recipe jobs ('-' for stdin); results stream to stdout")
+    p.add_argument("--jobs-format", choices=["jsonl", "csv", "xlsx"], default="jsonl",
+                   help="Output format for --jobs (xlsx needs --out)")
+    p.add_argument("--workers", type=int, default=1, help="Worker processes for --jobs/--reconcile (default 1 = serial)")
+    p.add_argument("--fuzzy", action="store_true", help="With --jobs, map unknown names to the best fuzzy match")
+    p.add_argument("--min-score", type=float, default=0.72, help="Minimum fuzzy match score (default 0.72)")
+    p.add_argument("--match-cache", default="", help="With --fuzzy, reuse and update fuzzy match results in this file")
+    p.add_argument("--reconcile", default="", help="File of names, one per line ('-' for stdin): report best stock matches")
+    p.add_argument("--top-k", type=int, default=3, help="Alternatives listed per name with --reconcile (default 3)")
+    p.add_argument("--plate", default="", help="Plate layout CSV (well -> targets, volume): per-well recipes, "
+                                               "plate totals and stock consumption")
+    p.add_argument("--matrix-out", default="", help="With --plate, write the sparse component x well matrix "
+                                                    "(.csv, .npz or .parquet)")
+    p.add_argument("--reconcile-format", choices=["csv", "jsonl"], default="csv", help="Output format for --reconcile")
+    p.add_argument("--profile", action="store_true", help="Print per-stage timings to stderr")
+    p.add_argument("--profile-cprofile", default="", help="Also write a cProfile dump to this path")
+    p.add_argument("--profile-memory", action="store_true", help="Also report peak memory (tracemalloc)")
 
     args = p.parse_args()
+    if not (args.jobs or args.reconcile or args.plate) and args.final_volume is None:
+        p.error("--final-volume is required unless --jobs, --reconcile or --plate is given")
+    if args.jobs and args.jobs_format == "xlsx" and not args.out:
+        p.error("--jobs-format xlsx requires --out")
+    if args.matrix_out and not args.plate:
+        p.error("--matrix-out requires --plate")
+    if args.plate and os.path.splitext(args.out)[1].lower() in (".npz", ".parquet"):
+        p.error("--out with --plate writes per-well CSV or an .xlsx report; use --matrix-out for .npz/.parquet")
+    if args.plate and args.min_volume:
+        p.error("--min-volume/--max-volume are not applied to --plate wells; drop them or run the wells as --jobs")
+    if args.min_volume and not 0 < args.min_volume < args.max_volume:
+        p.error("--min-volume must be positive and below --max-volume")
+
+    with profiling.session(args.profile, args.profile_cprofile, args.profile_memory):
+        _run(args)
+
+
+def _load_stocks(args: argparse.Namespace):
+    cache_dir = args.cache_dir or None
+    if len(args.stocks) == 1 and "#" not in args.stocks[0]:
+        # a SQLite catalog is queried per recipe instead of being loaded whole
+        return open_stocks(args.stocks[0], sheet_name=args.sheet, cache_dir=cache_dir)
+
+    from stocks_merge import ALL_SHEETS, DEFAULT_CONFLICT_POLICY, load_stock_sources, parse_source_spec
+
+    sources = [parse_source_spec(s, args.sheet) for s in args.stocks]
+    if len(sources) == 1 and sources[0].sheet != ALL_SHEETS:
+        return open_stocks(sources[0].path, sheet_name=sources[0].sheet, cache_dir=cache_dir)
+
+    merged = load_stock_sources(
+        sources,
+        cache_dir=cache_dir,
+        workers=args.workers if args.workers > 1 else None,
+        processes=args.workers > 1,
+        on_conflict=args.on_conflict or DEFAULT_CONFLICT_POLICY,
+    )
+    print(
+        f"Loaded {len(merged.stocks)} stocks from {len(merged.inputs)} sources "
+        f"({len(merged.duplicates)} duplicates, {len(merged.conflicting)} conflicts)",
+        file=sys.stderr,
+    )
+    for line in merged.report():
+        print(" -", line, file=sys.stderr)
+    return merged.stocks
+
+
+def _pipetting_limits(args: argparse.Namespace):
+    """PipettingLimits from --min-volume/--max-volume, or None when dilution planning is off."""
+    if not args.min_volume:
+        return None
+    from dilution import PipettingLimits
+
+    return PipettingLimits(args.min_volume, args.max_volume, args.vol_unit, args.max_dilution_steps)
+
 
-    items = read_stocks_xlsx(args.stocks, sheet_name=args.sheet)
-    stocks = stocks_to_dict(items)
+def _run(args: argparse.Namespace) -> None:
+    stocks = _load_stocks(args)
+
+    if args.jobs:
+        _run_jobs_mode(args, stocks)
+        return
+    if args.reconcile:
+        _run_reconcile_mode(args, stocks)
+        return
+    if args.plate:
+        _run_plate_mode(args, stocks)
+        return
 
     targets = parse_targets(args.target)
     result = compute_recipe(
@@ -49,6 +152,11 @@ def main() -> None:
         output_volume_unit=args.vol_unit,
         output_mass_unit=args.mass_unit,
     )
+    limits = _pipetting_limits(args)
+    if limits is not None:
+        from dilution import apply_dilutions
+
+        result = apply_dilutions(result, limits, stocks)
 
     print(f"Final volume: {result.final_volume_value} {result.final_volume_unit}")
     if result.warnings:
@@ -68,5 +176,98 @@ def main() -> None:
         print(f"\nSaved CSV: {args.out}")
 
 
+def _run_jobs_mode(args: argparse.Namespace, stocks) -> None:
+    defaults = {"final_unit": args.final_unit, "vol_unit": args.vol_unit, "mass_unit": args.mass_unit}
+    src = sys.stdin if args.jobs == "-" else open(args.jobs, "r", encoding="utf-8")
+    xlsx = args.jobs_format == "xlsx"
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out and not xlsx else sys.stdout
+    cache = MatchCache.load(args.match_cache) if args.fuzzy and args.match_cache else None
+    try:
+        outcomes = run_jobs_parallel(
+            stocks,
+            iter_jobs(src, defaults),
+            workers=args.workers,
+            fuzzy=args.fuzzy,
+            min_score=args.min_score,
+            match_cache=cache,
+        )
+        limits = _pipetting_limits(args)
+        if limits is not None:
+            from dilution import apply_dilutions
+
+            outcomes = (
+                replace(o, result=apply_dilutions(o.result, limits, stocks)) if o.ok else o for o in outcomes
+            )
+        if xlsx:
+            counts = export_outcomes_xlsx(outcomes, args.out)
+        else:
+            counts = write_outcomes(outcomes, out, fmt=args.jobs_format)
+        if cache is not None:
+            cache.save(args.match_cache)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"{counts['jobs']} jobs, {counts['failed']} failed", file=sys.stderr)
+
+
+def _run_reconcile_mode(args: argparse.Namespace, stocks) -> None:
+    # bulk_match scores with NumPy arrays; import it only when --reconcile is used
+    from bulk_match import read_queries, reconcile_bulk, write_reconciliation
+
+    src = sys.stdin if args.reconcile == "-" else open(args.reconcile, "r", encoding="utf-8")
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    try:
+        results = reconcile_bulk(
+            read_queries(src),
+            list(stocks.keys()),
+            k=args.top_k,
+            min_score=args.min_score,
+            workers=args.workers,
+        )
+        counts = write_reconciliation(results, out, fmt=args.reconcile_format)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"{counts['queries']} names, {counts['unmatched']} without a match >= {args.min_score}", file=sys.stderr)
+
+
+def _run_plate_mode(args: argparse.Namespace, stocks) -> None:
+    # plate_layout totals wells with NumPy; import it only when --plate is used
+    from plate_layout import compute_plate, export_plate, load_plate_layout
+
+    layout = load_plate_layout(args.plate, final_unit=args.final_unit)
+    result = compute_plate(stocks, layout, output_volume_unit=args.vol_unit, output_mass_unit=args.mass_unit)
+
+    print(f"Plate layout: {len(layout.wells)} wells on {len(layout.plates)} plate(s)")
+    if result.warnings:
+        print("\nWARNINGS:")
+        for w in result.warnings:
+            print(" -", w)
+
+    print("\nSTOCK CONSUMPTION:")
+    for c in result.consumption:
+        print(f"- {c.component}: {c.total:.6g} {c.unit}  ({c.wells} wells)")
+
+    print("\nPLATE TOTALS:")
+    for plate in layout.plates:
+        print(f"[{plate}]")
+        for t in result.plate_totals:
+            if t.plate == plate:
+                print(f"- {t.component}: {t.total:.6g} {t.unit}  ({t.wells} wells)")
+
+    if args.out:
+        export_plate(result, args.out)
+        print(f"\nSaved per-well additions: {args.out}")
+    if args.matrix_out:
+        from recipe_matrix import export_matrix
+
+        n = export_matrix(result.matrix, args.matrix_out)
+        print(f"Saved recipe matrix ({n} entries): {args.matrix_out}")
+
+
 if __name__ == "__main__":
     main()
@@ -3,19 +3,24 @@ from __future__ import annotations
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from typing import List, Dict
+from typing import Any, Callable, Dict, List, Optional
 
-from stocks_io import read_stocks_xlsx, stocks_to_dict, StockItem
-from fuzzy_match import best_match, top_matches
-from calculator import TargetComponent, compute_recipe
+from stocks_io import CompiledStock, StockItem
+from stocks_watch import StocksDiff, StocksWatcher
+from stocks_cache import default_cache_dir
+from fuzzy_match import CandidateIndex
+from calculator import RecipeResult, TargetComponent, compute_recipe
 from export import export_recipe_csv
+from gui_tasks import BackgroundTask
+from match_cache import MatchCache, default_match_cache_file
+import profiling
 
 
 class BufferBuilderGUI(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Buffer Builder")
-        self.geometry("980x650")
+        self.geometry("980x800")
 
         self.stocks_path = tk.StringVar(value="")
         self.sheet_name = tk.StringVar(value="stocks")
@@ -26,10 +31,32 @@ class BufferBuilderGUI(tk.Tk):
         self.out_vol_unit = tk.StringVar(value="uL")
         self.out_mass_unit = tk.StringVar(value="mg")
 
+        self.profile_enabled = tk.BooleanVar(value=False)
+        self.watch_stocks = tk.BooleanVar(value=True)
+
         self._stocks_items: List[StockItem] = []
-        self._stocks_dict: Dict[str, StockItem] = {}
+        self._stocks_dict: Dict[str, CompiledStock] = {}
+        self._stocks_index = CandidateIndex([])
+        self._task: Optional[BackgroundTask] = None
+        # stocks file watching: a quiet background read, applied on the Tk thread
+        self._watcher: Optional[StocksWatcher] = None
+        self._watch_task: Optional[BackgroundTask] = None
+        self._watch_after: Optional[str] = None
+        self._complete_after: Optional[str] = None
+        self._suppress_complete = False
+        # fuzzy match results are remembered across sessions
+        self._match_cache_file = default_match_cache_file(default_cache_dir())
+        self._match_cache = MatchCache.load(self._match_cache_file)
 
         self._build_ui()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _on_close(self):
+        try:
+            self._match_cache.save(self._match_cache_file)
+        except OSError:
+            pass
+        self.destroy()
 
     def _build_ui(self):
         frm_top = ttk.Frame(self, padding=10)
@@ -42,6 +69,18 @@ class BufferBuilderGUI(tk.Tk):
         ttk.Label(frm_top, text="Sheet:").grid(row=1, column=0, sticky="w", pady=(6, 0))
         ttk.Entry(frm_top, textvariable=self.sheet_name, width=20).grid(row=1, column=1, sticky="w", padx=5, pady=(6, 0))
         ttk.Button(frm_top, text="Load stocks", command=self._load_stocks).grid(row=1, column=2, pady=(6, 0))
+        ttk.Checkbutton(frm_top, text="Reload on change", variable=self.watch_stocks).grid(
+            row=1, column=3, sticky="w", padx=(8, 0), pady=(6, 0)
+        )
+
+        self.status_text = tk.StringVar(value="Ready.")
+        frm_status = ttk.Frame(frm_top)
+        frm_status.grid(row=2, column=0, columnspan=3, sticky="we", pady=(6, 0))
+        self.progress = ttk.Progressbar(frm_status, mode="indeterminate", length=200)
+        self.progress.pack(side="left")
+        ttk.Label(frm_status, textvariable=self.status_text).pack(side="left", padx=8)
+        self.cancel_button = ttk.Button(frm_status, text="Cancel", command=self._cancel_task, state="disabled")
+        self.cancel_button.pack(side="right")
 
         frm_top.columnconfigure(1, weight=1)
 
@@ -60,7 +99,9 @@ class BufferBuilderGUI(tk.Tk):
         self.target_unit = tk.StringVar(value="mM")
 
         ttk.Label(frm_left, text="Name (as in stocks):").grid(row=0, column=0, sticky="w")
-        ttk.Entry(frm_left, textvariable=self.target_name, width=28).grid(row=1, column=0, sticky="we", pady=(0, 8))
+        self.target_entry = ttk.Entry(frm_left, textvariable=self.target_name, width=28)
+        self.target_entry.grid(row=1, column=0, sticky="we", pady=(0, 8))
+        self._build_autocomplete()
 
         ttk.Label(frm_left, text="Final value:").grid(row=2, column=0, sticky="w")
         ttk.Entry(frm_left, textvariable=self.target_value, width=10).grid(row=3, column=0, sticky="w")
@@ -100,9 +141,10 @@ class BufferBuilderGUI(tk.Tk):
 
         ttk.Button(frm_right, text="Compute recipe", command=self._compute).grid(row=3, column=0, columnspan=3, sticky="we", pady=(14, 0))
         ttk.Button(frm_right, text="Export CSV...", command=self._export_csv).grid(row=4, column=0, columnspan=3, sticky="we", pady=(6, 0))
+        ttk.Button(frm_right, text="Plate layout...", command=self._compute_plate).grid(row=5, column=0, columnspan=3, sticky="we", pady=(6, 0))
 
         self.warnings_text = tk.Text(frm_right, height=7, width=34)
-        self.warnings_text.grid(row=5, column=0, columnspan=3, sticky="we", pady=(10, 0))
+        self.warnings_text.grid(row=6, column=0, columnspan=3, sticky="we", pady=(10, 0))
 
         sep2 = ttk.Separator(self, orient="horizontal")
         sep2.pack(fill="x", padx=10, pady=10)
@@ -117,27 +159,237 @@ class BufferBuilderGUI(tk.Tk):
             self.tree.column(c, width=160 if c != "notes" else 360, anchor="w")
         self.tree.pack(fill="both", expand=True)
 
+        frm_profile = ttk.LabelFrame(self, text="Profiling", padding=6)
+        frm_profile.pack(fill="x", padx=10, pady=(0, 10))
+        ttk.Checkbutton(
+            frm_profile, text="Collect stage timings", variable=self.profile_enabled, command=self._toggle_profiling
+        ).grid(row=0, column=0, sticky="w")
+        ttk.Button(frm_profile, text="Reset", command=self._reset_profiling).grid(row=0, column=1, sticky="w", padx=6)
+        self.profile_text = tk.Text(frm_profile, height=6, font="TkFixedFont")
+        self.profile_text.grid(row=1, column=0, columnspan=3, sticky="we", pady=(6, 0))
+        frm_profile.columnconfigure(2, weight=1)
+        self._refresh_profile_panel()
+
         self._last_result = None
 
+    # ---- as-you-type suggestions for the target name ----
+
+    def _build_autocomplete(self):
+        self._complete_popup = tk.Toplevel(self)
+        self._complete_popup.withdraw()
+        self._complete_popup.overrideredirect(True)
+        self._complete_list = tk.Listbox(self._complete_popup, height=8, width=36, exportselection=False)
+        self._complete_list.pack(fill="both", expand=True)
+        self._complete_list.bind("<ButtonRelease-1>", lambda e: self._accept_completion())
+        self._complete_list.bind("<Return>", lambda e: self._accept_completion())
+        self._complete_list.bind("<Escape>", lambda e: self._hide_completions())
+
+        self.target_name.trace_add("write", lambda *_: self._schedule_complete())
+        self.target_entry.bind("<Down>", self._focus_completions)
+        self.target_entry.bind("<Escape>", lambda e: self._hide_completions())
+        self.target_entry.bind("<FocusOut>", lambda e: self.after(150, self._hide_if_unfocused))
+
+    def _schedule_complete(self):
+        # Debounce: only look up once typing pauses
+        if self._complete_after is not None:
+            self.after_cancel(self._complete_after)
+        self._complete_after = None
+        if self._suppress_complete:
+            return
+        self._complete_after = self.after(120, self._update_completions)
+
+    def _update_completions(self):
+        self._complete_after = None
+        query = self.target_name.get().strip()
+        if not query or not len(self._stocks_index):
+            self._hide_completions()
+            return
+        matches = self._stocks_index.complete(query, n=8)
+        if not matches or (len(matches) == 1 and matches[0].candidate == query):
+            self._hide_completions()
+            return
+        self._complete_list.delete(0, "end")
+        for m in matches:
+            self._complete_list.insert("end", m.candidate)
+        self._complete_list.configure(height=len(matches))
+        x = self.target_entry.winfo_rootx()
+        y = self.target_entry.winfo_rooty() + self.target_entry.winfo_height()
+        self._complete_popup.geometry(f"+{x}+{y}")
+        self._complete_popup.deiconify()
+        self._complete_popup.lift()
+
+    def _focus_completions(self, event=None):
+        if self._complete_popup.winfo_viewable():
+            self._complete_list.focus_set()
+            self._complete_list.selection_clear(0, "end")
+            self._complete_list.selection_set(0)
+            self._complete_list.activate(0)
+        return "break"
+
+    def _accept_completion(self):
+        sel = self._complete_list.curselection()
+        if sel:
+            self._set_target_name(self._complete_list.get(sel[0]))
+        else:
+            self._hide_completions()
+        self.target_entry.focus_set()
+        self.target_entry.icursor("end")
+
+    def _set_target_name(self, name: str):
+        """Set the entry text without popping up suggestions for it."""
+        self._suppress_complete = True
+        try:
+            self.target_name.set(name)
+        finally:
+            self._suppress_complete = False
+        self._hide_completions()
+
+    def _hide_completions(self):
+        self._complete_popup.withdraw()
+
+    def _hide_if_unfocused(self):
+        if self.focus_get() not in (self.target_entry, self._complete_list):
+            self._hide_completions()
+
+    def _toggle_profiling(self):
+        if self.profile_enabled.get():
+            profiling.enable()
+        else:
+            profiling.disable()
+        self._refresh_profile_panel()
+
+    def _reset_profiling(self):
+        profiling.reset()
+        self._refresh_profile_panel()
+
+    def _refresh_profile_panel(self):
+        self.profile_text.delete("1.0", "end")
+        if not profiling.is_enabled() and not profiling.snapshot()["spans"]:
+            self.profile_text.insert("end", "Profiling is off.")
+        else:
+            self.profile_text.insert("end", profiling.format_summary())
+
     def _browse_stocks(self):
         path = filedialog.askopenfilename(
-            title="Select stocks .xlsx",
-            filetypes=[("Excel files", "*.xlsx")],
+            title="Select stocks .xlsx or catalog .db",
+            filetypes=[("Excel files", "*.xlsx"), ("SQLite catalogs", "*.db *.sqlite *.sqlite3")],
         )
         if path:
             self.stocks_path.set(path)
 
+    # ---- background tasks: workers never touch Tk; results land via _poll_task ----
+
+    def _start_task(self, label: str, work: Callable, on_done: Callable[[Any], None]) -> bool:
+        if self._task is not None and self._task.running:
+            messagebox.showinfo("Busy", "Another operation is still running.")
+            return False
+        self._task = BackgroundTask(work).start()
+        self._task_on_done = on_done
+        self._task_label = label
+        self.status_text.set(f"{label}...")
+        self.progress.configure(mode="indeterminate")
+        self.progress.start(15)
+        self.cancel_button.configure(state="normal")
+        self.after(50, self._poll_task)
+        return True
+
+    def _cancel_task(self):
+        if self._task is not None and self._task.running:
+            self._task.cancel()
+            self.status_text.set(f"{self._task_label}: cancelling...")
+
+    def _finish_task(self, status: str):
+        self.progress.stop()
+        self.progress.configure(mode="determinate", value=0)
+        self.cancel_button.configure(state="disabled")
+        self.status_text.set(status)
+        self._refresh_profile_panel()
+
+    def _poll_task(self):
+        task = self._task
+        if task is None:
+            return
+        for kind, payload in task.poll():
+            if kind == "progress":
+                message, fraction = payload
+                self.status_text.set(message)
+                if fraction is not None:
+                    self.progress.stop()
+                    self.progress.configure(mode="determinate", value=fraction * 100)
+            elif kind == "done":
+                self._finish_task(f"{self._task_label}: done.")
+                self._task_on_done(payload)
+            elif kind == "error":
+                self._finish_task(f"{self._task_label}: failed.")
+                messagebox.showerror(f"{self._task_label} error", str(payload))
+            elif kind == "cancelled":
+                self._finish_task(f"{self._task_label}: cancelled.")
+        if task.running:
+            self.after(50, self._poll_task)
+
     def _load_stocks(self):
-        try:
-            path = self.stocks_path.get().strip()
-            if not path:
-                messagebox.showerror("Error", "Please choose a stocks .xlsx file.")
-                return
-            self._stocks_items = read_stocks_xlsx(path, sheet_name=self.sheet_name.get().strip() or "stocks")
-            self._stocks_dict = stocks_to_dict(self._stocks_items)
+        path = self.stocks_path.get().strip()
+        if not path:
+            messagebox.showerror("Error", "Please choose a stocks .xlsx or .db file.")
+            return
+        sheet = self.sheet_name.get().strip() or "stocks"
+
+        def work(token, progress):
+            watcher = StocksWatcher(
+                path, sheet_name=sheet, cache_dir=default_cache_dir(), progress=token.checking(progress)
+            )
+            token.check()
+            return watcher
+
+        def on_done(watcher):
+            if self._watch_after is not None:
+                self.after_cancel(self._watch_after)
+            self._watcher = watcher
+            self._watch_task = None
+            watcher.add_listener(self._on_stocks_changed)
+            self._use_watcher_stocks()
+            self._watch_after = self.after(2000, self._watch_tick)
             messagebox.showinfo("Loaded", f"Loaded {len(self._stocks_items)} stock items.")
-        except Exception as e:
-            messagebox.showerror("Load error", str(e))
+
+        self._start_task("Loading stocks", work, on_done)
+
+    def _use_watcher_stocks(self):
+        w = self._watcher
+        self._stocks_items = list(w.stocks.values())
+        self._stocks_dict = w.compiled
+        self._stocks_index = w.index
+
+    def _watch_tick(self):
+        """Every 2 s, re-read the stocks file in the background if it changed."""
+        self._watch_after = None
+        watcher = self._watcher
+        if watcher is None:
+            return
+        task = self._watch_task
+        if task is None:
+            if self.watch_stocks.get():
+                self._watch_task = BackgroundTask(lambda token, progress: watcher.read_changes()).start()
+        else:
+            finished = not task.running
+            for kind, payload in task.poll():
+                if kind == "done" and payload is not None:
+                    watcher.apply(payload)
+                elif kind == "error":
+                    self.status_text.set(f"Stocks reload failed, keeping previous stocks: {payload}")
+            if finished:
+                self._watch_task = None
+        self._watch_after = self.after(250 if self._watch_task else 2000, self._watch_tick)
+
+    def _on_stocks_changed(self, diff: StocksDiff):
+        self._use_watcher_stocks()
+        status = (
+            f"Stocks file changed: {len(diff.added)} added, {len(diff.removed)} removed, "
+            f"{len(diff.changed)} changed."
+        )
+        affected = {t.split("|", 1)[0].strip() for t in self.targets_list.get(0, "end")} & set(diff.names)
+        if affected:
+            status += f" Recompute for: {', '.join(sorted(affected))}."
+        self.status_text.set(status)
 
     def _add_target(self):
         name = self.target_name.get().strip()
@@ -155,7 +407,7 @@ class BufferBuilderGUI(tk.Tk):
         if self._stocks_dict:
             if name not in self._stocks_dict:
                 # Try fuzzy matching automatically
-                m = best_match(name, self._stocks_dict.keys(), min_score=0.5)
+                m = self._match_cache.best_match(name, self._stocks_index, min_score=0.5)
                 if m:
                     # Ask user to confirm the match
                     response = messagebox.askyesno(
@@ -166,7 +418,7 @@ class BufferBuilderGUI(tk.Tk):
                     )
                     if response:
                         matched_name = m.candidate
-                        self.target_name.set(matched_name)  # Update the entry field
+                        self._set_target_name(matched_name)  # Update the entry field
         
         self.targets_list.insert("end", f"{matched_name} | {val} {unit}")
 
@@ -183,16 +435,17 @@ class BufferBuilderGUI(tk.Tk):
         q = self.target_name.get().strip()
         if not q:
             return
-        m = best_match(q, self._stocks_dict.keys(), min_score=0.5)
+        m = self._match_cache.best_match(q, self._stocks_index, min_score=0.5)
+        self._refresh_profile_panel()
         if not m:
-            suggestions = top_matches(q, self._stocks_dict.keys(), n=5)
+            suggestions = self._match_cache.top_matches(q, self._stocks_index, n=5)
             if not suggestions:
                 messagebox.showinfo("No match", "No similar names found.")
                 return
             msg = "\n".join([f"{s.candidate}  (score={s.score:.2f})" for s in suggestions])
             messagebox.showinfo("Suggestions", msg)
             return
-        self.target_name.set(m.candidate)
+        self._set_target_name(m.candidate)
         messagebox.showinfo("Match", f"Best match: {m.candidate} (score={m.score:.2f})")
 
     def _parse_targets_from_listbox(self) -> List[TargetComponent]:
@@ -215,58 +468,136 @@ class BufferBuilderGUI(tk.Tk):
         try:
             targets = self._parse_targets_from_listbox()
             fv = float(self.final_volume_value.get().strip())
-            fu = self.final_volume_unit.get().strip()
-            result = compute_recipe(
-                stocks=self._stocks_dict,
+        except Exception as e:
+            messagebox.showerror("Compute error", str(e))
+            return
+        stocks = self._stocks_dict
+        fu = self.final_volume_unit.get().strip()
+        out_vol_unit = self.out_vol_unit.get().strip()
+        out_mass_unit = self.out_mass_unit.get().strip()
+
+        def work(token, progress):
+            return compute_recipe(
+                stocks=stocks,
                 targets=targets,
                 final_volume_value=fv,
                 final_volume_unit=fu,
-                output_volume_unit=self.out_vol_unit.get().strip(),
-                output_mass_unit=self.out_mass_unit.get().strip(),
+                output_volume_unit=out_vol_unit,
+                output_mass_unit=out_mass_unit,
+                progress=token.checking(progress),
             )
-            self._last_result = result
 
-            # warnings
-            self.warnings_text.delete("1.0", "end")
-            if result.warnings:
-                self.warnings_text.insert("end", "WARNINGS:\n" + "\n".join(f"- {w}" for w in result.warnings))
-            else:
-                self.warnings_text.insert("end", "No warnings.")
-
-            # table
-            for row in self.tree.get_children():
-                self.tree.delete(row)
-
-            for line in result.lines:
-                add_vol = ""
-                add_mass = ""
-                if line.add_volume_value is not None:
-                    add_vol = f"{line.add_volume_value:.6g} {line.add_volume_unit}"
-                if line.add_mass_value is not None:
-                    add_mass = f"{line.add_mass_value:.6g} {line.add_mass_unit}"
+        self._start_task("Computing recipe", work, self._show_result)
 
-                self.tree.insert(
-                    "", "end",
-                    values=(line.name, line.source_type, add_vol, add_mass, line.notes)
-                )
+    def _compute_plate(self):
+        if not self._stocks_dict:
+            messagebox.showerror("Error", "Load stocks first.")
+            return
+        path = filedialog.askopenfilename(
+            title="Select plate layout CSV",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        stocks = self._stocks_dict
+        fu = self.final_volume_unit.get().strip()
+        out_vol_unit = self.out_vol_unit.get().strip()
+        out_mass_unit = self.out_mass_unit.get().strip()
+
+        def work(token, progress):
+            # NumPy-backed; imported on first use like the other bulk paths
+            from plate_layout import compute_plate, load_plate_layout
+
+            progress("Reading plate layout", None)
+            layout = load_plate_layout(path, final_unit=fu)
+            token.check()
+            progress(f"Computing {len(layout.wells)} wells", None)
+            return compute_plate(stocks, layout, output_volume_unit=out_vol_unit, output_mass_unit=out_mass_unit)
+
+        self._start_task("Computing plate", work, self._show_plate_result)
+
+    def _show_plate_result(self, result):
+        """Per-stock consumption in the table; plate totals and merged warnings in the text box."""
+        self._last_result = result
+        layout = result.layout
+
+        self.warnings_text.delete("1.0", "end")
+        lines = [f"{len(layout.wells)} wells on {len(layout.plates)} plate(s)."]
+        for plate in layout.plates:
+            lines.append(f"[{plate}]")
+            lines.extend(
+                f"- {t.component}: {t.total:.6g} {t.unit} ({t.wells} wells)"
+                for t in result.plate_totals if t.plate == plate
+            )
+        if result.warnings:
+            lines.append("WARNINGS:")
+            lines.extend(f"- {w}" for w in result.warnings)
+        self.warnings_text.insert("end", "\n".join(lines))
+
+        self._clear_tree()
+        for c in result.consumption:
+            amount = f"{c.total:.6g} {c.unit}"
+            self.tree.insert(
+                "", "end",
+                values=(
+                    c.component, c.quantity,
+                    amount if c.quantity == "volume" else "",
+                    amount if c.quantity == "mass" else "",
+                    f"total over {c.wells} wells",
+                ),
+            )
 
-        except Exception as e:
-            messagebox.showerror("Compute error", str(e))
+    def _clear_tree(self):
+        for row in self.tree.get_children():
+            self.tree.delete(row)
+
+    def _show_result(self, result):
+        self._last_result = result
+
+        # warnings
+        self.warnings_text.delete("1.0", "end")
+        if result.warnings:
+            self.warnings_text.insert("end", "WARNINGS:\n" + "\n".join(f"- {w}" for w in result.warnings))
+        else:
+            self.warnings_text.insert("end", "No warnings.")
+
+        # table
+        self._clear_tree()
+
+        for line in result.lines:
+            add_vol = ""
+            add_mass = ""
+            if line.add_volume_value is not None:
+                add_vol = f"{line.add_volume_value:.6g} {line.add_volume_unit}"
+            if line.add_mass_value is not None:
+                add_mass = f"{line.add_mass_value:.6g} {line.add_mass_unit}"
+
+            self.tree.insert(
+                "", "end",
+                values=(line.name, line.source_type, add_vol, add_mass, line.notes)
+            )
 
     def _export_csv(self):
         if not self._last_result:
             messagebox.showerror("Error", "Compute a recipe first.")
             return
+        plate = not isinstance(self._last_result, RecipeResult)
         path = filedialog.asksaveasfilename(
-            title="Save recipe as CSV",
+            title="Save plate additions" if plate else "Save recipe as CSV",
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
+            filetypes=[("CSV files", "*.csv")] + ([("Excel report", "*.xlsx")] if plate else []),
         )
         if not path:
             return
         try:
-            export_recipe_csv(self._last_result, path)
-            messagebox.showinfo("Saved", f"Saved CSV:\n{path}")
+            if plate:
+                from plate_layout import export_plate
+
+                export_plate(self._last_result, path)
+            else:
+                export_recipe_csv(self._last_result, path)
+            self._refresh_profile_panel()
+            messagebox.showinfo("Saved", f"Saved {'plate report' if plate else 'CSV'}:\n{path}")
         except Exception as e:
             messagebox.showerror("Export error", str(e))
 
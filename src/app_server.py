@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import http.client
+import json
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from stocks_io import CompiledStock
+from stocks_watch import StocksWatcher
+from fuzzy_match import CandidateIndex
+from calculator import compute_recipe
+from export import recipe_to_dict
+from jobs import parse_target_spec
+from match_cache import MatchCache
+
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+}
+
+
+class RequestError(Exception):
+    """Client error carried back as an HTTP status + JSON message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass(frozen=True)
+class StocksSnapshot:
+    """Stocks loaded from one version of the workbook. Replaced, never mutated."""
+    stocks: Dict[str, CompiledStock]
+    index: CandidateIndex
+    signature: Tuple[int, int]   # (mtime_ns, size) of the workbook or database
+
+
+def snapshot_of(watcher: StocksWatcher) -> StocksSnapshot:
+    return StocksSnapshot(stocks=watcher.compiled, index=watcher.index, signature=watcher.signature)
+
+
+class RecipeServer:
+    """
+    Long-running HTTP/JSON server that keeps the stocks in memory.
+
+    Endpoints:
+        GET  /health   -> {"ok": true, "stocks": <count>}
+        POST /recipe   {"targets": [...], "final_volume": 100, "final_unit": "mL",
+                        "vol_unit": "uL", "mass_unit": "mg", "fuzzy": false}
+        POST /match    {"query": "tris ph 8", "n": 5, "min_score": 0.72}
+
+    Requests are computed in a thread pool so they run concurrently. The
+    workbook is polled and reloaded when it changes (StocksWatcher: only
+    changed items are recompiled and re-indexed); if the new version fails
+    to load, the previous stocks stay in service. Fuzzy lookups are
+    memoized in `match_cache`, keyed by a fingerprint of the stock names,
+    so a reload never serves results for other stocks; entries for earlier
+    versions stay until the cache's LRU limit evicts them.
+    """
+
+    def __init__(
+        self,
+        stocks_path: str,
+        sheet_name: str = "stocks",
+        cache_dir: Optional[str] = None,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        poll_interval: float = 1.0,
+    ):
+        self.stocks_path = stocks_path
+        self.sheet_name = sheet_name
+        self.cache_dir = cache_dir
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.watcher = StocksWatcher(stocks_path, sheet_name, cache_dir)
+        self.snapshot = snapshot_of(self.watcher)
+        self.reload_count = 0
+        self.match_cache = MatchCache()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- lifecycle ----
+
+    async def serve(
+        self,
+        ready: Optional[threading.Event] = None,
+        on_listening: Optional[Callable[[str, int], None]] = None,
+    ) -> None:
+        """Serve until stop(); on_listening gets the bound (host, port) once the socket is open."""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.host, self.port = server.sockets[0].getsockname()[:2]
+        watcher = asyncio.create_task(self._watch_stocks())
+        if on_listening is not None:
+            on_listening(self.host, self.port)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await self._stop.wait()
+        finally:
+            watcher.cancel()
+
+    def start_in_thread(self) -> Tuple[str, int]:
+        """Run the server on a background thread; returns the bound (host, port)."""
+        ready = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.serve(ready)), daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.host, self.port
+
+    def stop(self) -> None:
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # ---- stocks reload ----
+
+    async def _watch_stocks(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                diff = await loop.run_in_executor(None, self.watcher.poll)
+                if diff is None:
+                    continue
+                self.snapshot = snapshot_of(self.watcher)
+                self.reload_count += 1
+            except Exception as e:
+                print(f"Stocks reload failed, keeping previous stocks: {e}", file=sys.stderr)
+
+    # ---- HTTP ----
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            status, payload = await self._handle_request(reader)
+        except RequestError as e:
+            status, payload = e.status, {"ok": False, "error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"ok": False, "error": f"Internal error: {e}"}
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n"
+        ).encode("ascii")
+        try:
+            writer.write(head + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader: asyncio.StreamReader) -> Tuple[int, Dict[str, Any]]:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise RequestError(400, "Malformed request line.")
+        method, path, _ = parts
+
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            key, _, value = line.partition(":")
+            if key.strip().lower() == "content-length":
+                try:
+                    length = int(value.strip())
+                except ValueError:
+                    raise RequestError(400, "Invalid Content-Length.")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(400, "Request body too large.")
+        try:
+            body = await reader.readexactly(length) if length else b""
+        except asyncio.IncompleteReadError:
+            raise RequestError(400, "Request body shorter than Content-Length.")
+
+        route = {
+            ("GET", "/health"): self._health,
+            ("POST", "/recipe"): self._recipe,
+            ("POST", "/match"): self._match,
+        }.get((method, path))
+        if route is None:
+            if path in ("/health", "/recipe", "/match"):
+                raise RequestError(405, f"{method} not allowed on {path}.")
+            raise RequestError(404, f"Unknown path: {path}")
+
+        try:
+            data = json.loads(body.decode("utf-8")) if body else {}
+        except ValueError:
+            raise RequestError(400, "Request body is not valid JSON.")
+        if not isinstance(data, dict):
+            raise RequestError(400, "Request body must be a JSON object.")
+
+        snapshot = self.snapshot
+        loop = asyncio.get_running_loop()
+        try:
+            return 200, await loop.run_in_executor(None, route, snapshot, data)
+        except KeyError as e:
+            raise RequestError(422, str(e.args[0]) if e.args else "Missing key.")
+        except (ValueError, TypeError) as e:
+            raise RequestError(422, str(e))
+
+    # ---- handlers (run in the thread pool) ----
+
+    def _health(self, snapshot: StocksSnapshot, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {"ok": True, "stocks": len(snapshot.stocks), "reloads": self.reload_count}
+
+    def _recipe(self, snapshot: StocksSnapshot, data: Dict[str, Any]) -> Dict[str, Any]:
+        targets = [parse_target_spec(t) for t in data.get("targets", [])]
+        matched: Dict[str, str] = {}
+        if data.get("fuzzy"):
+            min_score = float(data.get("min_score", 0.72))
+            for t in targets:
+                if t.name in snapshot.stocks:
+                    continue
+                m = self.match_cache.best_match(t.name, snapshot.index, min_score=min_score)
+                if m:
+                    matched[t.name] = m.candidate
+                    t.name = m.candidate
+        if "final_volume" not in data:
+            raise ValueError("Missing 'final_volume'.")
+        result = compute_recipe(
+            stocks=snapshot.stocks,
+            targets=targets,
+            final_volume_value=float(data["final_volume"]),
+            final_volume_unit=str(data.get("final_unit", "mL")),
+            output_volume_unit=str(data.get("vol_unit", "uL")),
+            output_mass_unit=str(data.get("mass_unit", "mg")),
+        )
+        return {"ok": True, "matched": matched, "recipe": recipe_to_dict(result)}
+
+    def _match(self, snapshot: StocksSnapshot, data: Dict[str, Any]) -> Dict[str, Any]:
+        query = str(data.get("query", ""))
+        best = self.match_cache.best_match(query, snapshot.index, min_score=float(data.get("min_score", 0.72)))
+        top = self.match_cache.top_matches(query, snapshot.index, n=int(data.get("n", 5)))
+        return {
+            "ok": True,
+            "best": {"candidate": best.candidate, "score": best.score} if best else None,
+            "top": [{"candidate": m.candidate, "score": m.score} for m in top],
+        }
+
+
+class RecipeClient:
+    """Minimal client for a local RecipeServer."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            return resp.status, json.loads(resp.read().decode("utf-8"))
+        finally:
+            conn.close()
+
+    def health(self) -> Dict[str, Any]:
+        return self.request("GET", "/health")[1]
+
+    def recipe(self, **payload: Any) -> Tuple[int, Dict[str, Any]]:
+        return self.request("POST", "/recipe", payload)
+
+    def match(self, query: str, n: int = 5, min_score: float = 0.72) -> Tuple[int, Dict[str, Any]]:
+        return self.request("POST", "/match", {"query": query, "n": n, "min_score": min_score})
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Buffer Builder server (stocks kept in memory)")
+    p.add_argument("--stocks", required=True, help="Path to stocks .xlsx, or a SQLite catalog (.db)")
+    p.add_argument("--sheet", default="stocks", help="Sheet name inside the xlsx (default: stocks)")
+    p.add_argument("--cache-dir", default="", help="Directory for the parsed-stocks cache (optional)")
+    p.add_argument("--host", default="127.0.0.1", help="Interface to bind (default 127.0.0.1)")
+    p.add_argument("--port", type=int, default=8765, help="Port to listen on (default 8765)")
+    p.add_argument("--poll", type=float, default=1.0, help="Seconds between workbook change checks (default 1)")
+    args = p.parse_args()
+
+    server = RecipeServer(
+        args.stocks,
+        sheet_name=args.sheet,
+        cache_dir=args.cache_dir or None,
+        host=args.host,
+        port=args.port,
+        poll_interval=args.poll,
+    )
+    print(f"Loaded {len(server.snapshot.stocks)} stock items.")
+
+    def listening(host: str, port: int) -> None:
+        print(f"Listening on http://{host}:{port}", flush=True)
+
+    try:
+        asyncio.run(server.serve(on_listening=listening))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from units import to_liters, to_grams
+from stocks_io import CompiledStock, StockItem, compile_stock
+from stock_store import StockStore
+from calculator import (
+    BRING_TO_VOLUME_NAME,
+    BRING_TO_VOLUME_NOTES,
+    KIND_LABELS,
+    RecipeLine,
+    RecipeResult,
+    TargetComponent,
+    _target_unit,
+)
+from profiling import timed
+
+
+# Line codes used in the columnar arrays
+STOCK_SOLUTION = 0
+POWDER_MASSVOL = 1
+POWDER_MOLAR = 2
+
+
+@dataclass
+class _TargetPlan:
+    """Everything compute_recipe derives from one (component, target unit) pair."""
+    pre_error: Optional[Exception] = None    # raised before the target value is read
+    post_error: Optional[Exception] = None   # raised after the target value is read
+    code: int = STOCK_SOLUTION
+    stock: int = -1
+    factor: float = 1.0        # target unit -> base unit (M, g/L or fraction)
+    stock_base: float = 1.0    # stock concentration in the same base unit
+    mw: float = 1.0
+    divisor: float = 1.0       # purity correction for powders
+    warning: str = ""
+
+
+@dataclass
+class BatchRecipeResult:
+    """
+    Columnar output of compute_recipes_batch.
+
+    Component lines of all recipes are stored back to back; recipe i owns
+    lines line_offsets[i]:line_offsets[i + 1]. The "bring to final volume"
+    line is kept separately in fill_volume_values.
+    """
+    final_volume_values: np.ndarray    # (R,)
+    final_volume_unit: str
+    output_volume_unit: str
+    output_mass_unit: str
+    line_offsets: np.ndarray           # (R + 1,)
+    line_stock: np.ndarray             # (L,) index into stock_names
+    line_is_powder: np.ndarray         # (L,) bool
+    add_volume_values: np.ndarray      # (L,) NaN for powder lines
+    add_mass_values: np.ndarray        # (L,) NaN for stock solution lines
+    fill_volume_values: np.ndarray     # (R,) volume of solvent/buffer to add
+    total_stock_volume_L: np.ndarray   # (R,)
+    stock_names: List[str]
+    stock_notes: List[str]
+    warnings: List[List[str]]
+
+    def __len__(self) -> int:
+        return len(self.final_volume_values)
+
+    @property
+    def line_recipe(self) -> np.ndarray:
+        """Recipe index of every component line."""
+        return np.repeat(np.arange(len(self)), np.diff(self.line_offsets))
+
+    def recipe(self, i: int) -> RecipeResult:
+        return self._build_recipe(
+            i,
+            self.add_volume_values.tolist(),
+            self.add_mass_values.tolist(),
+            self.line_is_powder.tolist(),
+            self.line_stock.tolist(),
+        )
+
+    def to_recipe_results(self) -> List[RecipeResult]:
+        vols = self.add_volume_values.tolist()
+        masses = self.add_mass_values.tolist()
+        powders = self.line_is_powder.tolist()
+        stock_idx = self.line_stock.tolist()
+        return [self._build_recipe(i, vols, masses, powders, stock_idx) for i in range(len(self))]
+
+    def iter_recipes(self, chunk_size: int = 1024) -> Iterator[RecipeResult]:
+        """
+        RecipeResults one at a time, for streaming exports. Line columns are
+        converted a chunk of recipes at a time, so only one chunk of
+        RecipeResults exists at once (unlike to_recipe_results).
+        """
+        offsets = self.line_offsets.tolist()
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            lo, hi = offsets[start], offsets[stop]
+            cols = (
+                self.add_volume_values[lo:hi].tolist(),
+                self.add_mass_values[lo:hi].tolist(),
+                self.line_is_powder[lo:hi].tolist(),
+                self.line_stock[lo:hi].tolist(),
+            )
+            for i in range(start, stop):
+                yield self._build_recipe(i, *cols, base=lo)
+
+    def to_matrix(self, recipe_ids: Optional[Sequence] = None):
+        """Sparse component x recipe matrix (recipe_matrix.RecipeMatrix), built without RecipeLines."""
+        from recipe_matrix import matrix_from_batch
+
+        return matrix_from_batch(self, recipe_ids)
+
+    def _build_recipe(self, i, vols, masses, powders, stock_idx, base: int = 0) -> RecipeResult:
+        lines: List[RecipeLine] = []
+        for j in range(int(self.line_offsets[i]) - base, int(self.line_offsets[i + 1]) - base):
+            s = stock_idx[j]
+            if powders[j]:
+                lines.append(
+                    RecipeLine(
+                        name=self.stock_names[s],
+                        source_type="powder",
+                        add_mass_value=masses[j],
+                        add_mass_unit=self.output_mass_unit,
+                        notes=self.stock_notes[s],
+                    )
+                )
+            else:
+                lines.append(
+                    RecipeLine(
+                        name=self.stock_names[s],
+                        source_type="stock_solution",
+                        add_volume_value=vols[j],
+                        add_volume_unit=self.output_volume_unit,
+                        notes=self.stock_notes[s],
+                    )
+                )
+        lines.append(
+            RecipeLine(
+                name=BRING_TO_VOLUME_NAME,
+                source_type="stock_solution",
+                add_volume_value=float(self.fill_volume_values[i]),
+                add_volume_unit=self.output_volume_unit,
+                notes=BRING_TO_VOLUME_NOTES,
+            )
+        )
+        return RecipeResult(
+            final_volume_value=float(self.final_volume_values[i]),
+            final_volume_unit=self.final_volume_unit,
+            lines=lines,
+            warnings=list(self.warnings[i]),
+        )
+
+
+def _unit_factor(convert, unit: str) -> Tuple[float, Optional[Exception]]:
+    try:
+        return convert(1.0, unit), None
+    except ValueError as e:
+        return float("nan"), e
+
+
+def _plan_target(
+    stocks: Mapping[str, Union[StockItem, CompiledStock]],
+    name: str,
+    unit: str,
+    stock_pos: Dict[str, int],
+    stock_names: List[str],
+    stock_notes: List[str],
+    out_vol_error: Optional[Exception],
+    out_mass_error: Optional[Exception],
+) -> _TargetPlan:
+    """Mirror the per-target checks of compute_recipe, in the same order."""
+    if name not in stocks:
+        return _TargetPlan(pre_error=KeyError(f"Component '{name}' not found in stocks."))
+    item = compile_stock(stocks[name])
+    try:
+        target_unit = _target_unit(unit)
+    except ValueError as e:
+        return _TargetPlan(pre_error=e)
+    kind = target_unit.dimension
+
+    if name not in stock_pos:
+        stock_pos[name] = len(stock_names)
+        stock_names.append(item.name)
+        stock_notes.append(item.notes)
+    plan = _TargetPlan(stock=stock_pos[name])
+
+    if item.type == "stock_solution":
+        if item.conc_kind is None:
+            plan.pre_error = ValueError(f"Stock solution '{item.name}' missing concentration in stocks file.")
+            return plan
+        plan.code = STOCK_SOLUTION
+        plan.factor = target_unit.factor
+        if item.conc_kind != kind:
+            label, suggestion = KIND_LABELS[kind]
+            plan.post_error = ValueError(
+                f"Target for '{name}' is {label} ({unit}) but stock is {item.conc_kind} "
+                f"({item.conc_unit}). Use {suggestion} stock or change target unit."
+            )
+            return plan
+        if item.conc_error is not None:
+            plan.post_error = item.conc_error
+            return plan
+        plan.stock_base = item.conc_base
+        if plan.stock_base <= 0:
+            plan.post_error = ValueError(f"Invalid stock concentration for '{name}'.")
+            return plan
+        plan.post_error = out_vol_error
+
+    elif item.type == "powder":
+        if kind == "volvol":
+            plan.pre_error = ValueError(
+                f"Cannot use v/v% concentration ({unit}) with powder stock for '{name}'. "
+                f"Use molar or mass/vol units instead."
+            )
+            return plan
+        if kind == "fold":
+            plan.pre_error = ValueError(
+                f"Cannot use X-fold concentration ({unit}) with powder stock for '{name}'. "
+                f"Use molar or mass/vol units instead."
+            )
+            return plan
+        if kind == "massvol":
+            plan.code = POWDER_MASSVOL
+            plan.factor = target_unit.factor
+        else:
+            if item.mw_g_per_mol is None or item.mw_g_per_mol <= 0:
+                plan.pre_error = ValueError(
+                    f"Powder '{item.name}' requires mw_g_per_mol in stocks file for molar targets."
+                )
+                return plan
+            plan.code = POWDER_MOLAR
+            plan.factor = target_unit.factor
+            plan.mw = item.mw_g_per_mol
+        if item.purity_fraction == 0:
+            plan.post_error = ZeroDivisionError("float division by zero")
+        elif item.purity_fraction < 1.0:
+            plan.divisor = item.purity_fraction
+            plan.warning = f"'{item.name}': adjusted mass for purity_fraction={item.purity_fraction:g}."
+        if plan.post_error is None:
+            plan.post_error = out_mass_error
+
+    else:
+        plan.pre_error = ValueError(f"Unknown stock type: {item.type}")
+
+    return plan
+
+
+@timed("compute_recipes_batch")
+def compute_recipes_batch(
+    stocks: Mapping[str, Union[StockItem, CompiledStock]],
+    target_sets: Sequence[Sequence[TargetComponent]],
+    final_volume_values: Union[float, Sequence[float]],
+    final_volume_unit: str = "mL",
+    output_volume_unit: str = "uL",
+    output_mass_unit: str = "mg",
+) -> BatchRecipeResult:
+    """
+    Compute many recipes in one pass.
+
+    Gives the same numbers and warnings as calling compute_recipe for every
+    target set, and raises the error compute_recipe would raise for the first
+    failing recipe. Each (component, unit) pair is resolved once per batch;
+    volumes and masses are then computed with NumPy array arithmetic.
+    """
+    target_sets = list(target_sets)
+    n = len(target_sets)
+    if isinstance(stocks, StockStore):
+        stocks = stocks.fetch(t.name for ts in target_sets for t in ts)
+    if isinstance(final_volume_values, (int, float)):
+        volumes = [final_volume_values] * n
+    else:
+        volumes = list(final_volume_values)
+        if len(volumes) != n:
+            raise ValueError("final_volume_values must have one entry per target set.")
+
+    vol_factor, vol_error = _unit_factor(to_liters, final_volume_unit)
+    out_vol_factor, out_vol_error = _unit_factor(to_liters, output_volume_unit)
+    out_mass_factor, out_mass_error = _unit_factor(to_grams, output_mass_unit)
+
+    stock_pos: Dict[str, int] = {}
+    stock_names: List[str] = []
+    stock_notes: List[str] = []
+    plan_pos: Dict[Tuple[str, str], int] = {}
+    plans: List[_TargetPlan] = []
+
+    V_L = np.empty(n, dtype=float)
+    counts = np.zeros(n, dtype=np.intp)
+    line_plan: List[int] = []
+    line_value: List[float] = []
+
+    for r in range(n):
+        if vol_error is not None:
+            raise vol_error
+        V_L[r] = float(volumes[r]) * vol_factor
+        targets = target_sets[r]
+        for t in targets:
+            key = (t.name, t.final_unit)
+            p = plan_pos.get(key)
+            if p is None:
+                p = plan_pos[key] = len(plans)
+                plans.append(
+                    _plan_target(
+                        stocks, t.name, t.final_unit, stock_pos, stock_names, stock_notes,
+                        out_vol_error, out_mass_error,
+                    )
+                )
+            plan = plans[p]
+            if plan.pre_error is not None:
+                raise plan.pre_error
+            line_value.append(float(t.final_value))
+            if plan.post_error is not None:
+                raise plan.post_error
+            line_plan.append(p)
+        if out_vol_error is not None:
+            raise out_vol_error
+        counts[r] = len(targets)
+
+    lp = np.asarray(line_plan, dtype=np.intp)
+    code = np.array([p.code for p in plans], dtype=np.int8)[lp]
+    factor = np.array([p.factor for p in plans], dtype=float)[lp]
+    stock_base = np.array([p.stock_base for p in plans], dtype=float)[lp]
+    mw = np.array([p.mw for p in plans], dtype=float)[lp]
+    divisor = np.array([p.divisor for p in plans], dtype=float)[lp]
+    line_stock = np.array([p.stock for p in plans], dtype=np.intp)[lp]
+
+    offsets = np.zeros(n + 1, dtype=np.intp)
+    np.cumsum(counts, out=offsets[1:])
+    line_recipe = np.repeat(np.arange(n), counts)
+
+    # Same operation order as compute_recipe so results match bit for bit.
+    amount = (np.asarray(line_value, dtype=float) * factor) * V_L[line_recipe]
+    is_powder = code != STOCK_SOLUTION
+    vol_L = np.where(is_powder, 0.0, amount / stock_base)
+    grams = np.where(code == POWDER_MOLAR, amount * mw, amount) / divisor
+
+    add_volume = np.where(is_powder, np.nan, vol_L / out_vol_factor)
+    add_mass = np.where(is_powder, grams / out_mass_factor, np.nan)
+
+    # bincount accumulates in line order, like the running sum in compute_recipe
+    total_L = np.bincount(line_recipe, weights=vol_L, minlength=n).astype(float)
+    remaining_L = V_L - total_L
+    remaining_L = np.where(remaining_L > 0.0, remaining_L, 0.0)
+
+    warnings: List[List[str]] = [[] for _ in range(n)]
+    plan_warnings = [p.warning for p in plans]
+    for j in np.flatnonzero(divisor < 1.0).tolist():
+        warnings[line_recipe[j]].append(plan_warnings[line_plan[j]])
+    for r in np.flatnonzero(total_L > V_L).tolist():
+        warnings[r].append(
+            f"Total stock volumes ({float(total_L[r]):.6g} L) exceed final volume "
+            f"({float(V_L[r]):.6g} L). Check targets/stock concentrations."
+        )
+
+    return BatchRecipeResult(
+        final_volume_values=np.array([float(v) for v in volumes], dtype=float),
+        final_volume_unit=final_volume_unit,
+        output_volume_unit=output_volume_unit,
+        output_mass_unit=output_mass_unit,
+        line_offsets=offsets,
+        line_stock=line_stock,
+        line_is_powder=is_powder,
+        add_volume_values=add_volume,
+        add_mass_values=add_mass,
+        fill_volume_values=remaining_L / out_vol_factor,
+        total_stock_volume_L=total_L,
+        stock_names=stock_names,
+        stock_notes=stock_notes,
+        warnings=warnings,
+    )
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import itertools
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Union
+
+from stocks_io import CompiledStock, StockItem, compile_stocks
+from stock_store import StockStore
+from fuzzy_match import CandidateIndex
+from jobs import JobOutcome, RecipeJob, run_jobs
+from match_cache import MatchCache
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+
+# Per-process state, set once by _init_worker so stocks are not pickled with every chunk.
+_worker_stocks: Mapping[str, CompiledStock] = {}
+_worker_index: Optional[CandidateIndex] = None
+_worker_min_score: float = 0.72
+_worker_cache: Optional[MatchCache] = None
+
+
+def _init_worker(
+    stocks: Dict[str, StockItem], fuzzy: bool, min_score: float, cache: Optional[MatchCache] = None
+) -> None:
+    global _worker_stocks, _worker_index, _worker_min_score, _worker_cache
+    _worker_stocks = _compiled(stocks)
+    _worker_index = CandidateIndex(stocks.keys()) if fuzzy else None
+    _worker_min_score = min_score
+    _worker_cache = cache
+
+
+def _compiled(stocks: Mapping[str, StockItem]) -> Mapping[str, CompiledStock]:
+    # catalogs are queried per recipe; only in-memory dicts are compiled up front
+    return stocks if isinstance(stocks, StockStore) else compile_stocks(stocks)
+
+
+def _run_chunk(chunk: List[Union[RecipeJob, JobOutcome]]) -> List[JobOutcome]:
+    return list(run_jobs(_worker_stocks, chunk, _worker_index, _worker_min_score, _worker_cache))
+
+
+def run_jobs_parallel(
+    stocks: Dict[str, StockItem],
+    jobs: Iterable[Union[RecipeJob, JobOutcome]],
+    workers: int = 2,
+    chunk_size: int = 64,
+    fuzzy: bool = False,
+    min_score: float = 0.72,
+    max_pending: Optional[int] = None,
+    match_cache: Optional[MatchCache] = None,
+) -> Iterator[JobOutcome]:
+    """
+    Compute jobs on a process pool and yield outcomes in input order.
+
+    Each worker receives the stocks once (pool initializer), compiles them
+    (stocks_io.compile_stocks) and builds its own fuzzy index when `fuzzy`
+    is set. Jobs are sent in chunks, and at most `max_pending` chunks
+    (default 4 per worker) are in flight, so input is read and output
+    produced as a stream. Outcomes are identical to
+    jobs.run_jobs with the same arguments. workers <= 1 runs serially.
+
+    With fuzzy matching, lookups go through `match_cache`. Each worker
+    process gets its own copy, so only the serial path adds new entries
+    to the caller's cache.
+    """
+    if workers <= 1:
+        index = CandidateIndex(stocks.keys()) if fuzzy else None
+        yield from run_jobs(_compiled(stocks), jobs, index, min_score, match_cache)
+        return
+
+    # multiprocessing is imported only when a pool is needed (CLI startup time)
+    from concurrent.futures import ProcessPoolExecutor
+
+    max_pending = max_pending or workers * 4
+    it = iter(jobs)
+    pending: Deque[Future] = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(stocks, fuzzy, min_score, match_cache),
+    ) as pool:
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(itertools.islice(it, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_run_chunk, chunk))
+            if not pending:
+                break
+            yield from pending.popleft().result()
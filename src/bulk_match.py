@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import csv
+import heapq
+import itertools
+import json
+from collections import deque
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from fuzzy_match import CandidateIndex, Match, extract_key_terms, normalize_name
+from profiling import count
+
+
+@dataclass
+class Reconciliation:
+    """Bulk lookup result for one query: best match (or None below min_score) and the top k."""
+    query: str
+    best: Optional[Match]
+    top: List[Match]
+
+
+class BulkMatcher:
+    """
+    Score many queries against one catalog with NumPy score vectors.
+
+    For each query, the containment and key-term-overlap scores of every
+    candidate are computed as arrays (substring hits come from the n-gram
+    index, term overlap from term postings). The sequence ratio cannot be
+    vectorized, so it is bounded from above, first by the name lengths and
+    then by shared character counts (difflib's quick_ratio), and only
+    candidates whose bound can still reach the top k are run through
+    SequenceMatcher. Scores, best matches and top-k lists are identical to
+    fuzzy_match.best_match / top_matches over the plain candidate list.
+    """
+
+    def __init__(self, candidates: Iterable[str]):
+        self.index = candidates if isinstance(candidates, CandidateIndex) else CandidateIndex(candidates)
+        # snapshot of the catalog; the arrays below are aligned with it
+        self._names = self.index.candidates
+        self._norms = norms = self.index.norms
+        m = len(norms)
+        self._lens = np.fromiter((len(n) for n in norms), dtype=np.float64, count=m)
+        self._term_counts = np.fromiter((len(t) for t in self.index.key_terms), dtype=np.float64, count=m)
+
+        by_norm: Dict[str, List[int]] = {}
+        term_postings: Dict[str, List[int]] = {}
+        for pos, (norm, terms) in enumerate(zip(norms, self.index.key_terms)):
+            by_norm.setdefault(norm, []).append(pos)
+            for t in terms:
+                term_postings.setdefault(t, []).append(pos)
+        self._by_norm = {k: np.asarray(v, dtype=np.intp) for k, v in by_norm.items()}
+        self._term_postings = {k: np.asarray(v, dtype=np.intp) for k, v in term_postings.items()}
+
+        # character histograms (M x alphabet) for the quick_ratio bound
+        alphabet = sorted({ch for n in norms for ch in n})
+        self._char_col = {ch: i for i, ch in enumerate(alphabet)}
+        self._hist = np.zeros((m, max(len(alphabet), 1)), dtype=np.int32)
+        for pos, norm in enumerate(norms):
+            for ch in norm:
+                self._hist[pos, self._char_col[ch]] += 1
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _known_scores(self, q_norm: str, q_terms: set) -> np.ndarray:
+        """max(containment, term overlap) for every candidate, as similarity() computes them."""
+        m = len(self.index)
+        la = len(q_norm)
+        lens = self._lens
+        known = np.zeros(m, dtype=np.float64)
+
+        # candidates containing the query
+        inside = np.asarray(self.index.containing(q_norm), dtype=np.intp)
+        if inside.size:
+            known[inside] = 0.7 + (la / lens[inside]) * 0.3
+        # candidates contained in the query
+        seen = set()
+        for i in range(la):
+            for j in range(i + 1, la + 1):
+                sub = q_norm[i:j]
+                if sub in seen:
+                    continue
+                seen.add(sub)
+                pos = self._by_norm.get(sub)
+                if pos is not None and sub != q_norm:
+                    known[pos] = 0.7 + (lens[pos] / la) * 0.3
+
+        if q_terms:
+            hits = [self._term_postings[t] for t in q_terms if t in self._term_postings]
+            if hits:
+                inter = np.bincount(np.concatenate(hits), minlength=m).astype(np.float64)
+                tc = self._term_counts
+                has_terms = tc > 0
+                union = np.where(has_terms, len(q_terms) + tc - inter, 1.0)
+                overlap = np.where(has_terms, inter / union, 0.0)
+                overlap = np.where(has_terms & (inter == len(q_terms)), np.maximum(overlap, 0.75), overlap)
+                np.maximum(known, overlap, out=known)
+
+        exact = self._by_norm.get(q_norm)
+        if exact is not None:
+            known[exact] = 1.0
+        return known
+
+    def _scores_for(self, q_norm: str, q_terms: set, k: int):
+        """(positions, exact scores) covering every candidate that can be in the top k."""
+        m = len(self.index)
+        if not q_norm:
+            return np.arange(m), np.zeros(m)
+        known = self._known_scores(q_norm, q_terms)
+        la = float(len(q_norm))
+        lens = self._lens
+        total = la + lens
+
+        # k-th best known score: anything that cannot reach it is out of the top k
+        if m > k:
+            floor = np.partition(known, m - k)[m - k]
+        else:
+            floor = -1.0
+        seq_bound = np.where(total > 0, 2.0 * np.minimum(la, lens) / np.where(total > 0, total, 1.0), 0.0)
+        pos = np.flatnonzero(np.maximum(known, seq_bound) >= floor)
+
+        hq = np.zeros(self._hist.shape[1], dtype=np.int32)
+        for ch in q_norm:
+            col = self._char_col.get(ch)
+            if col is not None:
+                hq[col] += 1
+        shared = np.minimum(self._hist[pos], hq).sum(axis=1)
+        seq_bound = 2.0 * shared / total[pos]
+        keep = np.maximum(known[pos], seq_bound) >= floor
+        pos = pos[keep]
+        seq_bound = seq_bound[keep]
+
+        # Exact scores in decreasing order of their upper bound; stop once no
+        # remaining candidate can reach the current k-th best exact score.
+        upper = np.maximum(known[pos], seq_bound)
+        order = np.lexsort((pos, -upper))
+        norms = self._norms
+        heap: List[tuple] = []      # (score, -position) of the best k so far
+        out_pos: List[int] = []
+        out_scores: List[float] = []
+        ratios = 0
+        for i in order:
+            if len(heap) == k and upper[i] < heap[0][0]:
+                break
+            p = int(pos[i])
+            score = float(known[p])
+            if lens[p] == 0:
+                score = 0.0
+            elif seq_bound[i] > score:
+                ratios += 1
+                score = max(score, SequenceMatcher(None, q_norm, norms[p]).ratio())
+            out_pos.append(p)
+            out_scores.append(score)
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -p))
+            elif (score, -p) > heap[0]:
+                heapq.heapreplace(heap, (score, -p))
+        count("bulk_match.sequence_ratios", ratios)
+        return np.asarray(out_pos, dtype=np.intp), np.asarray(out_scores, dtype=np.float64)
+
+    def match(self, query: str, k: int = 5, min_score: float = 0.72) -> Reconciliation:
+        q_norm = normalize_name(query)
+        pos, scores = self._scores_for(q_norm, extract_key_terms(query), max(k, 1))
+        order = np.lexsort((pos, -scores))[:max(k, 1)]
+        names = self._names
+        ranked = [Match(query=query, candidate=names[pos[i]], score=float(scores[i])) for i in order]
+        best = ranked[0] if ranked and ranked[0].score >= min_score else None
+        return Reconciliation(query=query, best=best, top=ranked[:k])
+
+
+# Per-process matcher for reconcile_bulk workers
+_worker_matcher: Optional[BulkMatcher] = None
+
+
+def _init_worker(candidates: List[str]) -> None:
+    global _worker_matcher
+    _worker_matcher = BulkMatcher(candidates)
+
+
+def _match_chunk(queries: List[str], k: int, min_score: float) -> List[Reconciliation]:
+    return [_worker_matcher.match(q, k, min_score) for q in queries]
+
+
+def reconcile_bulk(
+    queries: Iterable[str],
+    candidates: Iterable[str],
+    k: int = 5,
+    min_score: float = 0.72,
+    workers: int = 1,
+    chunk_size: int = 128,
+) -> Iterator[Reconciliation]:
+    """
+    Best match and top k candidates for every query, in input order.
+
+    workers > 1 spreads chunks of queries over a process pool; each worker
+    builds the matcher once.
+    """
+    if workers <= 1:
+        matcher = BulkMatcher(candidates)
+        for q in queries:
+            yield matcher.match(q, k, min_score)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    names = list(candidates)
+    it = iter(queries)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(names,)) as pool:
+        pending: deque = deque()
+        while True:
+            while len(pending) < workers * 4:
+                chunk = list(itertools.islice(it, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_match_chunk, chunk, k, min_score))
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[str]:
+    """One name per line; blank lines are skipped."""
+    for line in lines:
+        name = line.strip()
+        if name:
+            yield name
+
+
+RECONCILE_CSV_FIELDS = ["query", "match", "score", "alternatives"]
+
+
+def write_reconciliation(results: Iterable[Reconciliation], out: IO[str], fmt: str = "csv") -> Dict[str, int]:
+    """
+    Stream a report: CSV (query, match, score, alternatives as 'name (score)'
+    joined by '; ') or JSONL. Returns {"queries": n, "unmatched": n}.
+    """
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Unsupported reconcile output format: {fmt}")
+    counts = {"queries": 0, "unmatched": 0}
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=RECONCILE_CSV_FIELDS, lineterminator="\n")
+        writer.writeheader()
+    for r in results:
+        counts["queries"] += 1
+        if r.best is None:
+            counts["unmatched"] += 1
+        if writer is None:
+            out.write(json.dumps({
+                "query": r.query,
+                "match": r.best.candidate if r.best else None,
+                "score": r.best.score if r.best else None,
+                "top": [{"candidate": m.candidate, "score": m.score} for m in r.top],
+            }) + "\n")
+        else:
+            writer.writerow({
+                "query": r.query,
+                "match": r.best.candidate if r.best else "",
+                "score": f"{r.best.score:.4f}" if r.best else "",
+                "alternatives": "; ".join(f"{m.candidate} ({m.score:.2f})" for m in r.top),
+            })
+    return counts
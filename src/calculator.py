@@ -1,21 +1,32 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Optional, Literal, Dict
+from typing import Callable, List, Optional, Literal, Mapping, Union
 
 from units import (
     to_liters,
     from_liters,
-    parse_concentration,
-    molar_to_M,
-    massvol_to_g_per_L,
-    volvol_to_fraction,
+    Unit,
+    lookup_unit,
     from_grams,
 )
-from stocks_io import StockItem
+from stocks_io import CompiledStock, StockItem, compile_stock
+from stock_store import StockStore
+from profiling import timed
 
 
-TargetKind = Literal["molar", "massvol", "volvol"]
+TargetKind = Literal["molar", "massvol", "volvol", "fold"]
+
+# kind -> (label used in messages, stock suggestion)
+KIND_LABELS = {
+    "molar": ("molar", "a molar"),
+    "massvol": ("mass/vol", "a mass/vol"),
+    "volvol": ("v/v", "a v/v"),
+    "fold": ("X-fold", "an X-fold"),
+}
+
+BRING_TO_VOLUME_NAME = "Bring to final volume (solvent/buffer)"
+BRING_TO_VOLUME_NOTES = "Add solvent/buffer to reach final volume."
 
 
 @dataclass
@@ -29,7 +40,7 @@ class TargetComponent:
 @dataclass
 class RecipeLine:
     name: str
-    source_type: Literal["stock_solution", "powder"]
+    source_type: Literal["stock_solution", "powder", "master_mix", "dilution"]
     # for stock_solution
     add_volume_value: Optional[float] = None
     add_volume_unit: str = "uL"
@@ -48,83 +59,75 @@ class RecipeResult:
     warnings: List[str]
 
 
+def _target_unit(unit: str) -> Unit:
+    u = lookup_unit(unit)
+    # molal targets would need the solution density to become volumes
+    if u is None or u.dimension not in KIND_LABELS:
+        raise ValueError(f"Unsupported target unit: {unit}")
+    return u
+
+
 def _target_kind_from_unit(unit: str) -> TargetKind:
-    u = (unit or "").strip().lower().replace("µ", "u").replace("μ", "u")
-    # molar: M, mM, uM ...
-    if u in ("m", "mm", "um", "nm", "pm"):
-        return "molar"
-    # mass/vol
-    if u in ("g/l", "mg/ml", "ug/ml", "ng/ml", "mg/l", "ug/ul"):
-        return "massvol"
-    # v/v percent
-    if u in ("%", "v/v%"):
-        return "volvol"
-    raise ValueError(f"Unsupported target unit: {unit}")
+    return _target_unit(unit).dimension
 
 
+@timed("compute_recipe")
 def compute_recipe(
-    stocks: Dict[str, StockItem],
+    stocks: Mapping[str, Union[StockItem, CompiledStock]],
     targets: List[TargetComponent],
     final_volume_value: float,
     final_volume_unit: str = "mL",
     output_volume_unit: str = "uL",
     output_mass_unit: str = "mg",
+    progress: Optional[Callable[[str, Optional[float]], None]] = None,
 ) -> RecipeResult:
+    """
+    Volumes and masses to add for each target, then solvent to bring to
+    volume. `progress(message, fraction)` is called before each target and
+    may raise to abort (e.g. a GUI cancel).
+    """
     warnings: List[str] = []
 
+    if isinstance(stocks, StockStore):
+        # only the referenced stocks are read from the catalog
+        stocks = stocks.fetch(t.name for t in targets)
+
     V_L = to_liters(final_volume_value, final_volume_unit)
 
     lines: List[RecipeLine] = []
     total_stock_vol_L = 0.0
 
-    for t in targets:
+    for i, t in enumerate(targets):
+        if progress is not None:
+            progress(f"Component {i + 1}/{len(targets)}: {t.name}", i / len(targets))
         if t.name not in stocks:
             raise KeyError(f"Component '{t.name}' not found in stocks.")
 
-        item = stocks[t.name]
-        kind = _target_kind_from_unit(t.final_unit)
+        item = compile_stock(stocks[t.name])
+        unit = _target_unit(t.final_unit)
+        kind = unit.dimension
 
         if item.type == "stock_solution":
-            if item.concentration is None:
+            if item.conc_kind is None:
                 raise ValueError(f"Stock solution '{item.name}' missing concentration in stocks file.")
 
-            # Determine stock conc in same "space" (molar or mass/vol or v/v)
-            if kind == "molar":
-                C_final_M = molar_to_M(t.final_value, t.final_unit)
-                if item.concentration.kind != "molar":
-                    raise ValueError(
-                        f"Target for '{t.name}' is molar ({t.final_unit}) but stock is {item.concentration.kind} "
-                        f"({item.concentration.unit}). Use a molar stock or change target unit."
-                    )
-                C_stock_M = item.concentration.as_M()
-                if C_stock_M <= 0:
-                    raise ValueError(f"Invalid stock concentration for '{t.name}'.")
-                V_add_L = (C_final_M * V_L) / C_stock_M
-
-            elif kind == "massvol":
-                g_per_L_final = massvol_to_g_per_L(t.final_value, t.final_unit)
-                if item.concentration.kind != "massvol":
-                    raise ValueError(
-                        f"Target for '{t.name}' is mass/vol ({t.final_unit}) but stock is {item.concentration.kind} "
-                        f"({item.concentration.unit}). Use a mass/vol stock or change target unit."
-                    )
-                g_per_L_stock = item.concentration.as_g_per_L()
-                if g_per_L_stock <= 0:
-                    raise ValueError(f"Invalid stock concentration for '{t.name}'.")
-                V_add_L = (g_per_L_final * V_L) / g_per_L_stock
-
-            else:  # kind == "volvol"
-                # For v/v%, the calculation is simple: final_fraction * final_volume = volume_to_add
-                fraction_final = volvol_to_fraction(t.final_value, t.final_unit)
-                if item.concentration.kind != "volvol":
-                    raise ValueError(
-                        f"Target for '{t.name}' is v/v ({t.final_unit}) but stock is {item.concentration.kind} "
-                        f"({item.concentration.unit}). Use a v/v stock or change target unit."
-                    )
-                fraction_stock = item.concentration.as_fraction()
-                if fraction_stock <= 0:
-                    raise ValueError(f"Invalid stock concentration for '{t.name}'.")
-                V_add_L = (fraction_final * V_L) / fraction_stock
+            # Stock and target must be in the same "space" (molar, mass/vol,
+            # v/v or X-fold); then V_add = C_final * V / C_stock in base units.
+            # Compiled stocks already hold C_stock in the base unit.
+            C_final = float(t.final_value) * unit.factor
+            if item.conc_kind != kind:
+                label, suggestion = KIND_LABELS[kind]
+                raise ValueError(
+                    f"Target for '{t.name}' is {label} ({t.final_unit}) but stock is {item.conc_kind} "
+                    f"({item.conc_unit}). Use {suggestion} stock or change target unit."
+                )
+
+            if item.conc_error is not None:
+                raise item.conc_error
+            C_stock = item.conc_base
+            if C_stock <= 0:
+                raise ValueError(f"Invalid stock concentration for '{t.name}'.")
+            V_add_L = (C_final * V_L) / C_stock
 
             total_stock_vol_L += V_add_L
             lines.append(
@@ -133,22 +136,27 @@ def compute_recipe(
                     source_type="stock_solution",
                     add_volume_value=from_liters(V_add_L, output_volume_unit),
                     add_volume_unit=output_volume_unit,
-                    notes=(item.notes or "").strip(),
+                    notes=item.notes,
                 )
             )
 
         elif item.type == "powder":
             # For powder, we compute mass needed for final concentration.
-            # Note: v/v% is not applicable for powder stocks
+            # Note: v/v% and X-fold are not applicable for powder stocks
             if kind == "volvol":
                 raise ValueError(
                     f"Cannot use v/v% concentration ({t.final_unit}) with powder stock for '{t.name}'. "
                     f"Use molar or mass/vol units instead."
                 )
-            
+            if kind == "fold":
+                raise ValueError(
+                    f"Cannot use X-fold concentration ({t.final_unit}) with powder stock for '{t.name}'. "
+                    f"Use molar or mass/vol units instead."
+                )
+
             if kind == "massvol":
                 # final g/L * V(L) = grams
-                g_per_L_final = massvol_to_g_per_L(t.final_value, t.final_unit)
+                g_per_L_final = float(t.final_value) * unit.factor
                 grams = g_per_L_final * V_L
 
             else:
@@ -157,9 +165,9 @@ def compute_recipe(
                     raise ValueError(
                         f"Powder '{item.name}' requires mw_g_per_mol in stocks file for molar targets."
                     )
-                C_final_M = molar_to_M(t.final_value, t.final_unit)
+                C_final_M = float(t.final_value) * unit.factor
                 moles = C_final_M * V_L
-                grams = moles * float(item.mw_g_per_mol)
+                grams = moles * item.mw_g_per_mol
 
             # Correct for purity
             if item.purity_fraction < 1.0:
@@ -174,7 +182,7 @@ def compute_recipe(
                     source_type="powder",
                     add_mass_value=from_grams(grams, output_mass_unit),
                     add_mass_unit=output_mass_unit,
-                    notes=(item.notes or "").strip(),
+                    notes=item.notes,
                 )
             )
         else:
@@ -190,11 +198,11 @@ def compute_recipe(
     # Add "water/buffer to volume" helper line
     lines.append(
         RecipeLine(
-            name="Bring to final volume (solvent/buffer)",
+            name=BRING_TO_VOLUME_NAME,
             source_type="stock_solution",
             add_volume_value=from_liters(remaining_L, output_volume_unit),
             add_volume_unit=output_volume_unit,
-            notes="Add solvent/buffer to reach final volume.",
+            notes=BRING_TO_VOLUME_NOTES,
         )
     )
 
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from stocks_io import StockItem, item_to_record, record_to_item, stocks_to_dict
+from stock_store import COLUMNAR_SUFFIX, StockStore, is_columnar_path, load_stocks_dict
+from profiling import count, timed
+
+
+# Bump whenever the file set or a column's encoding changes.
+FORMAT_VERSION = 1
+
+# string columns: <col>.blob.npy (UTF-8 bytes) + <col>.offsets.npy (n + 1 int64)
+_TEXT_COLUMNS = ("name", "solvent", "notes")
+# small-vocabulary columns: <col>.npy int16 codes into meta["vocab"][col]; -1 = None
+_CODED_COLUMNS = ("type", "conc_kind", "conc_unit")
+# float columns: NaN = None
+_FLOAT_COLUMNS = ("conc_value", "mw_g_per_mol", "purity_fraction")
+
+
+def _encode_text(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _encode_codes(values: List[Optional[str]]) -> Tuple[np.ndarray, List[str]]:
+    vocab: List[str] = []
+    code_of: Dict[str, int] = {}
+    codes = np.empty(len(values), dtype=np.int16)
+    for i, v in enumerate(values):
+        if v is None:
+            codes[i] = -1
+            continue
+        c = code_of.get(v)
+        if c is None:
+            c = code_of[v] = len(vocab)
+            vocab.append(v)
+        codes[i] = c
+    return codes, vocab
+
+
+@timed("write_columnar")
+def write_columnar(items: Iterable[StockItem], path: str) -> int:
+    """
+    Write the catalog as a directory of .npy columns; duplicate names keep
+    the last item, like stocks_to_dict. Replaces an existing catalog at
+    `path` only once the new one is complete. Returns the row count.
+    """
+    records = [item_to_record(i) for i in stocks_to_dict(list(items)).values()]
+    columns = list(zip(*records)) if records else [()] * 9
+    by_name = dict(zip(
+        ("name", "type", "conc_kind", "conc_value", "conc_unit", "mw_g_per_mol", "purity_fraction", "solvent", "notes"),
+        columns,
+    ))
+
+    tmp = f"{path.rstrip('/')}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp)
+    try:
+        for col in _TEXT_COLUMNS:
+            blob, offsets = _encode_text(list(by_name[col]))
+            np.save(os.path.join(tmp, f"{col}.blob.npy"), blob)
+            np.save(os.path.join(tmp, f"{col}.offsets.npy"), offsets)
+        vocab = {}
+        for col in _CODED_COLUMNS:
+            codes, vocab[col] = _encode_codes(list(by_name[col]))
+            np.save(os.path.join(tmp, f"{col}.npy"), codes)
+        for col in _FLOAT_COLUMNS:
+            values = np.array([np.nan if v is None else v for v in by_name[col]], dtype=np.float64)
+            np.save(os.path.join(tmp, f"{col}.npy"), values)
+        # row numbers sorted by UTF-8 name, for binary-search lookups
+        order = sorted(range(len(records)), key=lambda i: records[i][0].encode("utf-8"))
+        np.save(os.path.join(tmp, "name_order.npy"), np.asarray(order, dtype=np.int64))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "rows": len(records), "vocab": vocab}, f)
+
+        old = None
+        if os.path.exists(path):
+            old = f"{tmp}.old"
+            os.replace(path, old)
+        os.replace(tmp, path)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return len(records)
+
+
+class ColumnarStockStore(StockStore):
+    """
+    Read-only catalog backed by memory-mapped NumPy columns.
+
+    Opening maps the files without reading rows, so it costs the same for
+    ten stocks or a million. Names are found by binary search over a
+    stored sort order, and a StockItem is only built for a name that is
+    actually fetched. names() decodes the name column once (for fuzzy
+    indexes) and keeps it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except OSError:
+            raise FileNotFoundError(f"Columnar stock catalog not found: {path}")
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar catalog version in {path}: {meta.get('version')}")
+        self._rows: int = meta["rows"]
+        self._vocab: Dict[str, List[str]] = meta["vocab"]
+        # memoryviews over the mapped arrays: zero-copy, and plain-int
+        # indexing is much cheaper than slicing np.memmap objects
+        self._cols: Dict[str, memoryview] = {}
+        for col in _TEXT_COLUMNS:
+            self._cols[f"{col}.blob"] = self._map(f"{col}.blob")
+            self._cols[f"{col}.offsets"] = self._map(f"{col}.offsets")
+        for col in _CODED_COLUMNS + _FLOAT_COLUMNS + ("name_order",):
+            self._cols[col] = self._map(col)
+        self._names: Optional[List[str]] = None
+
+    def _map(self, col: str) -> memoryview:
+        return memoryview(np.asarray(np.load(os.path.join(self.path, f"{col}.npy"), mmap_mode="r")))
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def _text_bytes(self, col: str, row: int) -> bytes:
+        offsets = self._cols[f"{col}.offsets"]
+        return self._cols[f"{col}.blob"][offsets[row]:offsets[row + 1]].tobytes()
+
+    def _find(self, name: str) -> int:
+        """Row number of `name`, or -1."""
+        target = name.encode("utf-8")
+        order = self._cols["name_order"]
+        lo, hi = 0, self._rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._text_bytes("name", order[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._rows:
+            row = order[lo]
+            if self._text_bytes("name", row) == target:
+                return row
+        return -1
+
+    def _item(self, row: int) -> StockItem:
+        c = self._cols
+
+        def code(col: str) -> Optional[str]:
+            v = c[col][row]
+            return None if v < 0 else self._vocab[col][v]
+
+        def num(col: str) -> Optional[float]:
+            v = c[col][row]
+            return None if v != v else v
+
+        return record_to_item((
+            self._text_bytes("name", row).decode("utf-8"),
+            code("type"),
+            code("conc_kind"),
+            num("conc_value"),
+            code("conc_unit"),
+            num("mw_g_per_mol"),
+            c["purity_fraction"][row],
+            self._text_bytes("solvent", row).decode("utf-8"),
+            self._text_bytes("notes", row).decode("utf-8"),
+        ))
+
+    def fetch(self, names: Iterable[str]) -> Dict[str, StockItem]:
+        found: Dict[str, StockItem] = {}
+        for name in dict.fromkeys(names):
+            row = self._find(name)
+            if row >= 0:
+                found[name] = self._item(row)
+        count("stock_store.fetched", len(found))
+        return found
+
+    def names(self) -> List[str]:
+        if self._names is None:
+            blob = self._cols["name.blob"].tobytes()
+            offsets = np.asarray(self._cols["name.offsets"]).tolist()
+            self._names = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self._rows)]
+        return self._names
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._find(name) >= 0
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def to_dict(self) -> Dict[str, StockItem]:
+        return {item.name: item for item in (self._item(r) for r in range(self._rows))}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Export stocks to a memory-mapped columnar catalog (.cols directory)")
+    p.add_argument("source", help="Stocks workbook (.xlsx) or SQLite catalog (.db)")
+    p.add_argument("out", help=f"Catalog directory to write (must end in {COLUMNAR_SUFFIX})")
+    p.add_argument("--sheet", default="stocks", help="Sheet name inside the xlsx (default: stocks)")
+    args = p.parse_args()
+    if not is_columnar_path(args.out):
+        p.error(f"output path must end in {COLUMNAR_SUFFIX}")
+
+    written = write_columnar(load_stocks_dict(args.source, sheet_name=args.sheet).values(), args.out)
+    print(f"Wrote {written} stock items to {args.out}.")
+
+
+if __name__ == "__main__":
+    main()
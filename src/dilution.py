@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import bisect
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterator, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from units import to_liters
+from stocks_io import CompiledStock, StockItem
+from calculator import BRING_TO_VOLUME_NAME, RecipeLine, RecipeResult
+from batch_calculator import BatchRecipeResult
+from profiling import count, timed
+
+
+# 1-2-5 series: dilution factors that are easy to make and to check
+NICE_FACTORS = tuple(m * 10 ** e for e in range(0, 7) for m in (1, 2, 5) if m * 10 ** e > 1)
+
+DEFAULT_DILUENT = "solvent/buffer"
+
+
+@dataclass(frozen=True)
+class PipettingLimits:
+    """Smallest and largest volume that can be pipetted, in `unit`."""
+    min_volume: float = 0.5
+    max_volume: float = 1000.0
+    unit: str = "uL"
+    max_steps: int = 3
+
+    def __post_init__(self):
+        if not 0 < self.min_volume < self.max_volume:
+            raise ValueError("Pipetting limits need 0 < min_volume < max_volume.")
+
+    @property
+    def max_factor(self) -> float:
+        """Largest single-step dilution: min_volume of source made up to max_volume."""
+        return self.max_volume / self.min_volume
+
+
+@dataclass
+class DilutionStep:
+    """Make `volume` of a 1:factor dilution from `aliquot` of the previous solution plus `diluent`."""
+    factor: float
+    volume: float
+    aliquot: float
+    diluent: float
+
+
+@dataclass
+class DilutionPlan:
+    """Serial dilution of one stock so that its addition becomes pipettable."""
+    name: str
+    diluent: str
+    steps: List[DilutionStep]
+    add_volume: float          # volume of the last intermediate added to the buffer
+    unit: str
+
+    @property
+    def factor(self) -> float:
+        return math.prod(s.factor for s in self.steps)
+
+    def lines(self) -> List[RecipeLine]:
+        """One "dilution" RecipeLine per preparation step, in pipetting order."""
+        out = []
+        source = f"{self.name} stock"
+        total = 1.0
+        for s in self.steps:
+            total *= s.factor
+            out.append(RecipeLine(
+                name=f"{self.name} 1:{total:g} intermediate",
+                source_type="dilution",
+                add_volume_value=s.aliquot,
+                add_volume_unit=self.unit,
+                notes=f"{s.aliquot:.4g} {self.unit} {source} + {s.diluent:.4g} {self.unit} {self.diluent} "
+                      f"= {s.volume:.4g} {self.unit} (1:{s.factor:g})",
+            ))
+            source = f"1:{total:g} {self.name}"
+        return out
+
+
+def _nice_ceil(x: float) -> Optional[float]:
+    i = bisect.bisect_left(NICE_FACTORS, x * (1 - 1e-12))
+    return float(NICE_FACTORS[i]) if i < len(NICE_FACTORS) else None
+
+
+def dilution_factors(need: float, max_factor: float, max_steps: int) -> Optional[List[float]]:
+    """
+    Fewest nice step factors (each <= max_factor) whose product is at least
+    `need`; None if max_steps are not enough. All steps but the last use
+    the same factor; the last one is the smallest that completes it.
+    """
+    if need <= 1.0:
+        return []
+    for k in range(1, max_steps + 1):
+        f = _nice_ceil(need ** (1.0 / k))
+        if f is None or f > max_factor:
+            continue
+        last = _nice_ceil(need / f ** (k - 1))
+        if last is not None and last <= max_factor:
+            return [f] * (k - 1) + [last] if k > 1 else [last]
+    return None
+
+
+def plan_dilution(
+    name: str,
+    volume: float,
+    limits: PipettingLimits,
+    diluent: str = DEFAULT_DILUENT,
+) -> Optional[DilutionPlan]:
+    """
+    Serial dilution turning an addition of `volume` (limits.unit) of stock
+    into a pipettable addition of intermediate. None if `volume` is already
+    pipettable, cannot be reached in limits.max_steps steps, or would need
+    an intermediate or addition above limits.max_volume.
+    """
+    planned = _plan_steps(volume, limits)
+    if planned is None:
+        return None
+    steps, add_volume = planned
+    return DilutionPlan(
+        name=name,
+        diluent=diluent,
+        steps=[DilutionStep(*s) for s in steps],
+        add_volume=add_volume,
+        unit=limits.unit,
+    )
+
+
+# batches repeat the same few volumes over and over
+@lru_cache(maxsize=4096)
+def _plan_steps(volume: float, limits: PipettingLimits) -> Optional[Tuple[Tuple[Tuple[float, ...], ...], float]]:
+    if volume <= 0 or volume >= limits.min_volume:
+        return None
+    factors = dilution_factors(limits.min_volume / volume, limits.max_factor, limits.max_steps)
+    if not factors:
+        return None
+    add_volume = volume * math.prod(factors)
+    # size the intermediates backwards: each must hold what the next step
+    # draws from it, and be big enough that its own aliquot is pipettable
+    steps = []
+    needed = add_volume
+    for f in reversed(factors):
+        made = max(needed, limits.min_volume * f)
+        aliquot = made / f
+        steps.append((f, made, aliquot, made - aliquot))
+        needed = aliquot
+    # neither the addition nor an intermediate may exceed what can be pipetted
+    ceiling = limits.max_volume * (1 + 1e-9)
+    if add_volume > ceiling or any(s[1] > ceiling for s in steps):
+        return None
+    return tuple(reversed(steps)), add_volume
+
+
+@lru_cache(maxsize=None)
+def _ratio(unit: str, limits_unit: str) -> float:
+    return to_liters(1.0, unit) / to_liters(1.0, limits_unit)
+
+
+def _diluent_for(stocks: Optional[Mapping[str, Union[StockItem, CompiledStock]]], name: str) -> str:
+    item = stocks.get(name) if stocks is not None else None
+    if isinstance(item, CompiledStock):
+        item = item.item
+    return (item.solvent if item is not None else "") or DEFAULT_DILUENT
+
+
+@timed("apply_dilutions")
+def apply_dilutions(
+    result: RecipeResult,
+    limits: PipettingLimits,
+    stocks: Optional[Mapping[str, Union[StockItem, CompiledStock]]] = None,
+) -> RecipeResult:
+    """
+    Replace stock additions below limits.min_volume by additions of serial
+    intermediates. The preparation steps come first as "dilution" lines,
+    the buffer gets the intermediate instead of the stock, and the solvent
+    to bring to volume is reduced by the diluent that the intermediate
+    adds. Additions above limits.max_volume and dilutions that need more
+    than limits.max_steps steps are reported as warnings. Intermediates
+    are made up in the stock's solvent when `stocks` gives one.
+
+    Returns `result` itself when nothing needs changing.
+    """
+    lines = result.lines
+    to_limits = [
+        _ratio(line.add_volume_unit, limits.unit)
+        if line.source_type == "stock_solution" and line.add_volume_value is not None else 0.0
+        for line in lines
+    ]
+    if not any(
+        line.name != BRING_TO_VOLUME_NAME
+        and not limits.min_volume <= line.add_volume_value * k <= limits.max_volume
+        for line, k in zip(lines, to_limits) if k
+    ):
+        return result
+
+    prep: List[RecipeLine] = []
+    out: List[RecipeLine] = []
+    warnings = list(result.warnings)
+    extra = 0.0   # diluent brought in by intermediates, in limits.unit
+    for line, k in zip(lines, to_limits):
+        if not k or line.name == BRING_TO_VOLUME_NAME:
+            out.append(line)
+            continue
+        volume = line.add_volume_value * k
+        if volume > limits.max_volume:
+            portions = math.ceil(volume / limits.max_volume)
+            warnings.append(
+                f"'{line.name}': {line.add_volume_value:.4g} {line.add_volume_unit} is above the "
+                f"{limits.max_volume:g} {limits.unit} maximum; pipette it in {portions} portions."
+            )
+        if volume <= 0 or volume >= limits.min_volume:
+            out.append(line)
+            continue
+        plan = plan_dilution(line.name, volume, limits, _diluent_for(stocks, line.name))
+        if plan is None:
+            warnings.append(
+                f"'{line.name}': {line.add_volume_value:.4g} {line.add_volume_unit} is below the "
+                f"{limits.min_volume:g} {limits.unit} minimum and cannot be diluted within "
+                f"{limits.min_volume:g}-{limits.max_volume:g} {limits.unit} in {limits.max_steps} "
+                f"step(s) of at most 1:{limits.max_factor:g}; use a more dilute stock."
+            )
+            out.append(line)
+            continue
+        count("dilution.planned")
+        prep.extend(plan.lines())
+        add = plan.add_volume / k
+        factor = plan.factor
+        extra += (add - line.add_volume_value) * k
+        out.append(RecipeLine(
+            name=f"{line.name} (1:{factor:g} intermediate)",
+            source_type=line.source_type,
+            add_volume_value=add,
+            add_volume_unit=line.add_volume_unit,
+            notes=f"{line.add_volume_value:.4g} {line.add_volume_unit} of stock, "
+                  f"added as a 1:{factor:g} dilution in {plan.diluent}"
+                  + (f"; {line.notes}" if line.notes else ""),
+        ))
+        warnings.append(
+            f"'{line.name}': {line.add_volume_value:.4g} {line.add_volume_unit} is below the "
+            f"{limits.min_volume:g} {limits.unit} minimum; add {add:.4g} {line.add_volume_unit} of a "
+            f"1:{factor:g} intermediate ({len(plan.steps)} dilution step"
+            f"{'s' if len(plan.steps) > 1 else ''})."
+        )
+
+    if extra:
+        for i, line in enumerate(out):
+            if line.name == BRING_TO_VOLUME_NAME and line.add_volume_value is not None:
+                fill = line.add_volume_value - extra / _ratio(line.add_volume_unit, limits.unit)
+                if fill < 0:
+                    warnings.append(
+                        "Intermediate dilutions add more diluent than the volume left to fill; "
+                        "use more dilute stocks or a larger final volume."
+                    )
+                out[i] = RecipeLine(
+                    name=line.name,
+                    source_type=line.source_type,
+                    add_volume_value=max(0.0, fill),
+                    add_volume_unit=line.add_volume_unit,
+                    notes=line.notes,
+                )
+    return RecipeResult(
+        final_volume_value=result.final_volume_value,
+        final_volume_unit=result.final_volume_unit,
+        lines=prep + out,
+        warnings=warnings,
+    )
+
+
+def needs_dilution(batch: BatchRecipeResult, limits: PipettingLimits) -> np.ndarray:
+    """Indices of the batch recipes with a stock addition outside the pipetting limits."""
+    k = to_liters(1.0, batch.output_volume_unit) / to_liters(1.0, limits.unit)
+    vols = batch.add_volume_values * k
+    bad = ~batch.line_is_powder & ((vols < limits.min_volume) | (vols > limits.max_volume))
+    return np.unique(batch.line_recipe[bad])
+
+
+def iter_diluted_recipes(
+    batch: BatchRecipeResult,
+    limits: PipettingLimits,
+    stocks: Optional[Mapping[str, Union[StockItem, CompiledStock]]] = None,
+    chunk_size: int = 1024,
+) -> Iterator[RecipeResult]:
+    """
+    The batch's recipes with intermediate dilutions applied. Recipes that
+    need none are found with one vectorized check and passed through as is.
+    """
+    flagged = set(needs_dilution(batch, limits).tolist())
+    for i, recipe in enumerate(batch.iter_recipes(chunk_size)):
+        yield apply_dilutions(recipe, limits, stocks) if i in flagged else recipe
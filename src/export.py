@@ -1,40 +1,211 @@
 from __future__ import annotations
 
-from typing import List, Dict, Any
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import csv
+import json
+import os
+import tempfile
 
 from calculator import RecipeResult
+from profiling import timed
 
 
-def recipe_to_rows(result: RecipeResult) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
+RECIPE_CSV_FIELDS = [
+    "name",
+    "source_type",
+    "add_volume_value",
+    "add_volume_unit",
+    "add_mass_value",
+    "add_mass_unit",
+    "notes",
+]
+
+# Multi-recipe exports: one row per recipe line, tagged with the recipe id
+MULTI_RECIPE_FIELDS = ["recipe_id"] + RECIPE_CSV_FIELDS
+
+EXPORT_FORMATS = ("csv", "jsonl", "xlsx")
+
+
+def iter_recipe_rows(result: RecipeResult) -> Iterator[Dict[str, Any]]:
+    """CSV rows of a recipe, one per line, produced lazily."""
     for line in result.lines:
-        rows.append(
+        yield {
+            "name": line.name,
+            "source_type": line.source_type,
+            "add_volume_value": line.add_volume_value if line.add_volume_value is not None else "",
+            "add_volume_unit": line.add_volume_unit if line.add_volume_value is not None else "",
+            "add_mass_value": line.add_mass_value if line.add_mass_value is not None else "",
+            "add_mass_unit": line.add_mass_unit if line.add_mass_value is not None else "",
+            "notes": line.notes or "",
+        }
+
+
+def recipe_to_rows(result: RecipeResult) -> List[Dict[str, Any]]:
+    return list(iter_recipe_rows(result))
+
+
+def recipe_to_dict(result: RecipeResult) -> Dict[str, Any]:
+    """JSON-friendly form of a recipe (same line fields as the CSV export)."""
+    return {
+        "final_volume_value": result.final_volume_value,
+        "final_volume_unit": result.final_volume_unit,
+        "lines": [
             {
                 "name": line.name,
                 "source_type": line.source_type,
-                "add_volume_value": line.add_volume_value if line.add_volume_value is not None else "",
-                "add_volume_unit": line.add_volume_unit if line.add_volume_value is not None else "",
-                "add_mass_value": line.add_mass_value if line.add_mass_value is not None else "",
-                "add_mass_unit": line.add_mass_unit if line.add_mass_value is not None else "",
+                "add_volume_value": line.add_volume_value,
+                "add_volume_unit": line.add_volume_unit if line.add_volume_value is not None else None,
+                "add_mass_value": line.add_mass_value,
+                "add_mass_unit": line.add_mass_unit if line.add_mass_value is not None else None,
                 "notes": line.notes or "",
             }
-        )
-    return rows
+            for line in result.lines
+        ],
+        "warnings": list(result.warnings),
+    }
 
 
+@timed("export_recipe_csv")
 def export_recipe_csv(result: RecipeResult, path: str) -> None:
     rows = recipe_to_rows(result)
-    fieldnames = [
-        "name",
-        "source_type",
-        "add_volume_value",
-        "add_volume_unit",
-        "add_mass_value",
-        "add_mass_unit",
-        "notes",
-    ]
     with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w = csv.DictWriter(f, fieldnames=RECIPE_CSV_FIELDS)
         w.writeheader()
         w.writerows(rows)
+
+
+class XlsxRowWriter:
+    """
+    csv.DictWriter-like writer for an .xlsx sheet, using openpyxl's
+    write-only mode: rows go to a temporary file as they are added, so
+    memory stays flat however many rows are written. close() saves the
+    workbook.
+
+    The workbook is saved to a temporary file next to `path` and moved
+    into place, so a failed export never leaves a partial file or
+    clobbers an earlier one. Used as a context manager, it saves on
+    success and discards the workbook when the block raises.
+    """
+
+    def __init__(self, path: str, fieldnames: Sequence[str], sheet_name: str = "recipes"):
+        from openpyxl import Workbook  # only needed for xlsx output
+
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(sheet_name)
+
+    def __enter__(self) -> "XlsxRowWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def add_sheet(self, sheet_name: str, fieldnames: Sequence[str]) -> None:
+        """Continue in a new sheet with its own columns."""
+        self.fieldnames = list(fieldnames)
+        self._ws = self._wb.create_sheet(sheet_name)
+
+    def writeheader(self) -> None:
+        self._ws.append(self.fieldnames)
+
+    def writerow(self, row: Dict[str, Any]) -> None:
+        self._ws.append([row.get(f, "") for f in self.fieldnames])
+
+    def _save_to_temp(self) -> str:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            self._wb.save(tmp)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return tmp
+
+    def close(self) -> None:
+        """Save the workbook atomically; a failed save leaves `path` untouched."""
+        tmp = self._save_to_temp()
+        try:
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def discard(self) -> None:
+        """
+        Drop the rows written so far without touching `path`. The workbook
+        is saved to a scratch file that is removed at once, which is how
+        write-only sheets release the temporary files holding their rows.
+        """
+        try:
+            os.remove(self._save_to_temp())
+        except Exception:
+            pass
+
+
+def export_format_for(path: str, default: str = "csv") -> str:
+    """Export format implied by a file name (.csv, .jsonl, .xlsx)."""
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"ndjson": "jsonl", "json": "jsonl"}.get(ext, ext) if ext in EXPORT_FORMATS + ("ndjson", "json") else default
+
+
+RecipeEntry = Union[RecipeResult, Tuple[Any, RecipeResult]]
+
+
+def _with_ids(results: Iterable[RecipeEntry]) -> Iterator[Tuple[Any, RecipeResult]]:
+    for i, entry in enumerate(results, 1):
+        yield entry if isinstance(entry, tuple) else (i, entry)
+
+
+def _write_recipe_rows(results: Iterable[RecipeEntry], writer) -> Dict[str, int]:
+    counts = {"recipes": 0, "rows": 0}
+    writer.writeheader()
+    for recipe_id, result in _with_ids(results):
+        counts["recipes"] += 1
+        for row in iter_recipe_rows(result):
+            writer.writerow({"recipe_id": recipe_id, **row})
+            counts["rows"] += 1
+    return counts
+
+
+def write_recipes(results: Iterable[RecipeEntry], out: IO[str], fmt: str = "csv") -> Dict[str, int]:
+    """
+    Stream recipes to a text stream as CSV (one row per line, with a
+    recipe_id column) or JSONL (one object per recipe). `results` may
+    yield RecipeResults (ids 1, 2, ...) or (recipe_id, RecipeResult)
+    pairs; each is written as soon as it arrives.
+    Returns {"recipes": n, "rows": n}.
+    """
+    if fmt == "csv":
+        return _write_recipe_rows(results, csv.DictWriter(out, fieldnames=MULTI_RECIPE_FIELDS, lineterminator="\n"))
+    if fmt != "jsonl":
+        raise ValueError(f"Unsupported export format for a text stream: {fmt}")
+    counts = {"recipes": 0, "rows": 0}
+    for recipe_id, result in _with_ids(results):
+        counts["recipes"] += 1
+        counts["rows"] += 1
+        out.write(json.dumps({"recipe_id": recipe_id, **recipe_to_dict(result)}) + "\n")
+    return counts
+
+
+@timed("export_recipes")
+def export_recipes(results: Iterable[RecipeEntry], path: str, fmt: Optional[str] = None) -> Dict[str, int]:
+    """
+    Write many recipes to one file; the format defaults to the file
+    extension (.csv, .jsonl, .xlsx). Rows are streamed, so memory does
+    not grow with the number of recipes.
+    """
+    fmt = fmt or export_format_for(path)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt == "xlsx":
+        with XlsxRowWriter(path, MULTI_RECIPE_FIELDS) as writer:
+            return _write_recipe_rows(results, writer)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        return write_recipes(results, f, fmt)
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import hashlib
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
 from dataclasses import dataclass
 from difflib import SequenceMatcher
-from typing import Iterable, List, Optional
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set
+
+from profiling import count, timed
 
 
 def normalize_name(s: str) -> str:
@@ -37,9 +43,24 @@ def similarity(a: str, b: str) -> float:
     4. Sequence similarity
     Returns the best score from all strategies.
     """
-    a_norm = normalize_name(a)
-    b_norm = normalize_name(b)
+    return _prepared_similarity(normalize_name(a), extract_key_terms(a), normalize_name(b), extract_key_terms(b))
+
+
+def _prepared_similarity(a_norm: str, a_terms: set, b_norm: str, b_terms: set) -> float:
+    """similarity() on names that were already normalized and split into key terms."""
+    known = _known_similarity(a_norm, a_terms, b_norm, b_terms)
+    if known >= 1.0 or not a_norm or not b_norm:
+        return known
+
+    # Strategy 4: Traditional sequence matching (handles typos well)
+    sequence_score = SequenceMatcher(None, a_norm, b_norm).ratio()
     
+    # Return the best score from all strategies
+    return max(known, sequence_score)
+
+
+def _known_similarity(a_norm: str, a_terms: set, b_norm: str, b_terms: set) -> float:
+    """The cheap strategies of similarity() (exact, containment, key terms); a lower bound of it."""
     if not a_norm or not b_norm:
         return 0.0
     
@@ -62,9 +83,6 @@ def similarity(a: str, b: str) -> float:
     
     # Strategy 3: Key term overlap
     # Check how many important words match
-    a_terms = extract_key_terms(a)
-    b_terms = extract_key_terms(b)
-    
     if a_terms and b_terms:
         intersection = a_terms & b_terms
         union = a_terms | b_terms
@@ -78,11 +96,7 @@ def similarity(a: str, b: str) -> float:
     else:
         term_overlap_score = 0.0
     
-    # Strategy 4: Traditional sequence matching (handles typos well)
-    sequence_score = SequenceMatcher(None, a_norm, b_norm).ratio()
-    
-    # Return the best score from all strategies
-    return max(containment_score, term_overlap_score, sequence_score)
+    return max(containment_score, term_overlap_score)
 
 
 @dataclass
@@ -92,7 +106,10 @@ class Match:
     score: float
 
 
+@timed("best_match")
 def best_match(query: str, candidates: Iterable[str], min_score: float = 0.72) -> Optional[Match]:
+    if isinstance(candidates, CandidateIndex):
+        return candidates.best_match(query, min_score=min_score)
     best: Optional[Match] = None
     for c in candidates:
         sc = similarity(query, c)
@@ -103,9 +120,413 @@ def best_match(query: str, candidates: Iterable[str], min_score: float = 0.72) -
     return best
 
 
+@timed("top_matches")
 def top_matches(query: str, candidates: Iterable[str], n: int = 5) -> List[Match]:
+    if isinstance(candidates, CandidateIndex):
+        return candidates.top_matches(query, n=n)
     ms: List[Match] = []
     for c in candidates:
         ms.append(Match(query=query, candidate=c, score=similarity(query, c)))
     ms.sort(key=lambda m: m.score, reverse=True)
     return ms[:n]
+
+
+def catalog_fingerprint(candidates: Iterable[str]) -> str:
+    """Hash of the candidate names in order (order decides ties between equal scores)."""
+    if isinstance(candidates, CandidateIndex):
+        return candidates.fingerprint
+    h = hashlib.sha1()
+    for c in candidates:
+        h.update(c.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+# compact an index once tombstones and names added since the last compaction
+# exceed this share of its slots (and at least _COMPACT_MIN of them)
+_COMPACT_SHARE = 0.25
+_COMPACT_MIN = 64
+
+
+def _ngrams(norm: str, n: int) -> Set[str]:
+    # Pad with spaces so words shorter than n still produce grams
+    padded = f" {norm} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class CandidateIndex:
+    """
+    Pre-processed catalog of candidate names for repeated fuzzy lookups.
+
+    Names are normalized and split into key terms once. A character n-gram
+    inverted index picks a shortlist of candidates sharing the most n-grams
+    with the query, which are scored first, with exactly the same function
+    as similarity(). Any other candidate is scored only if an upper bound
+    of its score (cheap strategies, name lengths, character counts) can
+    still reach the results, so best_match/top_matches return exactly what
+    a linear scan does. Very short queries fall back to a full scan.
+
+    Can be passed anywhere best_match/top_matches expect candidates.
+    complete() serves as-you-type suggestions from the same index.
+    """
+
+    def __init__(self, candidates: Iterable[str], shortlist_size: int = 200, ngram: int = 3):
+        self.shortlist_size = shortlist_size
+        self.ngram = ngram
+        names = list(candidates)
+        self._build(names, [normalize_name(c) for c in names], [extract_key_terms(c) for c in names])
+
+    def _build(self, names: List[str], norms: List[str], terms: List[set]) -> None:
+        """Index prepared names from scratch at positions 0..n-1."""
+        # Slot lists are append-only and may be shared with copies, each of
+        # which reads only its first _size slots. Removed slots stay behind
+        # as tombstones (_dead) until the next compaction.
+        self._candidates = names
+        self._norms = norms
+        self._terms = terms
+        self._size = len(names)
+        self._dead: FrozenSet[int] = frozenset()
+        self._dead_sorted: Optional[List[int]] = None
+        # gram -> positions; a stored list is never changed (updates store a
+        # new one), so copies can share them
+        self._postings: Dict[str, List[int]] = {}
+        # normalized length -> positions, for the sequence-ratio bound
+        self._by_len: Dict[int, List[int]] = {}
+        for pos, norm in enumerate(norms):
+            for g in _ngrams(norm, self.ngram):
+                self._postings.setdefault(g, []).append(pos)
+            self._by_len.setdefault(len(norm), []).append(pos)
+        # (normalized name, position) in sorted order, for prefix lookups;
+        # names added since the last compaction are kept apart in _recent
+        self._sorted: List[tuple] = sorted((norm, pos) for pos, norm in enumerate(norms))
+        self._recent: List[tuple] = []
+        self._fingerprint: Optional[str] = None
+
+    def _live(self) -> Iterable[int]:
+        """Positions of the names in the catalog, in catalog order."""
+        if not self._dead:
+            return range(self._size)
+        return (p for p in range(self._size) if p not in self._dead)
+
+    def _column(self, values: list) -> list:
+        if not self._dead:
+            return values[:self._size]
+        return [values[p] for p in self._live()]
+
+    def __len__(self) -> int:
+        return self._size - len(self._dead)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.candidates)
+
+    @property
+    def candidates(self) -> List[str]:
+        return self._column(self._candidates)
+
+    @property
+    def norms(self) -> List[str]:
+        """Normalized names, in catalog order."""
+        return self._column(self._norms)
+
+    @property
+    def key_terms(self) -> List[set]:
+        """Key terms of each name, in catalog order."""
+        return self._column(self._terms)
+
+    def copy(self) -> "CandidateIndex":
+        """
+        Copy to update without disturbing readers of this index. Storage is
+        shared (slots are only appended to, postings lists only replaced),
+        so only the gram and length tables themselves are copied.
+        """
+        other = CandidateIndex.__new__(CandidateIndex)
+        other.__dict__.update(self.__dict__)
+        other._postings = dict(self._postings)
+        other._by_len = dict(self._by_len)
+        return other
+
+    def reindexed(self, names: Iterable[str]) -> "CandidateIndex":
+        """New index of `names` in the given order, reusing the normalized forms already computed here."""
+        known = {self._candidates[p]: p for p in self._live()}
+        names = list(names)
+        norms: List[str] = []
+        terms: List[set] = []
+        for c in names:
+            p = known.get(c)
+            norms.append(self._norms[p] if p is not None else normalize_name(c))
+            terms.append(self._terms[p] if p is not None else extract_key_terms(c))
+        other = CandidateIndex.__new__(CandidateIndex)
+        other.shortlist_size = self.shortlist_size
+        other.ngram = self.ngram
+        other._build(names, norms, terms)
+        return other
+
+    def _append(self, name: str, norm: str, terms: set) -> int:
+        if len(self._candidates) != self._size:
+            # a copy has appended to the shared slots already; take our own
+            self._candidates = self._candidates[:self._size]
+            self._norms = self._norms[:self._size]
+            self._terms = self._terms[:self._size]
+        self._candidates.append(name)
+        self._norms.append(norm)
+        self._terms.append(terms)
+        self._size += 1
+        return self._size - 1
+
+    def _positions_of(self, name: str) -> List[int]:
+        norm = normalize_name(name)
+        grams = _ngrams(norm, self.ngram)
+        if grams:
+            pool = min((self._postings.get(g, ()) for g in grams), key=len)
+        else:
+            pool = self._by_len.get(len(norm), ())
+        return [p for p in pool if self._candidates[p] == name]
+
+    def _changed(self) -> None:
+        self._fingerprint = None
+        self._dead_sorted = None
+        if len(self._dead) + len(self._recent) > max(_COMPACT_MIN, _COMPACT_SHARE * self._size):
+            live = list(self._live())
+            self._build(
+                [self._candidates[p] for p in live],
+                [self._norms[p] for p in live],
+                [self._terms[p] for p in live],
+            )
+
+    def add(self, names: Iterable[str]) -> None:
+        """Index more names (appended after the existing ones)."""
+        postings: Dict[str, List[int]] = {}
+        by_len: Dict[int, List[int]] = {}
+        recent = list(self._recent)
+        for c in names:
+            norm = normalize_name(c)
+            pos = self._append(c, norm, extract_key_terms(c))
+            for g in _ngrams(norm, self.ngram):
+                postings.setdefault(g, []).append(pos)
+            by_len.setdefault(len(norm), []).append(pos)
+            insort(recent, (norm, pos))
+        if not by_len:
+            return
+        for g, new in postings.items():
+            self._postings[g] = self._postings.get(g, []) + new
+        for n, new in by_len.items():
+            self._by_len[n] = self._by_len.get(n, []) + new
+        self._recent = recent
+        self._changed()
+
+    def remove(self, names: Iterable[str]) -> None:
+        """
+        Drop every occurrence of the given names; unknown names are ignored.
+        Freed slots become tombstones, so the other names keep their order,
+        and only the postings of the removed names are touched. Tombstones
+        are compacted away once they make up a good share of the slots.
+        """
+        gone: Set[int] = set()
+        for name in names:
+            gone.update(self._positions_of(name))
+        if not gone:
+            return
+        grams: Dict[str, Set[int]] = {}
+        lens: Dict[int, Set[int]] = {}
+        for p in gone:
+            norm = self._norms[p]
+            for g in _ngrams(norm, self.ngram):
+                grams.setdefault(g, set()).add(p)
+            lens.setdefault(len(norm), set()).add(p)
+        for table, removed in ((self._postings, grams), (self._by_len, lens)):
+            for key, ps in removed.items():
+                postings, kept, start = table[key], [], 0
+                for p in sorted(ps):
+                    i = bisect_left(postings, p, start)
+                    kept += postings[start:i]
+                    start = i + 1
+                kept += postings[start:]
+                if kept:
+                    table[key] = kept
+                else:
+                    del table[key]
+        if any(p in gone for _, p in self._recent):
+            self._recent = [e for e in self._recent if e[1] not in gone]
+        self._dead = self._dead | gone
+        self._changed()
+
+    def _catalog_positions(self, positions: List[int]) -> List[int]:
+        """Slot positions -> positions in `candidates`."""
+        if not self._dead:
+            return positions
+        if self._dead_sorted is None:
+            self._dead_sorted = sorted(self._dead)
+        return [p - bisect_left(self._dead_sorted, p) for p in positions]
+
+    def containing(self, q_norm: str) -> List[int]:
+        """Positions of names whose normalized form contains q_norm, in catalog order."""
+        if not q_norm:
+            return []
+        if len(q_norm) < self.ngram:
+            return self._catalog_positions([p for p in self._live() if q_norm in self._norms[p]])
+        # every n-gram of q_norm occurs in a name that contains it; start from the rarest
+        rarest: Optional[List[int]] = None
+        for i in range(len(q_norm) - self.ngram + 1):
+            postings = self._postings.get(q_norm[i:i + self.ngram])
+            if not postings:
+                return []
+            if rarest is None or len(postings) < len(rarest):
+                rarest = postings
+        return self._catalog_positions([p for p in rarest if q_norm in self._norms[p]])
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the candidate names in order; changes whenever the catalog does."""
+        if self._fingerprint is None:
+            self._fingerprint = catalog_fingerprint(self.candidates)
+        return self._fingerprint
+
+    def _gram_counts(self, q_norm: str) -> Counter:
+        """Position -> number of the query's n-grams its name shares."""
+        counts: Counter = Counter()
+        for g in _ngrams(q_norm, self.ngram):
+            postings = self._postings.get(g)
+            if postings:
+                counts.update(postings)
+        return counts
+
+    def _shortlist(self, counts: Counter, size: Optional[int] = None) -> List[int]:
+        """Positions sharing the most n-grams with the query, in catalog order."""
+        size = size or self.shortlist_size
+        if len(counts) <= size:
+            return sorted(counts)
+        top = heapq.nlargest(size, counts.items(), key=lambda kv: (kv[1], -kv[0]))
+        return sorted(pos for pos, _ in top)
+
+    def _could_reach(self, q_norm: str, q_terms: set, counts: Counter, scored: Dict[int, float],
+                     threshold: float) -> List[int]:
+        """
+        Unscored positions whose similarity() may reach `threshold`. Names
+        sharing no n-gram with the query have no key term in common with it
+        and can only contain it or be contained in it when shorter than an
+        n-gram, so for them the sequence ratio's bounds (length, then
+        character counts as in difflib's quick_ratio) decide.
+        """
+        la = len(q_norm)
+        seq = SequenceMatcher(None, "", q_norm)
+        out: List[int] = []
+
+        def seq_bound_reaches(norm: str) -> bool:
+            lb = len(norm)
+            if 2.0 * min(la, lb) / (la + lb) < threshold:
+                return False
+            seq.set_seq1(norm)
+            return seq.quick_ratio() >= threshold
+
+        for p in counts:
+            if p in scored:
+                continue
+            norm = self._norms[p]
+            if _known_similarity(q_norm, q_terms, norm, self._terms[p]) >= threshold or seq_bound_reaches(norm):
+                out.append(p)
+        for lb, positions in self._by_len.items():
+            if lb >= self.ngram and 2.0 * min(la, lb) / (la + lb) < threshold:
+                continue
+            for p in positions:
+                if p in scored or p in counts:
+                    continue
+                norm = self._norms[p]
+                if (lb < self.ngram and _known_similarity(q_norm, q_terms, norm, self._terms[p]) >= threshold) \
+                        or seq_bound_reaches(norm):
+                    out.append(p)
+        return out
+
+    def _ranked(self, query: str, n: int, floor: float = 0.0) -> List[Match]:
+        """
+        The n best matches scoring at least `floor`, equal scores in catalog
+        order: exactly what a linear scan with similarity() gives. The
+        shortlist is scored first; its n-th best score then bounds which
+        other names are worth scoring.
+        """
+        if n <= 0 or not len(self):
+            return []
+        q_norm = normalize_name(query)
+        q_terms = extract_key_terms(query)
+
+        def score(p: int) -> float:
+            return _prepared_similarity(q_norm, q_terms, self._norms[p], self._terms[p])
+
+        if len(q_norm) < self.ngram:
+            scored = {p: score(p) for p in self._live()}
+        else:
+            counts = self._gram_counts(q_norm)
+            scored = {p: score(p) for p in self._shortlist(counts)}
+            kth = heapq.nlargest(n, scored.values())[-1] if len(scored) >= n else floor
+            for p in self._could_reach(q_norm, q_terms, counts, scored, max(kth, floor)):
+                scored[p] = score(p)
+        count("fuzzy.candidates_scored", len(scored))
+        ranked = sorted((p for p, sc in scored.items() if sc >= floor), key=lambda p: (-scored[p], p))
+        return [Match(query=query, candidate=self._candidates[p], score=scored[p]) for p in ranked[:n]]
+
+    def _scored(self, query: str, positions: Iterable[int]) -> List[Match]:
+        q_norm = normalize_name(query)
+        q_terms = extract_key_terms(query)
+        positions = list(positions)
+        count("fuzzy.candidates_scored", len(positions))
+        return [
+            Match(
+                query=query,
+                candidate=self._candidates[p],
+                score=_prepared_similarity(q_norm, q_terms, self._norms[p], self._terms[p]),
+            )
+            for p in positions
+        ]
+
+    def best_match(self, query: str, min_score: float = 0.72) -> Optional[Match]:
+        ms = self._ranked(query, 1, floor=min_score)
+        return ms[0] if ms else None
+
+    def top_matches(self, query: str, n: int = 5) -> List[Match]:
+        return self._ranked(query, n)
+
+    def _prefixed(self, q_norm: str) -> Iterator[int]:
+        """Positions of all names starting with q_norm, alphabetically."""
+        def hits(entries: List[tuple]) -> Iterator[tuple]:
+            i = bisect_left(entries, (q_norm, -1))
+            while i < len(entries) and entries[i][0].startswith(q_norm):
+                yield entries[i]
+                i += 1
+
+        for _, pos in heapq.merge(hits(self._sorted), hits(self._recent)):
+            if pos not in self._dead:
+                yield pos
+
+    def complete(self, query: str, n: int = 8, min_score: float = 0.5) -> List[Match]:
+        """
+        Suggestions for a partially typed name: exact matches first, then names
+        starting with the query, then fuzzy matches scoring at least min_score.
+        Each tier is ordered by similarity(), ties alphabetically. Every name
+        starting with the query is ranked, but only with the cheap strategies:
+        for such a name containment scores at least the sequence ratio, so they
+        give its exact similarity(). Queries shorter than the n-gram size get
+        exact and prefix hits only.
+        """
+        q_norm = normalize_name(query)
+        if not q_norm or n <= 0:
+            return []
+        q_terms = extract_key_terms(query)
+        prefixed = list(self._prefixed(q_norm))
+        count("fuzzy.candidates_scored", len(prefixed))
+        out = [
+            Match(query=query, candidate=self._candidates[p], score=1.0)
+            for p in prefixed if self._norms[p] == q_norm
+        ][:n]
+        scores = (
+            (_known_similarity(q_norm, q_terms, self._norms[p], self._terms[p]), i, p)
+            for i, p in enumerate(prefixed) if self._norms[p] != q_norm
+        )
+        for sc, _, p in heapq.nsmallest(n - len(out), scores, key=lambda t: (-t[0], t[1])):
+            out.append(Match(query=query, candidate=self._candidates[p], score=sc))
+
+        if len(out) < n and len(q_norm) >= self.ngram:
+            taken = set(prefixed)
+            shortlist = self._shortlist(self._gram_counts(q_norm), max(4 * n, 32))
+            ms = [m for m in self._scored(query, (p for p in shortlist if p not in taken)) if m.score >= min_score]
+            ms.sort(key=lambda m: m.score, reverse=True)
+            out.extend(ms[:n - len(out)])
+        return out
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when its CancelToken has been cancelled."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """Call between stages of a task; raises TaskCancelled once cancelled."""
+        if self._event.is_set():
+            raise TaskCancelled()
+
+    def checking(self, progress: ProgressFn) -> ProgressFn:
+        """
+        `progress` that first checks for cancellation, for library calls
+        taking a progress callback: they stop at their next report.
+        """
+        def report(message: str, fraction: Optional[float] = None) -> None:
+            self.check()
+            progress(message, fraction)
+        return report
+
+
+ProgressFn = Callable[[str, Optional[float]], None]
+Event = Tuple[str, Any]
+
+
+class BackgroundTask:
+    """
+    Run `work(token, progress)` on a daemon thread.
+
+    The worker never touches the UI. It reports through a queue that the UI
+    thread drains with poll() (from Tk's event loop via `after`). Events:
+        ("progress", (message, fraction_or_None))
+        ("done", result)
+        ("error", exception)
+        ("cancelled", None)
+    Exactly one of done/error/cancelled ends the task. A result that arrives
+    after cancel() is reported as cancelled.
+    """
+
+    def __init__(self, work: Callable[[CancelToken, ProgressFn], Any]):
+        self._work = work
+        self._events: "queue.Queue[Event]" = queue.Queue()
+        self.token = CancelToken()
+        self._thread: Optional[threading.Thread] = None
+        self.finished = False
+
+    def start(self) -> "BackgroundTask":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self.token.cancel()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self.finished
+
+    def _progress(self, message: str, fraction: Optional[float] = None) -> None:
+        self._events.put(("progress", (message, fraction)))
+
+    def _run(self) -> None:
+        try:
+            result = self._work(self.token, self._progress)
+        except TaskCancelled:
+            self._events.put(("cancelled", None))
+        except Exception as e:
+            self._events.put(("error", e))
+        else:
+            if self.token.cancelled:
+                self._events.put(("cancelled", None))
+            else:
+                self._events.put(("done", result))
+
+    def poll(self) -> List[Event]:
+        """Drain pending events without blocking (call from the UI thread)."""
+        events: List[Event] = []
+        while True:
+            try:
+                ev = self._events.get_nowait()
+            except queue.Empty:
+                break
+            events.append(ev)
+            if ev[0] in ("done", "error", "cancelled"):
+                self.finished = True
+        return events
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
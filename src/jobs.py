@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Union
+
+from stocks_io import StockItem
+from calculator import TargetComponent, RecipeResult, compute_recipe
+from fuzzy_match import CandidateIndex, best_match
+from export import RECIPE_CSV_FIELDS, XlsxRowWriter, iter_recipe_rows, recipe_to_dict
+from match_cache import MatchCache
+
+
+@dataclass
+class RecipeJob:
+    """One recipe request from a jobs file."""
+    job_id: str
+    targets: List[TargetComponent]
+    final_volume_value: float
+    final_volume_unit: str = "mL"
+    output_volume_unit: str = "uL"
+    output_mass_unit: str = "mg"
+
+
+@dataclass
+class JobOutcome:
+    job_id: str
+    result: Optional[RecipeResult] = None
+    error: str = ""
+    matched: Dict[str, str] = field(default_factory=dict)   # query name -> stock name
+
+    @property
+    def ok(self) -> bool:
+        return self.result is not None
+
+
+def parse_target_spec(spec: Any) -> TargetComponent:
+    """
+    One target from JSON-style input:
+        "Tris-HCl,50,mM"
+        ["Tris-HCl", 50, "mM"]
+        {"name": "Tris-HCl", "value": 50, "unit": "mM"}
+    """
+    if isinstance(spec, str):
+        parts = [p.strip() for p in spec.split(",")]
+        if len(parts) != 3:
+            raise ValueError(f"Invalid target format: '{spec}'. Use 'Name,value,unit'")
+        name, value_s, unit = parts
+        return TargetComponent(name=name, final_value=float(value_s), final_unit=unit)
+    if isinstance(spec, dict):
+        try:
+            return TargetComponent(name=str(spec["name"]), final_value=float(spec["value"]), final_unit=str(spec["unit"]))
+        except KeyError as e:
+            raise ValueError(f"Target {spec!r} is missing '{e.args[0]}'. Use name, value and unit.")
+    if isinstance(spec, (list, tuple)) and len(spec) == 3:
+        name, value, unit = spec
+        return TargetComponent(name=str(name), final_value=float(value), final_unit=str(unit))
+    raise ValueError(f"Invalid target: {spec!r}. Use 'Name,value,unit' or {{name, value, unit}}.")
+
+
+def parse_job(spec: Dict[str, Any], default_id: str, defaults: Optional[Dict[str, str]] = None) -> RecipeJob:
+    """
+    Build a job from a JSON object:
+        {"id": "A1", "targets": [...], "final_volume": 100, "final_unit": "mL",
+         "vol_unit": "uL", "mass_unit": "mg"}
+    Missing units fall back to `defaults` (same keys), then to mL/uL/mg.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Job must be a JSON object.")
+    defaults = defaults or {}
+    if "final_volume" not in spec:
+        raise ValueError("Missing 'final_volume'.")
+    targets = spec.get("targets", [])
+    if not isinstance(targets, list):
+        raise ValueError("'targets' must be a list.")
+    return RecipeJob(
+        job_id=str(spec.get("id", default_id)),
+        targets=[parse_target_spec(t) for t in targets],
+        final_volume_value=float(spec["final_volume"]),
+        final_volume_unit=str(spec.get("final_unit", defaults.get("final_unit", "mL"))),
+        output_volume_unit=str(spec.get("vol_unit", defaults.get("vol_unit", "uL"))),
+        output_mass_unit=str(spec.get("mass_unit", defaults.get("mass_unit", "mg"))),
+    )
+
+
+def error_text(e: Exception) -> str:
+    """Message of a recipe error for reports (KeyError's quotes removed)."""
+    if isinstance(e, KeyError) and e.args:
+        return str(e.args[0])
+    return str(e)
+
+
+def iter_jobs(lines: Iterable[str], defaults: Optional[Dict[str, str]] = None) -> Iterator[Union[RecipeJob, JobOutcome]]:
+    """
+    Lazily parse JSONL job specs. Blank lines are skipped; a line that cannot
+    be parsed yields a failed JobOutcome (id = line number) instead of a job.
+    """
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        default_id = str(line_no)
+        try:
+            spec = json.loads(line)
+        except ValueError as e:
+            yield JobOutcome(job_id=default_id, error=f"Invalid JSON: {e}")
+            continue
+        if isinstance(spec, dict) and "id" in spec:
+            default_id = str(spec["id"])
+        try:
+            yield parse_job(spec, default_id, defaults)
+        except (ValueError, TypeError) as e:
+            yield JobOutcome(job_id=default_id, error=error_text(e))
+
+
+def reconcile_names(
+    job: RecipeJob,
+    stocks: Dict[str, StockItem],
+    index: CandidateIndex,
+    min_score: float = 0.72,
+    cache: Optional[MatchCache] = None,
+) -> Dict[str, str]:
+    """
+    Replace target names missing from stocks with their best fuzzy match
+    (in place). Returns {original name: matched stock name}. Lookups go
+    through `cache` when one is given.
+    """
+    matched: Dict[str, str] = {}
+    for i, t in enumerate(job.targets):
+        if t.name in stocks:
+            continue
+        if cache is not None:
+            m = cache.best_match(t.name, index, min_score=min_score)
+        else:
+            m = best_match(t.name, index, min_score=min_score)
+        if m:
+            matched[t.name] = m.candidate
+            job.targets[i] = replace(t, name=m.candidate)
+    return matched
+
+
+def run_job(
+    stocks: Dict[str, StockItem],
+    job: RecipeJob,
+    index: Optional[CandidateIndex] = None,
+    min_score: float = 0.72,
+    cache: Optional[MatchCache] = None,
+) -> JobOutcome:
+    """Compute one job. With an index, unknown names are first reconciled by fuzzy matching."""
+    matched = reconcile_names(job, stocks, index, min_score, cache) if index is not None else {}
+    try:
+        result = compute_recipe(
+            stocks=stocks,
+            targets=job.targets,
+            final_volume_value=job.final_volume_value,
+            final_volume_unit=job.final_volume_unit,
+            output_volume_unit=job.output_volume_unit,
+            output_mass_unit=job.output_mass_unit,
+        )
+    except (KeyError, ValueError, TypeError, ZeroDivisionError) as e:
+        return JobOutcome(job_id=job.job_id, error=error_text(e), matched=matched)
+    return JobOutcome(job_id=job.job_id, result=result, matched=matched)
+
+
+def run_jobs(
+    stocks: Dict[str, StockItem],
+    jobs: Iterable[Union[RecipeJob, JobOutcome]],
+    index: Optional[CandidateIndex] = None,
+    min_score: float = 0.72,
+    cache: Optional[MatchCache] = None,
+) -> Iterator[JobOutcome]:
+    """Compute jobs one at a time, in order; parse failures pass straight through."""
+    for job in jobs:
+        yield job if isinstance(job, JobOutcome) else run_job(stocks, job, index, min_score, cache)
+
+
+def outcome_to_dict(outcome: JobOutcome) -> Dict[str, Any]:
+    if outcome.ok:
+        d = {"id": outcome.job_id, "ok": True, "recipe": recipe_to_dict(outcome.result)}
+    else:
+        d = {"id": outcome.job_id, "ok": False, "error": outcome.error}
+    if outcome.matched:
+        d["matched"] = outcome.matched
+    return d
+
+
+JOB_CSV_FIELDS = ["job_id"] + RECIPE_CSV_FIELDS + ["error"]
+
+
+def _count(outcomes: Iterable[JobOutcome], counts: Dict[str, int]) -> Iterator[JobOutcome]:
+    for outcome in outcomes:
+        counts["jobs"] += 1
+        if not outcome.ok:
+            counts["failed"] += 1
+        yield outcome
+
+
+def _write_outcome_rows(outcomes: Iterable[JobOutcome], writer) -> None:
+    writer.writeheader()
+    for outcome in outcomes:
+        if outcome.ok:
+            for row in iter_recipe_rows(outcome.result):
+                writer.writerow({"job_id": outcome.job_id, **row, "error": ""})
+        else:
+            writer.writerow({"job_id": outcome.job_id, "error": outcome.error})
+
+
+def write_outcomes(outcomes: Iterable[JobOutcome], out: IO[str], fmt: str = "jsonl") -> Dict[str, int]:
+    """
+    Stream outcomes to `out` as JSONL (one object per job) or CSV (one row per
+    recipe line, one row per failed job). Returns {"jobs": n, "failed": n}.
+    """
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Unsupported jobs output format: {fmt}")
+    counts = {"jobs": 0, "failed": 0}
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=JOB_CSV_FIELDS, lineterminator="\n")
+        _write_outcome_rows(_count(outcomes, counts), writer)
+    else:
+        for outcome in _count(outcomes, counts):
+            out.write(json.dumps(outcome_to_dict(outcome)) + "\n")
+    return counts
+
+
+def export_outcomes_xlsx(outcomes: Iterable[JobOutcome], path: str) -> Dict[str, int]:
+    """Same rows as the CSV output, streamed into an .xlsx workbook (write-only mode)."""
+    counts = {"jobs": 0, "failed": 0}
+    with XlsxRowWriter(path, JOB_CSV_FIELDS, sheet_name="jobs") as writer:
+        _write_outcome_rows(_count(outcomes, counts), writer)
+    return counts
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from units import to_liters
+from stocks_io import CompiledStock, StockItem
+from stock_store import StockStore
+from calculator import (
+    BRING_TO_VOLUME_NAME,
+    BRING_TO_VOLUME_NOTES,
+    RecipeLine,
+    RecipeResult,
+    TargetComponent,
+    _target_unit,
+    compute_recipe,
+)
+from batch_calculator import BatchRecipeResult, compute_recipes_batch
+from profiling import count, timed
+
+
+# Concentration factors tried for a master mix, highest first
+MIX_FACTORS = (10.0, 5.0, 4.0, 2.0)
+
+# slack for float round-off in volume-fraction checks
+_EPS = 1e-9
+
+# (component name, unit dimension, concentration in base units, repeat number
+# within the recipe); the dimension keeps 1 M, 1 g/L and 1.0 (v/v) apart
+_Key = Tuple[str, str, float, int]
+
+
+@dataclass
+class MasterMix:
+    """
+    A sub-mix shared by several variants, prepared at `factor` x the final
+    concentrations; each of its variants gets final volume / factor of it.
+    """
+    mix_id: str
+    factor: float
+    targets: List[TargetComponent]     # final (1X) concentrations
+    variants: List[int]                # indices into the target sets
+    recipe: RecipeResult               # how to prepare the mix (overage included)
+
+    @property
+    def name(self) -> str:
+        return f"Master mix {self.mix_id} ({self.factor:g}X)"
+
+
+@dataclass
+class MasterMixPlan:
+    """
+    Master mixes plus per-variant top-ups. Variant i gets
+    mix_volumes[i] of each of its mixes, the top-up lines of
+    top_ups.recipe(i) and fill_volume_values[i] of solvent.
+    Volumes are in the output volume unit.
+    """
+    mixes: List[MasterMix]
+    top_ups: BatchRecipeResult                      # components added directly, per variant
+    variant_mixes: List[List[Tuple[int, float]]]    # per variant: (mix index, volume to add)
+    fill_volume_values: np.ndarray                  # (R,) solvent per variant
+    warnings: List[List[str]]                       # per variant
+    direct_steps: int                               # additions if every variant were made directly
+
+    def __len__(self) -> int:
+        return len(self.variant_mixes)
+
+    @property
+    def steps(self) -> int:
+        """Additions with the plan: preparing the mixes, then mixes + top-ups per variant."""
+        prep = sum(len(m.recipe.lines) for m in self.mixes)
+        return prep + sum(len(v) for v in self.variant_mixes) + len(self.top_ups.line_stock) + len(self)
+
+    def variant_recipe(self, i: int) -> RecipeResult:
+        """What to pipette into variant i: its master mixes, then top-ups and solvent."""
+        unit = self.top_ups.output_volume_unit
+        lines = [
+            RecipeLine(
+                name=self.mixes[m].name,
+                source_type="master_mix",
+                add_volume_value=vol,
+                add_volume_unit=unit,
+                notes=f"{self.mixes[m].factor:g}X mix of {len(self.mixes[m].targets)} components",
+            )
+            for m, vol in self.variant_mixes[i]
+        ]
+        top_up = self.top_ups.recipe(i)
+        lines.extend(line for line in top_up.lines if line.name != BRING_TO_VOLUME_NAME)
+        lines.append(
+            RecipeLine(
+                name=BRING_TO_VOLUME_NAME,
+                source_type="stock_solution",
+                add_volume_value=float(self.fill_volume_values[i]),
+                add_volume_unit=unit,
+                notes=BRING_TO_VOLUME_NOTES,
+            )
+        )
+        return RecipeResult(
+            final_volume_value=top_up.final_volume_value,
+            final_volume_unit=top_up.final_volume_unit,
+            lines=lines,
+            warnings=list(self.warnings[i]),
+        )
+
+    def delivered(self, i: int) -> Dict[str, float]:
+        """
+        Stock volume (output volume unit) or powder mass (output mass unit)
+        that ends up in variant i, through its mixes and top-ups. Equal to
+        the additions of a direct recipe, which is what the plan guarantees.
+        """
+        amounts: Dict[str, float] = {}
+        for m, vol in self.variant_mixes[i]:
+            mix = self.mixes[m].recipe
+            share = vol / _in_unit(mix.final_volume_value, mix.final_volume_unit, self.top_ups.output_volume_unit)
+            for line in mix.lines:
+                if line.name != BRING_TO_VOLUME_NAME:
+                    amounts[line.name] = amounts.get(line.name, 0.0) + float(_amount(line) * share)
+        for line in self.top_ups.recipe(i).lines:
+            if line.name != BRING_TO_VOLUME_NAME:
+                amounts[line.name] = amounts.get(line.name, 0.0) + float(_amount(line))
+        return amounts
+
+
+def _amount(line: RecipeLine) -> float:
+    return line.add_mass_value if line.add_mass_value is not None else line.add_volume_value
+
+
+def _in_unit(value: float, unit: str, target_unit: str) -> float:
+    return value * to_liters(1.0, unit) / to_liters(1.0, target_unit)
+
+
+def _component_keys(targets: Sequence[TargetComponent]) -> List[_Key]:
+    seen: Dict[Tuple[str, str, float], int] = {}
+    keys = []
+    for t in targets:
+        unit = _target_unit(t.final_unit)
+        base = (t.name, unit.dimension, float(t.final_value) * unit.factor)
+        n = seen[base] = seen.get(base, -1) + 1
+        keys.append((*base, n))
+    return keys
+
+
+@timed("plan_master_mixes")
+def plan_master_mixes(
+    stocks: Mapping[str, Union[StockItem, CompiledStock]],
+    target_sets: Sequence[Sequence[TargetComponent]],
+    final_volume_values: Union[float, Sequence[float]],
+    final_volume_unit: str = "uL",
+    output_volume_unit: str = "uL",
+    output_mass_unit: str = "mg",
+    min_variants: int = 2,
+    min_components: int = 2,
+    factors: Sequence[float] = MIX_FACTORS,
+    overage: float = 0.1,
+) -> MasterMixPlan:
+    """
+    Find sub-mixes shared by several variants and plan them as master mixes.
+
+    Components (name, concentration kind and value) are grouped by the exact set of
+    variants that use them; a group used by at least `min_variants`
+    variants with at least `min_components` components becomes a master
+    mix, at the highest factor in `factors` whose stock volumes fit in the
+    mix. A mix is skipped if it would overfill one of its variants (mixes
+    take more volume than the same stocks added directly). Everything
+    else is a per-variant top-up. Mixes are made with `overage` extra
+    volume for dead volume.
+
+    Every variant receives the same amount of every stock as with
+    compute_recipe; errors are the ones the direct computation raises.
+    """
+    target_sets = [list(ts) for ts in target_sets]
+    n = len(target_sets)
+    if isinstance(stocks, StockStore):
+        stocks = stocks.fetch(t.name for ts in target_sets for t in ts)
+    direct = compute_recipes_batch(
+        stocks, target_sets, final_volume_values, final_volume_unit, output_volume_unit, output_mass_unit
+    )
+    volumes = direct.final_volume_values
+    factor_list = sorted(factors, reverse=True)
+
+    # volume fraction each line takes in its variant (0 for powders)
+    V_L = volumes * to_liters(1.0, final_volume_unit)
+    line_recipe = direct.line_recipe
+    line_vol_L = np.where(direct.line_is_powder, 0.0, direct.add_volume_values * to_liters(1.0, output_volume_unit))
+    line_fraction = (line_vol_L / V_L[line_recipe]).tolist() if n else []
+
+    # component key -> variants using it, and its volume fraction
+    users: Dict[_Key, List[int]] = {}
+    fraction: Dict[_Key, float] = {}
+    target_of: Dict[_Key, TargetComponent] = {}
+    variant_keys: List[List[_Key]] = []
+    j = 0
+    for r, targets in enumerate(target_sets):
+        keys = _component_keys(targets)
+        variant_keys.append(keys)
+        for key, t in zip(keys, targets):
+            users.setdefault(key, []).append(r)
+            fraction.setdefault(key, line_fraction[j])
+            target_of.setdefault(key, t)
+            j += 1
+
+    blocks: Dict[Tuple[int, ...], List[_Key]] = {}
+    for key, rs in users.items():
+        if len(rs) >= min_variants:
+            blocks.setdefault(tuple(rs), []).append(key)
+
+    # volume fraction of each variant already used: all of its direct stock volumes
+    used = np.bincount(line_recipe, weights=line_vol_L, minlength=n) / V_L if n else np.zeros(0)
+    chosen: List[Tuple[float, Tuple[int, ...], List[_Key]]] = []
+    # biggest savings first: each mix saves (components - 1) additions per variant
+    for rs, keys in sorted(blocks.items(), key=lambda b: -(len(b[1]) - 1) * len(b[0])):
+        if len(keys) < min_components:
+            continue
+        share = sum(fraction[k] for k in keys)
+        factor = next((f for f in factor_list if f > 1 and f * share <= 1.0 + _EPS), None)
+        if factor is None:
+            continue
+        idx = np.asarray(rs, dtype=np.intp)
+        extra = 1.0 / factor - share
+        if np.any(used[idx] + extra > 1.0 + _EPS):
+            continue
+        used[idx] += extra
+        chosen.append((factor, rs, keys))
+
+    mixes: List[MasterMix] = []
+    in_mix: Dict[_Key, int] = {}
+    variant_mixes: List[List[Tuple[int, float]]] = [[] for _ in range(n)]
+    mix_L = np.zeros(n)
+    out_factor = to_liters(1.0, output_volume_unit)
+    for m, (factor, rs, keys) in enumerate(chosen):
+        targets = [target_of[k] for k in keys]
+        mix_volume = float(sum(volumes[r] for r in rs)) / factor * (1.0 + overage)
+        recipe = compute_recipe(
+            stocks,
+            [TargetComponent(t.name, t.final_value * factor, t.final_unit) for t in targets],
+            mix_volume,
+            final_volume_unit,
+            output_volume_unit,
+            output_mass_unit,
+        )
+        mixes.append(MasterMix(mix_id=f"MM{m + 1}", factor=factor, targets=targets, variants=list(rs), recipe=recipe))
+        for k in keys:
+            in_mix[k] = m
+        for r in rs:
+            vol_L = V_L[r] / factor
+            mix_L[r] += vol_L
+            variant_mixes[r].append((m, float(vol_L / out_factor)))
+
+    top_up_sets = [
+        [t for k, t in zip(keys, targets) if k not in in_mix]
+        for keys, targets in zip(variant_keys, target_sets)
+    ]
+    top_ups = compute_recipes_batch(
+        stocks, top_up_sets, volumes.tolist(), final_volume_unit, output_volume_unit, output_mass_unit
+    )
+    remaining_L = V_L - top_ups.total_stock_volume_L - mix_L
+    warnings = [[w for w in ws if not w.startswith("Total stock volumes")] for ws in top_ups.warnings]
+    for r in np.flatnonzero(remaining_L < 0.0).tolist():
+        warnings[r].append(
+            f"Total stock volumes ({float(V_L[r] - remaining_L[r]):.6g} L) exceed final volume "
+            f"({float(V_L[r]):.6g} L). Check targets/stock concentrations."
+        )
+    count("master_mix.mixes", len(mixes))
+    return MasterMixPlan(
+        mixes=mixes,
+        top_ups=top_ups,
+        variant_mixes=variant_mixes,
+        fill_volume_values=np.where(remaining_L > 0.0, remaining_L, 0.0) / out_factor,
+        warnings=warnings,
+        direct_steps=len(direct.line_stock) + n,
+    )
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple, Union
+
+from fuzzy_match import CandidateIndex, Match, best_match, catalog_fingerprint, normalize_name, top_matches
+from profiling import count
+
+
+# Bump whenever similarity() scoring or the file layout changes.
+CACHE_VERSION = 1
+
+# (catalog fingerprint, kind, normalized query, n) ; kind is "best" or "top"
+CacheKey = Tuple[str, str, str, int]
+# [(candidate, score), ...]
+CacheValue = List[Tuple[str, float]]
+
+
+def default_match_cache_file(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "match_cache.json")
+
+
+class MatchCache:
+    """
+    Bounded LRU cache of fuzzy match results.
+
+    Entries are keyed by the normalized query (scores depend only on it) and
+    a fingerprint of the candidate names, so a changed stocks set never sees
+    results computed for the old one. Entries of several catalogs live side
+    by side and age out through the LRU, so switching back to a previous
+    catalog finds its results again. Safe to share between threads.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, CacheValue]" = OrderedDict()
+        # (names, fingerprint) of the last plain candidate list, so that
+        # repeated calls with the same names do not hash them again
+        self._last_catalog: Optional[Tuple[List[str], str]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self):
+        # picklable for process-pool workers; the lock is per process
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_last_catalog"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _get(self, key: CacheKey) -> Optional[CacheValue]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                count("match_cache.miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            count("match_cache.hit")
+            return value
+
+    def _put(self, key: CacheKey, value: CacheValue) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _catalog(self, candidates: Iterable[str]) -> Tuple[Union[CandidateIndex, List[str]], str]:
+        """Candidates ready for matching, with their fingerprint."""
+        if isinstance(candidates, CandidateIndex):
+            return candidates, candidates.fingerprint
+        names = list(candidates)
+        last = self._last_catalog
+        if last is not None and last[0] == names:
+            return last
+        fingerprint = catalog_fingerprint(names)
+        self._last_catalog = (names, fingerprint)
+        return names, fingerprint
+
+    def best_match(self, query: str, candidates: Iterable[str], min_score: float = 0.72) -> Optional[Match]:
+        """Same result as fuzzy_match.best_match(query, candidates, min_score)."""
+        candidates, fingerprint = self._catalog(candidates)
+        key = (fingerprint, "best", normalize_name(query), 1)
+        value = self._get(key)
+        if value is None:
+            # cache the best candidate whatever its score; the threshold is applied per call
+            m = best_match(query, candidates, min_score=0.0)
+            value = [(m.candidate, m.score)] if m else []
+            self._put(key, value)
+        if not value or value[0][1] < min_score:
+            return None
+        return Match(query=query, candidate=value[0][0], score=value[0][1])
+
+    def top_matches(self, query: str, candidates: Iterable[str], n: int = 5) -> List[Match]:
+        """Same result as fuzzy_match.top_matches(query, candidates, n)."""
+        candidates, fingerprint = self._catalog(candidates)
+        key = (fingerprint, "top", normalize_name(query), n)
+        value = self._get(key)
+        if value is None:
+            value = [(m.candidate, m.score) for m in top_matches(query, candidates, n=n)]
+            self._put(key, value)
+        return [Match(query=query, candidate=c, score=s) for c, s in value]
+
+    def save(self, path: str) -> None:
+        """Write entries (oldest first) atomically as JSON."""
+        import tempfile
+
+        with self._lock:
+            entries = [[*k, v] for k, v in self._entries.items()]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": CACHE_VERSION, "entries": entries}, f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str, max_entries: int = 4096) -> "MatchCache":
+        """Cache restored from `path`; empty if the file is missing, unreadable or outdated."""
+        cache = cls(max_entries=max_entries)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cache
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return cache
+        try:
+            for fp, kind, q_norm, n, value in data.get("entries", []):
+                cache._put((fp, kind, q_norm, int(n)), [(str(c), float(s)) for c, s in value])
+        except (TypeError, ValueError):
+            return cls(max_entries=max_entries)
+        return cache
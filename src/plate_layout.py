@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import csv
+import re
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, Iterable, List, Mapping, Optional, Union
+
+import numpy as np
+
+from stocks_io import CompiledStock, StockItem
+from calculator import RecipeResult, TargetComponent, compute_recipe
+from batch_calculator import BatchRecipeResult, compute_recipes_batch
+from recipe_matrix import RecipeMatrix
+from jobs import error_text
+from export import XlsxRowWriter
+from profiling import timed
+
+
+LAYOUT_FIELDS = ["plate", "well", "final_volume", "final_unit", "component", "value", "unit"]
+_REQUIRED_FIELDS = ("well", "final_volume", "component", "value", "unit")
+
+PLATE_WELL_FIELDS = ["plate", "well", "component", "value", "unit", "quantity"]
+PLATE_TOTAL_FIELDS = ["plate", "component", "total", "unit", "quantity", "wells"]
+CONSUMPTION_FIELDS = ["component", "total", "unit", "quantity", "wells"]
+
+_WELL_RE = re.compile(r"^([A-Za-z]{1,2})0*(\d{1,3})$")
+
+# consolidated warnings list at most this many wells by name
+_MAX_WELLS_LISTED = 6
+
+
+def parse_well(text: str) -> str:
+    """Canonical well name: "a01" -> "A1", "AB24" -> "AB24"."""
+    m = _WELL_RE.match(text.strip())
+    if not m:
+        raise ValueError(f"Invalid well: '{text}'. Use a row letter and column number, e.g. A1 or B12.")
+    return f"{m.group(1).upper()}{int(m.group(2))}"
+
+
+@dataclass
+class PlateWell:
+    plate: str
+    well: str
+    final_volume_value: float
+    targets: List[TargetComponent] = field(default_factory=list)
+
+
+@dataclass
+class PlateLayout:
+    """Wells of one or more plates, in layout order; all wells share one volume unit."""
+    wells: List[PlateWell]
+    final_volume_unit: str = "uL"
+
+    @property
+    def plates(self) -> List[str]:
+        return list(dict.fromkeys(w.plate for w in self.wells))
+
+    def well_labels(self) -> List[str]:
+        """Well names, prefixed by the plate ("P1:A1") when there are several plates."""
+        if len(self.plates) <= 1:
+            return [w.well for w in self.wells]
+        return [f"{w.plate}:{w.well}" for w in self.wells]
+
+
+def read_plate_layout(
+    lines: Iterable[str],
+    final_unit: str = "uL",
+    default_plate: str = "plate1",
+) -> PlateLayout:
+    """
+    Parse a CSV plate layout, one row per (well, component):
+
+        plate,well,final_volume,final_unit,component,value,unit
+        P1,A1,200,uL,Tris-HCl,50,mM
+        P1,A1,,,NaCl,150,mM
+
+    `plate` and `final_unit` are optional columns (defaults: default_plate,
+    final_unit). A well's final volume and unit may be repeated or given
+    on its first row only; a row with an empty component declares a well with no
+    additions. All wells must use the same final volume unit.
+    """
+    reader = csv.DictReader(lines)
+    fields = [f.strip() for f in (reader.fieldnames or [])]
+    missing = [f for f in _REQUIRED_FIELDS if f not in fields]
+    if missing:
+        raise ValueError(f"Plate layout is missing column(s): {', '.join(missing)}")
+    reader.fieldnames = fields
+
+    wells: Dict[tuple, PlateWell] = {}
+    unit: Optional[str] = None
+    for line_no, row in enumerate(reader, start=2):
+        row = {k: (v or "").strip() for k, v in row.items() if k}
+        if not any(row.values()):
+            continue
+        try:
+            key = (row.get("plate") or default_plate, parse_well(row["well"]))
+            row_unit = row.get("final_unit")
+            if row_unit and unit is None:
+                unit = row_unit
+            elif row_unit and row_unit != unit:
+                raise ValueError(f"final_unit '{row_unit}' differs from '{unit}'; use one volume unit per layout.")
+
+            well = wells.get(key)
+            volume = float(row["final_volume"]) if row["final_volume"] else None
+            if well is None:
+                if volume is None:
+                    raise ValueError(f"Missing final_volume for well {key[1]}.")
+                well = wells[key] = PlateWell(plate=key[0], well=key[1], final_volume_value=volume)
+            elif volume is not None and volume != well.final_volume_value:
+                raise ValueError(
+                    f"Well {key[1]} has final_volume {volume:g} but {well.final_volume_value:g} earlier."
+                )
+            if row["component"]:
+                well.targets.append(
+                    TargetComponent(name=row["component"], final_value=float(row["value"]), final_unit=row["unit"])
+                )
+        except ValueError as e:
+            raise ValueError(f"Plate layout line {line_no}: {e}") from e
+    return PlateLayout(wells=list(wells.values()), final_volume_unit=unit or final_unit)
+
+
+def load_plate_layout(path: str, final_unit: str = "uL") -> PlateLayout:
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return read_plate_layout(f, final_unit=final_unit)
+
+
+@dataclass
+class PlateTotal:
+    """Amount of one component added across the wells of one plate."""
+    plate: str
+    component: str
+    quantity: str     # "volume" or "mass"
+    unit: str
+    total: float
+    wells: int
+
+
+@dataclass
+class StockConsumption:
+    """Amount of one stock (or of solvent, for "bring to volume") used by the whole layout."""
+    component: str
+    quantity: str
+    unit: str
+    total: float
+    wells: int
+
+
+@dataclass
+class PlateResult:
+    layout: PlateLayout
+    batch: BatchRecipeResult
+    matrix: RecipeMatrix           # component x well; columns in layout order
+    plate_totals: List[PlateTotal]
+    consumption: List[StockConsumption]
+    warnings: List[str]            # identical per-well warnings are merged
+
+    def well_recipe(self, i: int) -> RecipeResult:
+        """Full recipe of the i-th well (built on demand)."""
+        return self.batch.recipe(i)
+
+
+def _merge_warnings(per_well: List[List[str]], labels: List[str]) -> List[str]:
+    wells_of: Dict[str, List[str]] = {}
+    for label, ws in zip(labels, per_well):
+        for w in ws:
+            wells_of.setdefault(w, []).append(label)
+    merged = []
+    for w, wells in wells_of.items():
+        shown = ", ".join(wells[:_MAX_WELLS_LISTED])
+        if len(wells) > _MAX_WELLS_LISTED:
+            shown += f", ... ({len(wells)} wells)"
+        merged.append(f"{w} [{shown}]")
+    return merged
+
+
+@timed("compute_plate")
+def compute_plate(
+    stocks: Mapping[str, Union[StockItem, CompiledStock]],
+    layout: PlateLayout,
+    output_volume_unit: str = "uL",
+    output_mass_unit: str = "mg",
+) -> PlateResult:
+    """
+    Compute every well of a layout in one batch and total the additions
+    per plate and per stock. A failing well raises a ValueError naming
+    the well.
+    """
+    if not layout.wells:
+        raise ValueError("Plate layout has no wells.")
+    labels = layout.well_labels()
+    target_sets = [w.targets for w in layout.wells]
+    volumes = [w.final_volume_value for w in layout.wells]
+    try:
+        batch = compute_recipes_batch(
+            stocks, target_sets, volumes, layout.final_volume_unit, output_volume_unit, output_mass_unit
+        )
+    except (KeyError, ValueError, TypeError, ZeroDivisionError) as e:
+        # the batch raises the error of the first failing well; find which one it is
+        for label, targets, volume in zip(labels, target_sets, volumes):
+            try:
+                compute_recipe(stocks, targets, volume, layout.final_volume_unit, output_volume_unit, output_mass_unit)
+            except (KeyError, ValueError, TypeError, ZeroDivisionError):
+                raise ValueError(f"Well {label}: {error_text(e)}") from e
+        raise
+    matrix = batch.to_matrix(labels)
+
+    plates = layout.plates
+    plate_pos = {p: i for i, p in enumerate(plates)}
+    well_plate = np.array([plate_pos[w.plate] for w in layout.wells], dtype=np.intp)
+    n_comp, n_plates = len(matrix.components), len(plates)
+    rows = np.repeat(np.arange(n_comp), np.diff(matrix.indptr))
+    key = rows * n_plates + well_plate[matrix.indices]
+    totals = np.bincount(key, weights=matrix.data, minlength=n_comp * n_plates).reshape(n_comp, n_plates)
+    counts = np.bincount(key, minlength=n_comp * n_plates).reshape(n_comp, n_plates)
+    stock_totals = np.bincount(rows, weights=matrix.data, minlength=n_comp)
+    stock_counts = np.diff(matrix.indptr)
+
+    plate_totals = [
+        PlateTotal(
+            plate=plates[p],
+            component=matrix.components[c],
+            quantity=matrix.quantities[c],
+            unit=matrix.units[c],
+            total=float(totals[c, p]),
+            wells=int(counts[c, p]),
+        )
+        for p in range(n_plates)
+        for c in range(n_comp)
+        if counts[c, p]
+    ]
+    consumption = [
+        StockConsumption(
+            component=matrix.components[c],
+            quantity=matrix.quantities[c],
+            unit=matrix.units[c],
+            total=float(stock_totals[c]),
+            wells=int(stock_counts[c]),
+        )
+        for c in range(n_comp)
+    ]
+    return PlateResult(
+        layout=layout,
+        batch=batch,
+        matrix=matrix,
+        plate_totals=plate_totals,
+        consumption=consumption,
+        warnings=_merge_warnings(batch.warnings, labels),
+    )
+
+
+def iter_well_rows(result: PlateResult) -> Iterable[Dict[str, Any]]:
+    """Per-well additions (PLATE_WELL_FIELDS), well by well in layout order."""
+    m = result.matrix
+    rows = np.repeat(np.arange(len(m.components)), np.diff(m.indptr))
+    order = np.argsort(m.indices, kind="stable")
+    wells = result.layout.wells
+    for c, w, v in zip(rows[order].tolist(), m.indices[order].tolist(), m.data[order].tolist()):
+        yield {
+            "plate": wells[w].plate,
+            "well": wells[w].well,
+            "component": m.components[c],
+            "value": v,
+            "unit": m.units[c],
+            "quantity": m.quantities[c],
+        }
+
+
+def _total_rows(items: Iterable[Any], fields: List[str]) -> Iterable[Dict[str, Any]]:
+    for item in items:
+        yield {f: getattr(item, f) for f in fields}
+
+
+@timed("export_plate")
+def export_plate(result: PlateResult, path: str) -> None:
+    """
+    .xlsx: sheets "wells" (per-well additions), "plate_totals" and
+    "consumption". Any other extension: the per-well additions as CSV.
+    """
+    if path.lower().endswith(".xlsx"):
+        with XlsxRowWriter(path, PLATE_WELL_FIELDS, sheet_name="wells") as writer:
+            for name, fields, rows in (
+                ("wells", PLATE_WELL_FIELDS, iter_well_rows(result)),
+                ("plate_totals", PLATE_TOTAL_FIELDS, _total_rows(result.plate_totals, PLATE_TOTAL_FIELDS)),
+                ("consumption", CONSUMPTION_FIELDS, _total_rows(result.consumption, CONSUMPTION_FIELDS)),
+            ):
+                if name != "wells":
+                    writer.add_sheet(name, fields)
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow(row)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        write_plate_wells(result, f)
+
+
+def write_plate_wells(result: PlateResult, out: IO[str]) -> int:
+    """Per-well additions as CSV; returns the number of rows."""
+    w = csv.DictWriter(out, fieldnames=PLATE_WELL_FIELDS, lineterminator="\n")
+    w.writeheader()
+    n = 0
+    for row in iter_well_rows(result):
+        w.writerow(row)
+        n += 1
+    return n
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import functools
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, IO, Iterator, List, Optional, TypeVar
+
+
+F = TypeVar("F", bound=Callable)
+
+
+@dataclass
+class SpanStats:
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+
+class _NullSpan:
+    """Shared no-op context manager returned while profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_enabled = False
+_lock = threading.Lock()
+_spans: Dict[str, SpanStats] = {}
+_counters: Dict[str, int] = {}
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def _record(name: str, elapsed: float) -> None:
+    with _lock:
+        st = _spans.get(name)
+        if st is None:
+            st = _spans[name] = SpanStats()
+        st.count += 1
+        st.total_s += elapsed
+        if elapsed > st.max_s:
+            st.max_s = elapsed
+
+
+def span(name: str):
+    """Time a block: `with span("stage"): ...`. Costs one flag check while profiling is off."""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def count(name: str, n: int = 1) -> None:
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator form of span()."""
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - t0)
+        return wrapper  # type: ignore[return-value]
+    return deco
+
+
+def snapshot() -> Dict[str, object]:
+    """Copy of the collected spans and counters."""
+    with _lock:
+        return {
+            "spans": {k: SpanStats(v.count, v.total_s, v.max_s) for k, v in _spans.items()},
+            "counters": dict(_counters),
+        }
+
+
+def format_summary() -> str:
+    """Per-stage table, slowest stage first. Stages run in worker processes are not included."""
+    snap = snapshot()
+    spans: Dict[str, SpanStats] = snap["spans"]  # type: ignore[assignment]
+    counters: Dict[str, int] = snap["counters"]  # type: ignore[assignment]
+    if not spans and not counters:
+        return "No profiling data."
+    lines: List[str] = [f"{'stage':28s} {'calls':>8s} {'total ms':>11s} {'mean ms':>10s} {'max ms':>10s}"]
+    for name, st in sorted(spans.items(), key=lambda kv: kv[1].total_s, reverse=True):
+        lines.append(
+            f"{name:28s} {st.count:8d} {st.total_s * 1000:11.2f} "
+            f"{st.total_s * 1000 / st.count:10.3f} {st.max_s * 1000:10.3f}"
+        )
+    for name, value in sorted(counters.items()):
+        lines.append(f"{name:28s} {value:8d}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def session(
+    enabled: bool = True,
+    cprofile_path: str = "",
+    trace_memory: bool = False,
+    out: Optional[IO[str]] = None,
+) -> Iterator[None]:
+    """
+    Collect stage timings for the duration of the block and print a summary.
+
+    cprofile_path additionally writes a cProfile dump (open with pstats or
+    snakeviz); trace_memory reports the tracemalloc peak and top allocators.
+    """
+    if not (enabled or cprofile_path or trace_memory):
+        yield
+        return
+
+    out = out or sys.stderr
+    profiler = None
+    if cprofile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+
+    reset()
+    enable()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        disable()
+        print("\nPROFILE:", file=out)
+        print(format_summary(), file=out)
+        if profiler is not None:
+            print(f"cProfile data written to {cprofile_path}", file=out)
+        if trace_memory:
+            import tracemalloc
+            snap = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"Peak traced memory: {peak / 1024:.1f} KiB", file=out)
+            for stat in snap.statistics("lineno")[:5]:
+                print(f"  {stat}", file=out)
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from calculator import BRING_TO_VOLUME_NAME, RecipeResult
+from batch_calculator import BatchRecipeResult
+from profiling import timed
+
+
+MATRIX_FORMATS = ("csv", "npz", "parquet")
+
+# long-format columns (CSV and Parquet): one row per stored entry
+MATRIX_FIELDS = ["component", "recipe_id", "value", "unit", "quantity"]
+
+
+@dataclass
+class RecipeMatrix:
+    """
+    Sparse component x recipe matrix of amounts to add, in CSR form.
+
+    Row c covers entries indptr[c]:indptr[c + 1]; `indices` holds their
+    recipe columns and `data` the amounts. A component is either a volume
+    (stock solutions and the final "bring to volume" row) or a mass
+    (powders), in the unit given by `units[c]`. A component listed twice
+    in one recipe is summed into one entry. Every recipe line is stored,
+    so an addition of 0 (e.g. no "bring to volume") is an explicit entry.
+    """
+    components: List[str]
+    quantities: List[str]          # "volume" or "mass", per component
+    units: List[str]               # per component
+    recipe_ids: List[Any]
+    indptr: np.ndarray             # (C + 1,)
+    indices: np.ndarray            # (nnz,) recipe column
+    data: np.ndarray               # (nnz,) amount
+
+    @property
+    def shape(self):
+        return len(self.components), len(self.recipe_ids)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def to_dense(self) -> np.ndarray:
+        """Dense (components, recipes) array; zeros where a recipe lacks a component."""
+        dense = np.zeros(self.shape, dtype=float)
+        rows = np.repeat(np.arange(len(self.components)), np.diff(self.indptr))
+        dense[rows, self.indices] = self.data
+        return dense
+
+    def iter_rows(self) -> Iterable[Dict[str, Any]]:
+        """Long-format rows (MATRIX_FIELDS), component by component."""
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        data = self.data.tolist()
+        for c, name in enumerate(self.components):
+            unit, quantity = self.units[c], self.quantities[c]
+            for k in range(indptr[c], indptr[c + 1]):
+                yield {
+                    "component": name,
+                    "recipe_id": self.recipe_ids[indices[k]],
+                    "value": data[k],
+                    "unit": unit,
+                    "quantity": quantity,
+                }
+
+
+def _csr(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_rows: int):
+    """CSR arrays from COO triplets; duplicate (row, col) pairs are summed in line order."""
+    order = np.lexsort((cols, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    if len(rows):
+        starts = np.flatnonzero(np.r_[True, (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])])
+        if len(starts) < len(rows):
+            values = np.add.reduceat(values, starts)
+            rows, cols = rows[starts], cols[starts]
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols.astype(np.int64), values.astype(float)
+
+
+@timed("recipe_matrix")
+def matrix_from_batch(batch: BatchRecipeResult, recipe_ids: Optional[Sequence[Any]] = None) -> RecipeMatrix:
+    """
+    Build the matrix straight from the batch's line columns; no RecipeLine
+    objects are created. Recipe ids default to 1, 2, ...
+    """
+    n = len(batch)
+    ids = list(recipe_ids) if recipe_ids is not None else list(range(1, n + 1))
+    if len(ids) != n:
+        raise ValueError("recipe_ids must have one entry per recipe.")
+    n_stocks = len(batch.stock_names)
+
+    # a stock is always the same type, so one quantity per component
+    powder = np.zeros(n_stocks, dtype=bool)
+    powder[batch.line_stock[batch.line_is_powder]] = True
+    values = np.where(batch.line_is_powder, batch.add_mass_values, batch.add_volume_values)
+
+    # the "bring to volume" row goes last
+    rows = np.concatenate([batch.line_stock, np.full(n, n_stocks, dtype=np.intp)])
+    cols = np.concatenate([batch.line_recipe, np.arange(n)])
+    values = np.concatenate([values, batch.fill_volume_values])
+    indptr, indices, data = _csr(rows, cols, values, n_stocks + 1)
+
+    quantities = ["mass" if p else "volume" for p in powder.tolist()] + ["volume"]
+    return RecipeMatrix(
+        components=list(batch.stock_names) + [BRING_TO_VOLUME_NAME],
+        quantities=quantities,
+        units=[batch.output_mass_unit if q == "mass" else batch.output_volume_unit for q in quantities],
+        recipe_ids=ids,
+        indptr=indptr,
+        indices=indices,
+        data=data,
+    )
+
+
+@timed("recipe_matrix")
+def matrix_from_recipes(results: Iterable[RecipeResult], recipe_ids: Optional[Sequence[Any]] = None) -> RecipeMatrix:
+    """
+    The same matrix from individual RecipeResults (e.g. job outcomes).
+    A component must use one unit across all recipes.
+    """
+    comp_pos: Dict[str, int] = {}
+    components: List[str] = []
+    quantities: List[str] = []
+    units: List[str] = []
+    rows: List[int] = []
+    cols: List[int] = []
+    values: List[float] = []
+    n = 0
+    for r, result in enumerate(results):
+        n += 1
+        for line in result.lines:
+            if line.add_mass_value is not None:
+                quantity, unit, value = "mass", line.add_mass_unit, line.add_mass_value
+            else:
+                quantity, unit, value = "volume", line.add_volume_unit, line.add_volume_value
+            c = comp_pos.get(line.name)
+            if c is None:
+                c = comp_pos[line.name] = len(components)
+                components.append(line.name)
+                quantities.append(quantity)
+                units.append(unit)
+            elif (quantities[c], units[c]) != (quantity, unit):
+                raise ValueError(
+                    f"'{line.name}' is given in {units[c]} and in {unit}; "
+                    f"use the same output units for every recipe."
+                )
+            rows.append(c)
+            cols.append(r)
+            values.append(value)
+
+    ids = list(recipe_ids) if recipe_ids is not None else list(range(1, n + 1))
+    if len(ids) != n:
+        raise ValueError("recipe_ids must have one entry per recipe.")
+    # keep "bring to volume" as the last row, like matrix_from_batch
+    order = sorted(range(len(components)), key=lambda c: components[c] == BRING_TO_VOLUME_NAME)
+    remap = np.empty(len(components), dtype=np.intp)
+    remap[order] = np.arange(len(components))
+    indptr, indices, data = _csr(
+        remap[np.asarray(rows, dtype=np.intp)] if rows else np.zeros(0, dtype=np.intp),
+        np.asarray(cols, dtype=np.intp),
+        np.asarray(values, dtype=float),
+        len(components),
+    )
+    return RecipeMatrix(
+        components=[components[c] for c in order],
+        quantities=[quantities[c] for c in order],
+        units=[units[c] for c in order],
+        recipe_ids=ids,
+        indptr=indptr,
+        indices=indices,
+        data=data,
+    )
+
+
+def _matrix_format_for(path: str) -> str:
+    ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+    return ext if ext in MATRIX_FORMATS else "csv"
+
+
+def save_npz(matrix: RecipeMatrix, path: str) -> None:
+    """
+    NumPy .npz holding the CSR arrays under scipy.sparse's names (data,
+    indices, indptr, shape, format), so scipy.sparse.load_npz reads it as
+    is, plus components, quantities, units and recipe_ids.
+    """
+    np.savez_compressed(
+        path,
+        data=matrix.data,
+        indices=matrix.indices,
+        indptr=matrix.indptr,
+        shape=np.asarray(matrix.shape, dtype=np.int64),
+        format=np.asarray("csr"),
+        components=np.asarray(matrix.components, dtype=str),
+        quantities=np.asarray(matrix.quantities, dtype=str),
+        units=np.asarray(matrix.units, dtype=str),
+        recipe_ids=np.asarray([str(i) for i in matrix.recipe_ids], dtype=str),
+    )
+
+
+def load_npz(path: str) -> RecipeMatrix:
+    """Read a matrix written by save_npz (recipe ids come back as strings)."""
+    with np.load(path, allow_pickle=False) as f:
+        return RecipeMatrix(
+            components=f["components"].tolist(),
+            quantities=f["quantities"].tolist(),
+            units=f["units"].tolist(),
+            recipe_ids=f["recipe_ids"].tolist(),
+            indptr=f["indptr"],
+            indices=f["indices"],
+            data=f["data"],
+        )
+
+
+@timed("export_matrix")
+def export_matrix(matrix: RecipeMatrix, path: str, fmt: Optional[str] = None) -> int:
+    """
+    Write the matrix as long-format CSV or Parquet (one row per stored
+    entry, zero amounts included; MATRIX_FIELDS) or as NPZ (CSR arrays). The format defaults to
+    the file extension. Parquet goes through pandas and needs pyarrow or
+    fastparquet. Returns the number of entries written.
+    """
+    fmt = fmt or _matrix_format_for(path)
+    if fmt not in MATRIX_FORMATS:
+        raise ValueError(f"Unsupported matrix format: {fmt}")
+    if fmt == "npz":
+        save_npz(matrix, path)
+    elif fmt == "parquet":
+        import pandas as pd
+
+        rows = np.repeat(np.arange(len(matrix.components)), np.diff(matrix.indptr))
+        pd.DataFrame({
+            "component": np.asarray(matrix.components, dtype=object)[rows],
+            "recipe_id": np.asarray([str(i) for i in matrix.recipe_ids], dtype=object)[matrix.indices],
+            "value": matrix.data,
+            "unit": np.asarray(matrix.units, dtype=object)[rows],
+            "quantity": np.asarray(matrix.quantities, dtype=object)[rows],
+        }).to_parquet(path, index=False)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=MATRIX_FIELDS)
+            w.writeheader()
+            w.writerows(matrix.iter_rows())
+    return matrix.nnz
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
+
+from stocks_io import StockItem, item_to_record, read_stocks_xlsx, record_to_item, stocks_to_dict
+from fuzzy_match import normalize_name
+from profiling import count, timed
+
+if TYPE_CHECKING:  # sqlite3 is imported on first use to keep CLI startup fast
+    import sqlite3
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+COLUMNAR_SUFFIX = ".cols"
+
+# SQLite's default limit on bound parameters is 999
+_FETCH_CHUNK = 500
+
+_COLUMNS = "name, type, conc_kind, conc_value, conc_unit, mw_g_per_mol, purity_fraction, solvent, notes"
+
+# an upsert updates the row in place, so the stock keeps its rowid (catalog position)
+_UPSERT_SET = ", ".join(f"{c} = excluded.{c}" for c in _COLUMNS.split(", ")[1:] + ["norm_name"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stocks (
+    name            TEXT PRIMARY KEY,
+    norm_name       TEXT NOT NULL,
+    type            TEXT NOT NULL,
+    conc_kind       TEXT,
+    conc_value      REAL,
+    conc_unit       TEXT,
+    mw_g_per_mol    REAL,
+    purity_fraction REAL NOT NULL DEFAULT 1.0,
+    solvent         TEXT NOT NULL DEFAULT '',
+    notes           TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS stocks_norm_name ON stocks (norm_name);
+"""
+
+
+class StockStore(Mapping, ABC):
+    """
+    Read-only name -> StockItem catalog.
+
+    Usable anywhere a stocks dict is (it is a Mapping), but backends can
+    answer fetch() for just the names a recipe references instead of
+    materializing the whole catalog; compute_recipe uses it that way.
+    """
+
+    @abstractmethod
+    def fetch(self, names: Iterable[str]) -> Dict[str, StockItem]:
+        """Items for the given names that exist; unknown names are left out."""
+
+    @abstractmethod
+    def names(self) -> List[str]:
+        """All stock names, in catalog order."""
+
+    def to_dict(self) -> Dict[str, StockItem]:
+        """The whole catalog as a plain dict, in catalog order."""
+        return self.fetch(self.names())
+
+    def close(self) -> None:
+        pass
+
+    def __getitem__(self, name: str) -> StockItem:
+        found = self.fetch([name])
+        if name not in found:
+            raise KeyError(name)
+        return found[name]
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and name in self.fetch([name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names())
+
+    def __len__(self) -> int:
+        return len(self.names())
+
+
+class SQLiteStockStore(StockStore):
+    """
+    Stock catalog in a SQLite file, indexed on name and normalized name.
+
+    Each thread gets its own connection, so readers (server workers, GUI
+    tasks) can share one store and one file; the database uses WAL mode so
+    an import does not block them. Pickles as its path, so process-pool
+    workers reopen the file instead of copying the catalog.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3
+
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @timed("stock_store.fetch")
+    def fetch(self, names: Iterable[str]) -> Dict[str, StockItem]:
+        wanted = list(dict.fromkeys(names))
+        conn = self._connect()
+        found: Dict[str, StockItem] = {}
+        for i in range(0, len(wanted), _FETCH_CHUNK):
+            chunk = wanted[i:i + _FETCH_CHUNK]
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM stocks WHERE name IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for row in rows:
+                found[row[0]] = record_to_item(row)
+        count("stock_store.fetched", len(found))
+        return found
+
+    def names(self) -> List[str]:
+        return [r[0] for r in self._connect().execute("SELECT name FROM stocks ORDER BY rowid")]
+
+    def lookup_normalized(self, query: str) -> List[str]:
+        """Names whose normalized form equals the normalized query (uses the index)."""
+        rows = self._connect().execute(
+            "SELECT name FROM stocks WHERE norm_name = ? ORDER BY rowid", (normalize_name(query),)
+        )
+        return [r[0] for r in rows]
+
+    def to_dict(self) -> Dict[str, StockItem]:
+        """The whole catalog in one query, in catalog order."""
+        rows = self._connect().execute(f"SELECT {_COLUMNS} FROM stocks ORDER BY rowid")
+        return {r[0]: record_to_item(r) for r in rows}
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+        row = self._connect().execute("SELECT 1 FROM stocks WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM stocks").fetchone()[0]
+
+    @timed("stock_store.import")
+    def import_items(self, items: Iterable[StockItem], replace: bool = True) -> int:
+        """
+        Write items in one transaction. replace=True swaps out the whole
+        catalog; otherwise items are upserted by name, and a stock that is
+        already there keeps its place in catalog order. Returns the count written.
+        """
+        rows = [(*item_to_record(i), normalize_name(i.name)) for i in items]
+        conn = self._connect()
+        with conn:
+            if replace:
+                conn.execute("DELETE FROM stocks")
+            conn.executemany(
+                f"INSERT INTO stocks ({_COLUMNS}, norm_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT(name) DO UPDATE SET {_UPSERT_SET}",
+                rows,
+            )
+        return len(rows)
+
+
+def is_sqlite_path(path: str) -> bool:
+    return path.lower().endswith(SQLITE_SUFFIXES)
+
+
+def is_columnar_path(path: str) -> bool:
+    return path.rstrip("/\\").lower().endswith(COLUMNAR_SUFFIX)
+
+
+def open_stocks(path: str, sheet_name: str = "stocks", cache_dir: Optional[str] = None) -> Mapping:
+    """
+    A SQLiteStockStore for .db/.sqlite paths, a ColumnarStockStore for .cols
+    directories, otherwise the workbook sheet as a dict.
+    """
+    if is_columnar_path(path):
+        from columnar_store import ColumnarStockStore  # needs NumPy
+
+        return ColumnarStockStore(path)
+    if is_sqlite_path(path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Stock database not found: {path}")
+        return SQLiteStockStore(path)
+    return stocks_to_dict(read_stocks_xlsx(path, sheet_name=sheet_name, cache_dir=cache_dir))
+
+
+def load_stocks_dict(path: str, sheet_name: str = "stocks", cache_dir: Optional[str] = None) -> Dict[str, StockItem]:
+    """The whole catalog as a dict, from a workbook or a stock catalog."""
+    stocks = open_stocks(path, sheet_name=sheet_name, cache_dir=cache_dir)
+    if isinstance(stocks, StockStore):
+        try:
+            return stocks.to_dict()
+        finally:
+            stocks.close()
+    return stocks
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Import a stocks workbook into a SQLite stock catalog")
+    p.add_argument("xlsx", help="Stocks workbook (.xlsx, same template as app_cli --stocks)")
+    p.add_argument("db", help="SQLite catalog to create or update (e.g. stocks.db)")
+    p.add_argument("--sheet", default="stocks", help="Sheet name inside the xlsx (default: stocks)")
+    p.add_argument("--merge", action="store_true", help="Upsert by name instead of replacing the catalog")
+    args = p.parse_args()
+
+    items = read_stocks_xlsx(args.xlsx, sheet_name=args.sheet)
+    store = SQLiteStockStore(args.db)
+    written = store.import_items(items, replace=not args.merge)
+    print(f"Imported {written} stock items into {args.db} ({len(store)} total).")
+
+
+if __name__ == "__main__":
+    main()
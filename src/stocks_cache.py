@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import sys
+from typing import List, Optional, Tuple
+
+
+# Bump whenever the record layout or the parsing rules in stocks_io change.
+SCHEMA_VERSION = 1
+
+# (name, type, conc_kind, conc_value, conc_unit, mw_g_per_mol, purity_fraction, solvent, notes)
+StockRecord = Tuple[str, str, Optional[str], Optional[float], Optional[str], Optional[float], float, str, str]
+
+
+def default_cache_dir() -> str:
+    """$BUFFER_BUILDER_CACHE, or ~/.cache/buffer_builder."""
+    env = os.environ.get("BUFFER_BUILDER_CACHE", "").strip()
+    if env:
+        return env
+    return os.path.join(os.path.expanduser("~"), ".cache", "buffer_builder")
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _source_prefix(path: str, sheet_name: str) -> str:
+    src = f"{os.path.abspath(path)}\0{sheet_name}".encode("utf-8")
+    return "stocks-" + hashlib.sha1(src).hexdigest()[:16]
+
+
+def cache_file_for(cache_dir: str, path: str, sheet_name: str) -> str:
+    """
+    Cache file for the current content of a workbook sheet.
+
+    The name combines the workbook location with a hash of its content, the
+    sheet name, the schema version and the Python version (marshal format).
+    """
+    key = hashlib.sha256(
+        f"{file_digest(path)}\0{sheet_name}\0{SCHEMA_VERSION}\0{sys.version_info[0]}.{sys.version_info[1]}".encode(
+            "utf-8"
+        )
+    ).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{_source_prefix(path, sheet_name)}-{key}.bin")
+
+
+def load_records(cache_file: str) -> Optional[List[StockRecord]]:
+    """Return cached records, or None on a miss or an unreadable cache file."""
+    try:
+        with open(cache_file, "rb") as f:
+            version, records = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != SCHEMA_VERSION:
+        return None
+    return records
+
+
+def store_records(cache_file: str, records: List[StockRecord]) -> None:
+    """Write records atomically and drop stale entries for the same workbook sheet."""
+    import tempfile  # only needed on a cache miss; keeps startup lean
+
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump((SCHEMA_VERSION, records), f)
+        os.replace(tmp, cache_file)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    base = os.path.basename(cache_file)
+    prefix = base.rsplit("-", 1)[0] + "-"
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(prefix) and entry.endswith(".bin") and entry != base:
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except OSError:
+                pass
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Literal
-
-import pandas as pd
+from typing import TYPE_CHECKING, Callable, Dict, List, Mapping, Optional, Literal, Tuple
 
 from units import parse_concentration, Concentration
+from stocks_cache import StockRecord, cache_file_for, load_records, store_records
+from profiling import count, span, timed
+
+
+if TYPE_CHECKING:  # pandas/numpy are imported lazily to keep CLI startup fast
+    import numpy as np
+    import pandas as pd
 
 
 StockType = Literal["stock_solution", "powder"]
 
+# compile_stocks reports progress (and lets the caller cancel) this often
+_PROGRESS_EVERY = 1000
+
 
 REQUIRED_COLUMNS = [
     "name",
@@ -48,7 +56,71 @@ class StockItem:
     notes: str = ""
 
 
+class CompiledStock:
+    """
+    A StockItem reduced to what the calculators read, with the stock
+    concentration already converted to the base unit of its kind (M, g/L,
+    fraction, fold).
+
+    Built once per catalog load so recipes do not re-parse units for every
+    target. A concentration that cannot be converted keeps the error in
+    `conc_error`; the calculator raises it where Concentration.as_M() etc. would.
+    """
+    __slots__ = (
+        "name", "type", "conc_kind", "conc_unit", "conc_base", "conc_error",
+        "mw_g_per_mol", "purity_fraction", "notes", "item",
+    )
+
+    def __init__(self, item: StockItem):
+        c = item.concentration
+        self.name = item.name
+        self.type = item.type
+        self.conc_kind = c.kind if c is not None else None
+        self.conc_unit = c.unit if c is not None else None
+        self.conc_base: Optional[float] = None
+        self.conc_error: Optional[Exception] = None
+        if c is not None:
+            try:
+                self.conc_base = c.as_base()
+            except ValueError as e:
+                self.conc_error = e
+        self.mw_g_per_mol = float(item.mw_g_per_mol) if item.mw_g_per_mol is not None else None
+        self.purity_fraction = item.purity_fraction
+        self.notes = (item.notes or "").strip()
+        self.item = item
+
+    def __repr__(self) -> str:
+        return f"CompiledStock({self.name!r}, {self.type!r}, conc_base={self.conc_base!r})"
+
+
+def compile_stock(item) -> CompiledStock:
+    """CompiledStock for a StockItem; already compiled records are returned as is."""
+    return item if type(item) is CompiledStock else CompiledStock(item)
+
+
+@timed("compile_stocks")
+def compile_stocks(
+    stocks: Mapping[str, StockItem],
+    progress: Optional[Callable[[str, Optional[float]], None]] = None,
+) -> Dict[str, CompiledStock]:
+    """
+    Compile every item of an in-memory stocks dict (keys are kept).
+    `progress(message, fraction)` is called every _PROGRESS_EVERY items
+    and may raise to abort.
+    """
+    if progress is None:
+        return {name: compile_stock(item) for name, item in stocks.items()}
+    compiled: Dict[str, CompiledStock] = {}
+    for i, (name, item) in enumerate(stocks.items()):
+        if i % _PROGRESS_EVERY == 0:
+            progress(f"Compiling stocks ({i}/{len(stocks)})", i / len(stocks))
+        compiled[name] = compile_stock(item)
+    return compiled
+
+
 def _coerce_float(x) -> Optional[float]:
+    import pandas as pd
+
     if x is None:
         return None
     try:
@@ -63,6 +135,8 @@ def _coerce_float(x) -> Optional[float]:
 
 
 def _coerce_str(x) -> str:
+    import pandas as pd
+
     if x is None:
         return ""
     try:
@@ -73,7 +147,100 @@ def _coerce_str(x) -> str:
     return str(x).strip()
 
 
-def read_stocks_xlsx(path: str, sheet_name: str = "stocks") -> List[StockItem]:
+def _str_column(df: pd.DataFrame, col: str) -> List[str]:
+    """Column-wise _coerce_str; a missing column reads as empty strings."""
+    if col not in df.columns:
+        return [""] * len(df)
+    s = df[col]
+    return s.where(s.notna(), "").astype(str).str.strip().tolist()
+
+
+def _float_column(df: pd.DataFrame, col: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Column-wise _coerce_float.
+
+    Returns (values, present); values is NaN wherever present is False.
+    Cells pandas cannot parse fall back to _coerce_float one by one.
+    """
+    import numpy as np
+    import pandas as pd
+
+    n = len(df)
+    if col not in df.columns:
+        return np.full(n, np.nan), np.zeros(n, dtype=bool)
+    s = df[col]
+    values = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    present = ~np.isnan(values)
+    leftover = np.flatnonzero(s.notna().to_numpy() & ~present)
+    for i in leftover.tolist():
+        v = _coerce_float(s.iloc[i])
+        if v is not None:
+            values[i] = v
+            present[i] = True
+    return values, present
+
+
+def item_to_record(item: StockItem) -> StockRecord:
+    c = item.concentration
+    return (
+        item.name,
+        item.type,
+        c.kind if c is not None else None,
+        c.value if c is not None else None,
+        c.unit if c is not None else None,
+        item.mw_g_per_mol,
+        item.purity_fraction,
+        item.solvent,
+        item.notes,
+    )
+
+
+def record_to_item(rec: StockRecord) -> StockItem:
+    name, typ, kind, value, unit, mw, purity, solvent, notes = rec
+    return StockItem(
+        name=name,
+        type=typ,
+        concentration=Concentration(kind, value, unit) if kind is not None else None,
+        mw_g_per_mol=mw,
+        purity_fraction=purity,
+        solvent=solvent,
+        notes=notes,
+    )
+
+
+@timed("read_stocks_xlsx")
+def read_stocks_xlsx(path: str, sheet_name: str = "stocks", cache_dir: Optional[str] = None) -> List[StockItem]:
+    """
+    Read and validate the stocks sheet of a workbook.
+
+    With cache_dir set, the parsed items are cached there, keyed by the
+    workbook content, sheet name and cache schema version; an edited
+    workbook simply misses the cache and is parsed again.
+    """
+    if not cache_dir:
+        with span("parse_stocks_sheet"):
+            return _parse_stocks_sheet(path, sheet_name)
+
+    cache_file = cache_file_for(cache_dir, path, sheet_name)
+    records = load_records(cache_file)
+    if records is not None:
+        count("stocks_cache.hit")
+        return [record_to_item(r) for r in records]
+
+    count("stocks_cache.miss")
+    with span("parse_stocks_sheet"):
+        items = _parse_stocks_sheet(path, sheet_name)
+    try:
+        store_records(cache_file, [item_to_record(i) for i in items])
+    except OSError:
+        pass  # caching is best effort
+    return items
+
+
+def _parse_stocks_sheet(path: str, sheet_name: str) -> List[StockItem]:
+    import numpy as np
+    import pandas as pd
+
     df = pd.read_excel(path, sheet_name=sheet_name, engine="openpyxl")
     df.columns = [str(c).strip().lower() for c in df.columns]
 
@@ -81,58 +248,86 @@ def read_stocks_xlsx(path: str, sheet_name: str = "stocks") -> List[StockItem]:
         if col not in df.columns:
             raise ValueError(f"Missing required column '{col}' in stocks sheet '{sheet_name}'.")
 
-    items: List[StockItem] = []
+    names = _str_column(df, "name")
+    types = [t.lower() for t in _str_column(df, "type")]
+    solvents = _str_column(df, "solvent")
+    notes = _str_column(df, "notes")
+    conc_units = _str_column(df, "concentration_unit")
+    conc_values, has_conc_value = _float_column(df, "concentration_value")
+    mws, has_mw = _float_column(df, "mw_g_per_mol")
+    purities, has_purity = _float_column(df, "purity_fraction")
+    purities = np.where(has_purity, purities, 1.0)
 
-    for _, row in df.iterrows():
-        name = _coerce_str(row.get("name"))
-        if not name:
-            continue
+    # Parse each distinct concentration unit once
+    parsed_units: Dict[str, Optional[Concentration]] = {}
+    for u in set(conc_units):
+        try:
+            parsed_units[u] = parse_concentration(1.0, u) if u else None
+        except ValueError:
+            parsed_units[u] = None
 
-        typ = _coerce_str(row.get("type")).lower()
-        if typ not in ("stock_solution", "powder"):
-            raise ValueError(f"Invalid type '{typ}' for '{name}'. Use 'stock_solution' or 'powder'.")
+    type_arr = np.array(types, dtype=object)
+    keep = np.array([bool(n) for n in names], dtype=bool)
+    is_solution = keep & (type_arr == "stock_solution")
+    is_powder = keep & (type_arr == "powder")
+    unit_ok = np.array([parsed_units[u] is not None for u in conc_units], dtype=bool)
+    has_unit = np.array([bool(u) for u in conc_units], dtype=bool)
 
-        solvent = _coerce_str(row.get("solvent"))
-        notes = _coerce_str(row.get("notes"))
+    bad_type = keep & ~is_solution & ~is_powder
+    missing_conc = is_solution & ~(has_conc_value & has_unit)
+    bad_unit = is_solution & ~missing_conc & ~unit_ok
+    bad_purity = is_powder & ((purities <= 0) | (purities > 1.0))
 
-        if typ == "stock_solution":
-            cv = _coerce_float(row.get("concentration_value"))
-            cu = _coerce_str(row.get("concentration_unit"))
-            if cv is None or not cu:
-                raise ValueError(
-                    f"Stock solution '{name}' requires concentration_value and concentration_unit."
-                )
-            conc = parse_concentration(cv, cu)
+    # Raise the error the first offending row would have raised when read row by row
+    bad = np.flatnonzero(bad_type | missing_conc | bad_unit | bad_purity)
+    if bad.size:
+        i = int(bad[0])
+        name = names[i]
+        if bad_type[i]:
+            raise ValueError(f"Invalid type '{types[i]}' for '{name}'. Use 'stock_solution' or 'powder'.")
+        if missing_conc[i]:
+            raise ValueError(
+                f"Stock solution '{name}' requires concentration_value and concentration_unit."
+            )
+        if bad_unit[i]:
+            parse_concentration(conc_values[i], conc_units[i])
+        raise ValueError(f"purity_fraction for '{name}' must be in (0, 1].")
+
+    conc_list = conc_values.tolist()
+    mw_list = np.where(has_mw, mws, np.nan).tolist()
+    has_mw_list = has_mw.tolist()
+    purity_list = purities.tolist()
+    powder_list = is_powder.tolist()
+
+    items: List[StockItem] = []
+    for i in np.flatnonzero(keep).tolist():
+        if powder_list[i]:
             items.append(
                 StockItem(
-                    name=name,
-                    type="stock_solution",
-                    concentration=conc,
-                    solvent=solvent,
-                    notes=notes,
+                    name=names[i],
+                    type="powder",
+                    mw_g_per_mol=mw_list[i] if has_mw_list[i] else None,
+                    purity_fraction=purity_list[i],
+                    solvent=solvents[i],
+                    notes=notes[i],
                 )
             )
         else:
-            mw = _coerce_float(row.get("mw_g_per_mol"))
-            purity = _coerce_float(row.get("purity_fraction"))
-            if purity is None:
-                purity = 1.0
-            if purity <= 0 or purity > 1.0:
-                raise ValueError(f"purity_fraction for '{name}' must be in (0, 1].")
-
+            unit = parsed_units[conc_units[i]]
             items.append(
                 StockItem(
-                    name=name,
-                    type="powder",
-                    mw_g_per_mol=mw,
-                    purity_fraction=float(purity),
-                    solvent=solvent,
-                    notes=notes,
+                    name=names[i],
+                    type="stock_solution",
+                    concentration=Concentration(unit.kind, conc_list[i], unit.unit),
+                    solvent=solvents[i],
+                    notes=notes[i],
                 )
             )
 
     return items
 
 
+@timed("stocks_to_dict")
 def stocks_to_dict(items: List[StockItem]) -> Dict[str, StockItem]:
+    """Items by name; a repeated name keeps its last definition (see stocks_merge.DEFAULT_CONFLICT_POLICY)."""
     return {i.name: i for i in items}
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Tuple
+
+from stocks_io import StockItem, read_stocks_xlsx
+from stock_store import is_columnar_path, is_sqlite_path, load_stocks_dict
+from profiling import timed
+
+ConflictPolicy = Literal["first", "last", "error"]
+
+# A name defined more than once keeps its last definition by default, the
+# same as stocks_to_dict() does for a name repeated within one sheet.
+DEFAULT_CONFLICT_POLICY: ConflictPolicy = "last"
+
+ALL_SHEETS = "*"
+
+
+@dataclass(frozen=True)
+class StockSource:
+    """One sheet of one workbook (sheet is ignored for .db/.cols catalogs)."""
+    path: str
+    sheet: str = "stocks"
+
+    @property
+    def label(self) -> str:
+        if is_sqlite_path(self.path) or is_columnar_path(self.path):
+            return self.path
+        return f"{self.path}#{self.sheet}"
+
+
+def parse_source_spec(spec: str, default_sheet: str = "stocks") -> StockSource:
+    """
+    "freezer1.xlsx", "freezer1.xlsx#buffers" or "freezer1.xlsx#*" (every sheet).
+    A '#' followed by a path separator is part of the file name.
+    """
+    path, sep, sheet = spec.rpartition("#")
+    if not sep or not sheet or "/" in sheet or "\\" in sheet:
+        return StockSource(spec, default_sheet)
+    return StockSource(path, sheet)
+
+
+def _sheet_names(path: str) -> List[str]:
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def expand_sources(sources: Iterable[StockSource]) -> List[StockSource]:
+    """Replace "#*" sources by one source per sheet; drop repeats."""
+    out: List[StockSource] = []
+    for s in sources:
+        if s.sheet == ALL_SHEETS and not (is_sqlite_path(s.path) or is_columnar_path(s.path)):
+            out.extend(StockSource(s.path, name) for name in _sheet_names(s.path))
+        else:
+            out.append(s)
+    return list(dict.fromkeys(out))
+
+
+@dataclass
+class StockConflict:
+    """A name defined by more than one source (or twice in one)."""
+    name: str
+    sources: List[str]      # labels, in load order
+    kept: str               # label of the definition that was kept
+    identical: bool         # True when every definition is the same item
+
+
+@dataclass
+class MergedStocks:
+    stocks: Dict[str, StockItem]
+    sources: Dict[str, str]                 # stock name -> label of its source
+    conflicts: List[StockConflict] = field(default_factory=list)
+    inputs: List[str] = field(default_factory=list)   # labels of all loaded sources, in order
+
+    @property
+    def duplicates(self) -> List[StockConflict]:
+        """Names repeated with identical definitions (harmless)."""
+        return [c for c in self.conflicts if c.identical]
+
+    @property
+    def conflicting(self) -> List[StockConflict]:
+        """Names whose definitions differ between sources."""
+        return [c for c in self.conflicts if not c.identical]
+
+    def report(self) -> List[str]:
+        """One line per conflict or duplicate, for logs."""
+        lines = []
+        for c in self.conflicts:
+            kind = "duplicate" if c.identical else "CONFLICT"
+            others = [s for s in c.sources if s != c.kept] or c.sources[1:]
+            lines.append(f"{kind}: '{c.name}' kept from {c.kept} (also in {', '.join(others)})")
+        return lines
+
+
+def _load_source(source: StockSource, cache_dir: Optional[str]) -> List[StockItem]:
+    try:
+        if is_sqlite_path(source.path) or is_columnar_path(source.path):
+            return list(load_stocks_dict(source.path).values())
+        return read_stocks_xlsx(source.path, sheet_name=source.sheet, cache_dir=cache_dir)
+    except ValueError as e:
+        raise ValueError(f"{source.label}: {e}") from e
+
+
+def merge_stock_lists(
+    loaded: Sequence[Tuple[str, List[StockItem]]],
+    on_conflict: ConflictPolicy = DEFAULT_CONFLICT_POLICY,
+) -> MergedStocks:
+    """
+    Merge (source label, items) lists in order. A name seen more than once
+    keeps its last ("last", the default) or first ("first") definition;
+    "error" raises a ValueError listing every name whose definitions differ.
+    """
+    if on_conflict not in ("first", "last", "error"):
+        raise ValueError(f"Unknown conflict policy: {on_conflict}")
+    stocks: Dict[str, StockItem] = {}
+    sources: Dict[str, str] = {}
+    seen: Dict[str, List[Tuple[str, StockItem]]] = {}
+    for label, items in loaded:
+        for item in items:
+            defs = seen.setdefault(item.name, [])
+            defs.append((label, item))
+            if len(defs) == 1 or on_conflict == "last":
+                stocks[item.name] = item
+                sources[item.name] = label
+
+    conflicts = []
+    for name, defs in seen.items():
+        if len(defs) > 1:
+            conflicts.append(StockConflict(
+                name=name,
+                sources=[label for label, _ in defs],
+                kept=sources[name],
+                identical=all(item == defs[0][1] for _, item in defs),
+            ))
+    merged = MergedStocks(
+        stocks=stocks, sources=sources, conflicts=conflicts, inputs=[label for label, _ in loaded]
+    )
+    if on_conflict == "error" and merged.conflicting:
+        raise ValueError("Conflicting stock definitions:\n" + "\n".join(
+            f"  '{c.name}' in {', '.join(c.sources)}" for c in merged.conflicting
+        ))
+    return merged
+
+
+@timed("load_stock_sources")
+def load_stock_sources(
+    sources: Iterable[StockSource],
+    cache_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    processes: bool = False,
+    on_conflict: ConflictPolicy = DEFAULT_CONFLICT_POLICY,
+) -> MergedStocks:
+    """
+    Load several workbooks/sheets/catalogs concurrently and merge them.
+
+    Sources are read on a thread pool (overlaps file and cache I/O), or on a
+    process pool with processes=True, which also parallelizes parsing of
+    uncached workbooks. The merge always follows source order, whatever
+    order the loads finish in.
+    """
+    sources = expand_sources(sources)
+    if not sources:
+        return MergedStocks(stocks={}, sources={})
+    if workers is None:
+        workers = (os.cpu_count() or 1) if processes else 8
+    workers = max(1, min(len(sources), workers))
+    if len(sources) == 1 or workers == 1:
+        loaded = [_load_source(s, cache_dir) for s in sources]
+    else:
+        # pools are imported only when several sources are read (CLI startup time)
+        if processes:
+            from concurrent.futures import ProcessPoolExecutor as Pool
+        else:
+            from concurrent.futures import ThreadPoolExecutor as Pool
+        with Pool(max_workers=workers) as pool:
+            loaded = list(pool.map(_load_source, sources, [cache_dir] * len(sources)))
+    return merge_stock_lists([(s.label, items) for s, items in zip(sources, loaded)], on_conflict)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from stocks_io import CompiledStock, StockItem, compile_stock, compile_stocks
+from stock_store import load_stocks_dict
+from fuzzy_match import CandidateIndex
+from profiling import count, timed
+
+
+@dataclass
+class StocksDiff:
+    """Names added, removed or changed between two loads of a stocks file."""
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    # the new order is not the old one minus `removed` plus `added` at the end
+    reordered: bool = False
+
+    @property
+    def names(self) -> List[str]:
+        return self.added + self.removed + self.changed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def diff_stocks(old: Mapping[str, StockItem], new: Mapping[str, StockItem]) -> StocksDiff:
+    """Compare two stocks dicts item by item; names are listed in catalog order."""
+    diff = StocksDiff()
+    for name, item in new.items():
+        prev = old.get(name)
+        if prev is None:
+            diff.added.append(name)
+        elif prev != item:
+            diff.changed.append(name)
+    diff.removed = [name for name in old if name not in new]
+    diff.reordered = list(new) != [name for name in old if name in new] + diff.added
+    return diff
+
+
+@dataclass
+class StocksUpdate:
+    """A newly read version of the stocks file, not yet applied."""
+    stocks: Dict[str, StockItem]
+    signature: Tuple[int, int]
+    diff: StocksDiff
+
+
+def file_signature(path: str) -> Tuple[int, int]:
+    """(mtime_ns, size) of a file, or the newest of a directory's files (.cols catalogs)."""
+    st = os.stat(path)
+    if not os.path.isdir(path):
+        return st.st_mtime_ns, st.st_size
+    stats = [os.stat(e.path) for e in os.scandir(path) if e.is_file()]
+    return max([s.st_mtime_ns for s in stats] + [st.st_mtime_ns]), sum(s.st_size for s in stats)
+
+
+StocksListener = Callable[[StocksDiff], None]
+
+
+class StocksWatcher:
+    """
+    Keeps stocks loaded from a workbook (or catalog) current as the file changes.
+
+    poll() checks the file signature and, when it changed, reads the file,
+    diffs it against the current stocks and applies only the difference:
+    changed items are recompiled and only added/removed names touch the
+    fuzzy index. Listeners are called with the diff after every non-empty
+    update.
+
+    The workbook itself is re-read in full (xlsx cannot be read partially),
+    but nothing downstream is rebuilt. Updates are copy-on-write: `stocks`,
+    `compiled` and `index` are replaced with new objects, never mutated, so
+    readers holding the previous ones are unaffected. The new index shares
+    its storage with the previous one and keeps the file's order, so ties
+    and catalog_fingerprint() are the same as after a fresh load; only when
+    rows were moved or inserted mid-file is it rebuilt (from the names
+    normalized already). read_changes() and apply() can be called
+    separately, e.g. reading on a worker thread and applying on the GUI
+    thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sheet_name: str = "stocks",
+        cache_dir: Optional[str] = None,
+        progress: Optional[Callable[[str, Optional[float]], None]] = None,
+    ):
+        """`progress(message, fraction)` is called between loading stages and may raise to abort."""
+        report = progress or (lambda message, fraction: None)
+        self.path = path
+        self.sheet_name = sheet_name
+        self.cache_dir = cache_dir
+        self.signature = file_signature(path)
+        report("Reading stocks", None)
+        self.stocks: Dict[str, StockItem] = load_stocks_dict(path, sheet_name=sheet_name, cache_dir=cache_dir)
+        report(f"Compiling {len(self.stocks)} stocks", None)
+        self.compiled: Dict[str, CompiledStock] = compile_stocks(self.stocks, progress=progress)
+        report(f"Indexing {len(self.stocks)} names", None)
+        self.index = CandidateIndex(self.stocks.keys())
+        report("Stocks loaded", 1.0)
+        self._listeners: List[StocksListener] = []
+
+    def add_listener(self, listener: StocksListener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: StocksListener) -> None:
+        self._listeners.remove(listener)
+
+    def read_changes(self) -> Optional[StocksUpdate]:
+        """Read the file if its signature changed; None when it did not."""
+        signature = file_signature(self.path)
+        if signature == self.signature:
+            return None
+        stocks = load_stocks_dict(self.path, sheet_name=self.sheet_name, cache_dir=self.cache_dir)
+        return StocksUpdate(stocks=stocks, signature=signature, diff=diff_stocks(self.stocks, stocks))
+
+    @timed("stocks_watch.apply")
+    def apply(self, update: StocksUpdate) -> StocksDiff:
+        diff = update.diff
+        if diff:
+            compiled = dict(self.compiled)
+            for name in diff.removed:
+                del compiled[name]
+            for name in diff.added + diff.changed:
+                compiled[name] = compile_stock(update.stocks[name])
+            self.compiled = compiled
+            count("stocks_watch.changed", len(diff.names))
+        if diff.reordered:
+            self.compiled = {name: self.compiled[name] for name in update.stocks}
+            self.index = self.index.reindexed(update.stocks.keys())
+        elif diff.added or diff.removed:
+            index = self.index.copy()
+            index.remove(diff.removed)
+            index.add(diff.added)
+            self.index = index
+        self.stocks = update.stocks
+        self.signature = update.signature
+        if diff:
+            for listener in list(self._listeners):
+                listener(diff)
+        return diff
+
+    def poll(self) -> Optional[StocksDiff]:
+        """Apply pending file changes; None if the file is unchanged."""
+        update = self.read_changes()
+        return self.apply(update) if update is not None else None
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Literal
+from functools import lru_cache
+from typing import Dict, Literal, Optional, Tuple
 
 
 Number = float
@@ -13,150 +14,191 @@ def _norm_unit(u: str) -> str:
     return u.strip().replace("µ", "u").replace("μ", "u")
 
 
-# -------- Volume --------
-_VOLUME_TO_L = {
-    "l": 1.0,
-    "ml": 1e-3,
-    "ul": 1e-6,
-    "nl": 1e-9,
+# Every known unit, by dimension: token (normalized, lower case, no spaces)
+# -> factor to the dimension's base unit. This is the only unit table;
+# lookups, conversion factors and concentration parsing are derived from it.
+_UNIT_TABLE: Dict[str, Dict[str, float]] = {
+    # base = L
+    "volume": {
+        "l": 1.0,
+        "ml": 1e-3,
+        "ul": 1e-6,
+        "nl": 1e-9,
+    },
+    # base = g
+    "mass": {
+        "g": 1.0,
+        "mg": 1e-3,
+        "ug": 1e-6,
+        "ng": 1e-9,
+    },
+    # base = mol
+    "amount": {
+        "mol": 1.0,
+        "mmol": 1e-3,
+        "umol": 1e-6,
+        "nmol": 1e-9,
+        "pmol": 1e-12,
+    },
+    # base = M (mol/L)
+    "molar": {
+        "m": 1.0,
+        "mm": 1e-3,
+        "um": 1e-6,
+        "nm": 1e-9,
+        "pm": 1e-12,
+    },
+    # base = g/L
+    "massvol": {
+        "g/l": 1.0,
+        "mg/ml": 1.0,      # 1 mg/mL = 1 g/L
+        "ug/ml": 1e-3,     # 1 ug/mL = 1e-3 g/L
+        "ng/ml": 1e-6,
+        "mg/l": 1e-3,
+        "ug/ul": 1.0,      # 1 ug/uL = 1 g/L
+        "%w/v": 10.0,      # 1% (w/v) = 1 g/100 mL = 10 g/L
+        "w/v%": 10.0,
+    },
+    # base = fraction (0.01 = 1%)
+    "volvol": {
+        "%": 0.01,         # 1% (v/v) = 0.01 fraction
+        "v/v%": 0.01,
+        "%v/v": 0.01,
+    },
+    # base = fold over working strength (10X stock -> 1X final)
+    "fold": {
+        "x": 1.0,
+        "×": 1.0,
+    },
+    # base = mol/kg solvent
+    "molal": {
+        "mol/kg": 1.0,
+        "mmol/kg": 1e-3,
+        "umol/kg": 1e-6,
+    },
 }
 
-# -------- Mass --------
-_MASS_TO_G = {
-    "g": 1.0,
-    "mg": 1e-3,
-    "ug": 1e-6,
-    "ng": 1e-9,
-}
+ConcentrationKind = Literal["molar", "massvol", "volvol", "fold", "molal"]
+CONCENTRATION_KINDS: Tuple[str, ...] = ("molar", "massvol", "volvol", "fold", "molal")
 
-# -------- Amount (moles) --------
-_MOL_TO_MOL = {
-    "mol": 1.0,
-    "mmol": 1e-3,
-    "umol": 1e-6,
-    "nmol": 1e-9,
-    "pmol": 1e-12,
-}
 
-# -------- Concentration: molar --------
-_MOLAR_TO_M = {
-    "m": 1.0,
-    "mm": 1e-3,
-    "um": 1e-6,
-    "nm": 1e-9,
-    "pm": 1e-12,
-}
+@dataclass(frozen=True)
+class Unit:
+    """A parsed unit: normalized token, dimension and factor to the dimension's base unit."""
+    token: str
+    dimension: str
+    factor: float
 
-# -------- Concentration: mass/vol --------
-# base = g/L
-_MASSVOL_TO_G_PER_L = {
-    "g/l": 1.0,
-    "mg/ml": 1.0,      # 1 mg/mL = 1 g/L
-    "ug/ml": 1e-3,     # 1 ug/mL = 1e-3 g/L
-    "ng/ml": 1e-6,
-    "mg/l": 1e-3,
-    "ug/ul": 1.0,      # 1 ug/uL = 1 g/L
+
+# token -> Unit; the only Unit instances, so parsed units can be compared with `is`
+_UNITS: Dict[str, Unit] = {
+    token: Unit(token, dim, factor) for dim, table in _UNIT_TABLE.items() for token, factor in table.items()
 }
 
-# -------- Concentration: volume/volume (v/v%) --------
-# base = fraction (0.01 = 1%)
-_VOLVOL_TO_FRACTION = {
-    "%": 0.01,         # 1% (v/v) = 0.01 fraction
-    "v/v%": 0.01,
+# (from token, to token) -> multiplier, for every pair within a dimension
+_FACTORS: Dict[Tuple[str, str], float] = {
+    (a.token, b.token): a.factor / b.factor
+    for a in _UNITS.values()
+    for b in _UNITS.values()
+    if a.dimension == b.dimension
 }
 
 
+@lru_cache(maxsize=1024)
+def lookup_unit(unit: str) -> Optional[Unit]:
+    """The registered Unit for a spelling such as "mM", " µg/mL" or "% w/v", or None."""
+    return _UNITS.get(_norm_unit(unit).lower().replace(" ", ""))
+
+
+def unit_dimension(unit: str) -> str:
+    u = lookup_unit(unit)
+    if u is None:
+        raise ValueError(f"Unrecognized unit: {unit}")
+    return u.dimension
+
+
+def conversion_factor(from_unit: str, to_unit: str) -> float:
+    """Multiplier taking a value in `from_unit` to `to_unit` (same dimension only)."""
+    a, b = lookup_unit(from_unit), lookup_unit(to_unit)
+    if a is None or b is None or a.dimension != b.dimension:
+        raise ValueError(f"Cannot convert {from_unit} to {to_unit}")
+    return _FACTORS[(a.token, b.token)]
+
+
+def convert(value: Number, from_unit: str, to_unit: str) -> Number:
+    return float(value) * conversion_factor(from_unit, to_unit)
+
+
+@lru_cache(maxsize=1024)
+def _factor(unit: str, dimension: str, label: str) -> float:
+    u = lookup_unit(unit)
+    if u is None or u.dimension != dimension:
+        raise ValueError(f"Unsupported {label} unit: {unit}")
+    return u.factor
+
+
 def to_liters(value: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _VOLUME_TO_L:
-        raise ValueError(f"Unsupported volume unit: {unit}")
-    return float(value) * _VOLUME_TO_L[u]
+    return float(value) * _factor(unit, "volume", "volume")
 
 
 def from_liters(liters: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _VOLUME_TO_L:
-        raise ValueError(f"Unsupported volume unit: {unit}")
-    return float(liters) / _VOLUME_TO_L[u]
+    return float(liters) / _factor(unit, "volume", "volume")
 
 
 def to_grams(value: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _MASS_TO_G:
-        raise ValueError(f"Unsupported mass unit: {unit}")
-    return float(value) * _MASS_TO_G[u]
+    return float(value) * _factor(unit, "mass", "mass")
 
 
 def from_grams(grams: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _MASS_TO_G:
-        raise ValueError(f"Unsupported mass unit: {unit}")
-    return float(grams) / _MASS_TO_G[u]
+    return float(grams) / _factor(unit, "mass", "mass")
 
 
 def to_moles(value: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _MOL_TO_MOL:
-        raise ValueError(f"Unsupported amount unit: {unit}")
-    return float(value) * _MOL_TO_MOL[u]
+    return float(value) * _factor(unit, "amount", "amount")
 
 
 def from_moles(moles: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _MOL_TO_MOL:
-        raise ValueError(f"Unsupported amount unit: {unit}")
-    return float(moles) / _MOL_TO_MOL[u]
+    return float(moles) / _factor(unit, "amount", "amount")
 
 
 def molar_to_M(value: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _MOLAR_TO_M:
-        raise ValueError(f"Unsupported molar unit: {unit}")
-    return float(value) * _MOLAR_TO_M[u]
+    return float(value) * _factor(unit, "molar", "molar")
 
 
 def M_to_molar(M: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _MOLAR_TO_M:
-        raise ValueError(f"Unsupported molar unit: {unit}")
-    return float(M) / _MOLAR_TO_M[u]
+    return float(M) / _factor(unit, "molar", "molar")
 
 
 def massvol_to_g_per_L(value: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _MASSVOL_TO_G_PER_L:
-        raise ValueError(f"Unsupported mass/vol unit: {unit}")
-    return float(value) * _MASSVOL_TO_G_PER_L[u]
+    return float(value) * _factor(unit, "massvol", "mass/vol")
 
 
 def g_per_L_to_massvol(g_per_L: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _MASSVOL_TO_G_PER_L:
-        raise ValueError(f"Unsupported mass/vol unit: {unit}")
-    return float(g_per_L) / _MASSVOL_TO_G_PER_L[u]
+    return float(g_per_L) / _factor(unit, "massvol", "mass/vol")
 
 
 def volvol_to_fraction(value: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _VOLVOL_TO_FRACTION:
-        raise ValueError(f"Unsupported v/v unit: {unit}")
-    return float(value) * _VOLVOL_TO_FRACTION[u]
+    return float(value) * _factor(unit, "volvol", "v/v")
 
 
 def fraction_to_volvol(fraction: Number, unit: str) -> Number:
-    u = _norm_unit(unit).lower()
-    if u not in _VOLVOL_TO_FRACTION:
-        raise ValueError(f"Unsupported v/v unit: {unit}")
-    return float(fraction) / _VOLVOL_TO_FRACTION[u]
+    return float(fraction) / _factor(unit, "volvol", "v/v")
 
 
 @dataclass(frozen=True)
 class Concentration:
-    """Represents molar (M), mass/volume (g/L), or volume/volume (v/v) concentration."""
-    kind: Literal["molar", "massvol", "volvol"]
+    """
+    A stock or target concentration: molar (M), mass/volume (g/L),
+    volume/volume (fraction), X-fold or molal (mol/kg).
+    """
+    kind: ConcentrationKind
     value: float
     unit: str
 
+    def as_base(self) -> float:
+        """Value in the base unit of its kind."""
+        return float(self.value) * _factor(self.unit, self.kind, self.kind)
+
     def as_M(self) -> float:
         if self.kind != "molar":
             raise ValueError("Concentration is not molar.")
@@ -174,11 +216,7 @@ class Concentration:
 
 
 def parse_concentration(value: float, unit: str) -> Concentration:
-    u = _norm_unit(unit).lower()
-    if u in _MOLAR_TO_M:
-        return Concentration("molar", float(value), u)
-    if u in _MASSVOL_TO_G_PER_L:
-        return Concentration("massvol", float(value), u)
-    if u in _VOLVOL_TO_FRACTION:
-        return Concentration("volvol", float(value), u)
-    raise ValueError(f"Unrecognized concentration unit: {unit}")
+    u = lookup_unit(unit)
+    if u is None or u.dimension not in CONCENTRATION_KINDS:
+        raise ValueError(f"Unrecognized concentration unit: {unit}")
+    return Concentration(u.dimension, float(value), u.token)
@@ -0,0 +1,173 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import subprocess
+
+import pandas as pd
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def _write_stocks(path):
+    pd.DataFrame(
+        [
+            {"name": "Tris-HCl", "type": "stock_solution", "concentration_value": 1, "concentration_unit": "M"},
+            {"name": "NaCl", "type": "powder", "mw_g_per_mol": 58.44},
+        ]
+    ).to_excel(path, sheet_name="stocks", index=False)
+    return str(path)
+
+
+def _run_python(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=SRC, capture_output=True, text=True, check=True,
+    )
+
+
+def test_importing_app_cli_does_not_import_pandas():
+    out = _run_python("import sys, app_cli; print('pandas' in sys.modules, 'openpyxl' in sys.modules)")
+    assert out.stdout.strip() == "False False"
+
+
+def test_cached_cli_run_does_not_import_pandas(tmp_path):
+    stocks = _write_stocks(tmp_path / "stocks.xlsx")
+    cache_dir = str(tmp_path / "cache")
+    argv = ["app_cli.py", "--stocks", stocks, "--cache-dir", cache_dir,
+            "--final-volume", "100", "--target", "NaCl,150,mM"]
+    code = f"import sys, app_cli; sys.argv = {argv!r}; app_cli.main(); print('pandas' in sys.modules)"
+
+    first = _run_python(code)
+    assert "NaCl: 876.6 mg" in first.stdout
+
+    second = _run_python(code)
+    assert second.stdout.strip().splitlines()[-1] == "False"
+
+
+def test_jobs_mode_reads_stdin_and_streams_jsonl(tmp_path):
+    stocks = _write_stocks(tmp_path / "stocks.xlsx")
+    jobs = "\n".join([
+        '{"id": "ok", "targets": ["NaCl,150,mM"], "final_volume": 100}',
+        '{"id": "bad", "targets": ["Nope,1,mM"], "final_volume": 100}',
+    ])
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "app_cli.py"), "--stocks", stocks, "--jobs", "-"],
+        input=jobs, capture_output=True, text=True, check=True,
+    )
+
+    lines = proc.stdout.strip().splitlines()
+    assert len(lines) == 2
+    assert '"id": "ok", "ok": true' in lines[0]
+    assert '"error": "Component \'Nope\' not found in stocks."' in lines[1]
+    assert "2 jobs, 1 failed" in proc.stderr
+
+
+def test_reconcile_mode_reports_matches_csv(tmp_path):
+    stocks = _write_stocks(tmp_path / "stocks.xlsx")
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "app_cli.py"), "--stocks", stocks, "--reconcile", "-", "--top-k", "2"],
+        input="tris hcl\nnacl\n\nzzzz\n", capture_output=True, text=True, check=True,
+    )
+
+    lines = proc.stdout.strip().splitlines()
+    assert lines[0] == "query,match,score,alternatives"
+    assert lines[1].startswith("tris hcl,Tris-HCl,1.0000,Tris-HCl (1.00); NaCl")
+    assert lines[2].startswith("nacl,NaCl,1.0000,")
+    assert lines[3].startswith("zzzz,,,")
+    assert "3 names, 1 without a match" in proc.stderr
+
+
+def test_multiple_stock_sources_are_merged(tmp_path):
+    first = _write_stocks(tmp_path / "room1.xlsx")
+    second = tmp_path / "freezer.xlsx"
+    with pd.ExcelWriter(second) as xw:
+        pd.DataFrame([{"name": "NaCl", "type": "powder", "mw_g_per_mol": 58.0}]).to_excel(
+            xw, sheet_name="salts", index=False)
+        pd.DataFrame([{"name": "KCl", "type": "powder", "mw_g_per_mol": 74.55}]).to_excel(
+            xw, sheet_name="more", index=False)
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "app_cli.py"), "--stocks", first, "--stocks", f"{second}#*",
+         "--final-volume", "100", "--target", "NaCl,150,mM", "--target", "KCl,10,mM"],
+        capture_output=True, text=True, check=True,
+    )
+
+    assert "NaCl: 870 mg" in proc.stdout            # last source wins
+    assert "KCl: 74.55 mg" in proc.stdout
+    assert "from 3 sources (0 duplicates, 1 conflicts)" in proc.stderr
+    assert f"CONFLICT: 'NaCl' kept from {second}#salts (also in {first}#stocks)" in proc.stderr
+
+
+def test_plate_mode_prints_consumption_and_writes_wells(tmp_path):
+    stocks = _write_stocks(tmp_path / "stocks.xlsx")
+    layout = tmp_path / "layout.csv"
+    layout.write_text(
+        "well,final_volume,final_unit,component,value,unit\n"
+        "A1,200,uL,Tris-HCl,50,mM\n"
+        "A2,200,uL,Tris-HCl,25,mM\n"
+        "A2,,,NaCl,150,mM\n",
+        encoding="utf-8",
+    )
+    out = tmp_path / "wells.csv"
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "app_cli.py"), "--stocks", stocks, "--plate", str(layout),
+         "--out", str(out)],
+        capture_output=True, text=True, check=True,
+    )
+
+    assert "2 wells on 1 plate(s)" in proc.stdout
+    assert "- Tris-HCl: 15 uL  (2 wells)" in proc.stdout
+    assert "- NaCl: 1.7532 mg  (1 wells)" in proc.stdout
+    rows = pd.read_csv(out)
+    assert list(rows["well"]) == ["A1", "A1", "A2", "A2", "A2"]
+
+
+def test_plate_mode_writes_recipe_matrix(tmp_path):
+    stocks = _write_stocks(tmp_path / "stocks.xlsx")
+    layout = tmp_path / "layout.csv"
+    layout.write_text(
+        "well,final_volume,final_unit,component,value,unit\n"
+        "A1,200,uL,Tris-HCl,50,mM\n"
+        "A2,200,uL,NaCl,150,mM\n",
+        encoding="utf-8",
+    )
+    matrix = tmp_path / "matrix.npz"
+    cmd = [sys.executable, os.path.join(SRC, "app_cli.py"), "--stocks", stocks, "--plate", str(layout)]
+    proc = subprocess.run(cmd + ["--matrix-out", str(matrix)], capture_output=True, text=True, check=True)
+
+    assert f"Saved recipe matrix (4 entries): {matrix}" in proc.stdout
+    from recipe_matrix import load_npz
+
+    m = load_npz(str(matrix))
+    assert m.shape == (3, 2)
+    assert m.components[:2] == ["Tris-HCl", "NaCl"]
+
+    # a matrix extension on --out is rejected rather than written as CSV
+    proc = subprocess.run(cmd + ["--out", str(tmp_path / "x.npz")], capture_output=True, text=True)
+    assert proc.returncode == 2
+    assert "use --matrix-out" in proc.stderr
+    assert not (tmp_path / "x.npz").exists()
+
+
+def test_plate_mode_rejects_pipetting_limits(tmp_path):
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "app_cli.py"), "--stocks", "unused.xlsx", "--plate", "layout.csv",
+         "--min-volume", "0.5"],
+        capture_output=True, text=True,
+    )
+    assert proc.returncode == 2
+    assert "--min-volume/--max-volume are not applied to --plate" in proc.stderr
+
+
+def test_min_volume_adds_intermediate_dilution(tmp_path):
+    stocks = _write_stocks(tmp_path / "stocks.xlsx")
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "app_cli.py"), "--stocks", stocks, "--final-volume", "1",
+         "--target", "Tris-HCl,100,nM", "--min-volume", "0.5"],
+        capture_output=True, text=True, check=True,
+    )
+
+    # 0.0001 uL of 1 M stock: 1:100 then 1:50
+    assert "- Tris-HCl 1:100 intermediate: 0.5 uL" in proc.stdout
+    assert "- Tris-HCl 1:5000 intermediate: 0.5 uL" in proc.stdout
+    assert "- Tris-HCl (1:5000 intermediate): 0.5 uL" in proc.stdout
+    assert "Bring to final volume (solvent/buffer): 999.5 uL" in proc.stdout
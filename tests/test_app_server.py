@@ -0,0 +1,104 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from app_server import RecipeClient, RecipeServer
+
+
+def _write_stocks(path, tris_molar=1):
+    pd.DataFrame(
+        [
+            {"name": "Tris-HCl pH 8", "type": "stock_solution", "concentration_value": tris_molar,
+             "concentration_unit": "M"},
+            {"name": "NaCl", "type": "powder", "mw_g_per_mol": 58.44},
+        ]
+    ).to_excel(path, sheet_name="stocks", index=False)
+    return str(path)
+
+
+@pytest.fixture
+def server(tmp_path):
+    srv = RecipeServer(_write_stocks(tmp_path / "stocks.xlsx"), port=0, poll_interval=0.05)
+    host, port = srv.start_in_thread()
+    yield srv, RecipeClient(host, port)
+    srv.stop()
+
+
+def test_health_and_recipe(server):
+    _, client = server
+    assert client.health() == {"ok": True, "stocks": 2, "reloads": 0}
+
+    status, data = client.recipe(targets=["NaCl,150,mM"], final_volume=100, final_unit="mL")
+    assert status == 200
+    lines = data["recipe"]["lines"]
+    assert lines[0]["name"] == "NaCl"
+    assert lines[0]["add_mass_value"] == pytest.approx(876.6)
+    assert lines[-1]["add_volume_unit"] == "uL"
+
+
+def test_recipe_fuzzy_names_and_errors(server):
+    _, client = server
+    status, data = client.recipe(
+        targets=[{"name": "tris ph 8", "value": 50, "unit": "mM"}], final_volume=10, fuzzy=True,
+    )
+    assert status == 200
+    assert data["matched"] == {"tris ph 8": "Tris-HCl pH 8"}
+    assert data["recipe"]["lines"][0]["add_volume_value"] == pytest.approx(500.0)
+
+    status, data = client.recipe(targets=["KCl,1,mM"], final_volume=10)
+    assert status == 422
+    assert data == {"ok": False, "error": "Component 'KCl' not found in stocks."}
+
+    assert client.request("GET", "/nowhere")[0] == 404
+    assert client.request("GET", "/recipe")[0] == 405
+
+
+def test_match_and_concurrent_requests(server):
+    _, client = server
+    status, data = client.match("nacl")
+    assert status == 200
+    assert data["best"]["candidate"] == "NaCl"
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: client.recipe(targets=["NaCl,1,M"], final_volume=1), range(32)))
+    assert all(status == 200 for status, _ in results)
+
+
+def test_reloads_when_workbook_changes(server, tmp_path):
+    srv, client = server
+    _write_stocks(tmp_path / "stocks.xlsx", tris_molar=2)
+    os.utime(tmp_path / "stocks.xlsx", ns=(time.time_ns(), time.time_ns() + 10**9))
+
+    deadline = time.time() + 10
+    while client.health()["reloads"] == 0 and time.time() < deadline:
+        time.sleep(0.05)
+
+    status, data = client.recipe(targets=["Tris-HCl pH 8,50,mM"], final_volume=10)
+    assert data["recipe"]["lines"][0]["add_volume_value"] == pytest.approx(250.0)
+
+
+def test_main_reports_the_bound_port(tmp_path):
+    import subprocess
+
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(src, "app_server.py"), "--stocks", _write_stocks(tmp_path / "stocks.xlsx"),
+         "--port", "0"],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        assert proc.stdout.readline().startswith("Loaded 2 stock items.")
+        line = proc.stdout.readline().strip()
+        assert line.startswith("Listening on http://127.0.0.1:")
+        port = int(line.rsplit(":", 1)[1])
+        assert port != 0
+        assert RecipeClient("127.0.0.1", port).health()["stocks"] == 2
+    finally:
+        proc.terminate()
+        proc.wait()
@@ -0,0 +1,131 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+
+from stocks_io import StockItem
+from units import parse_concentration
+from calculator import TargetComponent, compute_recipe
+from batch_calculator import compute_recipes_batch
+
+
+def _stocks():
+    return {
+        "Tris-HCl": StockItem(
+            name="Tris-HCl",
+            type="stock_solution",
+            concentration=parse_concentration(1.0, "M"),
+            notes=" pH 8.0 ",
+        ),
+        "BSA": StockItem(
+            name="BSA",
+            type="stock_solution",
+            concentration=parse_concentration(10.0, "mg/mL"),
+        ),
+        "Glycerol": StockItem(
+            name="Glycerol",
+            type="stock_solution",
+            concentration=parse_concentration(100, "%"),
+        ),
+        "NaCl": StockItem(
+            name="NaCl",
+            type="powder",
+            mw_g_per_mol=58.44,
+            purity_fraction=0.9,
+        ),
+        "Sucrose": StockItem(
+            name="Sucrose",
+            type="powder",
+        ),
+        "PBS": StockItem(
+            name="PBS",
+            type="stock_solution",
+            concentration=parse_concentration(10, "X"),
+        ),
+    }
+
+
+def _target_sets():
+    return [
+        [TargetComponent("Tris-HCl", 50, "mM"), TargetComponent("NaCl", 150, "mM")],
+        [TargetComponent("BSA", 0.1, "mg/mL"), TargetComponent("Glycerol", 10, "%")],
+        [TargetComponent("Sucrose", 5, "% w/v"), TargetComponent("Tris-HCl", 20, "µM"), TargetComponent("PBS", 1, "X")],
+        [],
+        # Overfilled on purpose to trigger the volume warning
+        [TargetComponent("Glycerol", 80, "%"), TargetComponent("Tris-HCl", 500, "mM")],
+    ]
+
+
+def test_batch_matches_compute_recipe_exactly():
+    stocks = _stocks()
+    target_sets = _target_sets()
+    volumes = [100, 10, 2.5, 50, 1]
+
+    batch = compute_recipes_batch(stocks, target_sets, volumes, final_volume_unit="mL")
+    assert len(batch) == len(target_sets)
+
+    expected = [
+        compute_recipe(stocks, targets, v, final_volume_unit="mL")
+        for targets, v in zip(target_sets, volumes)
+    ]
+    assert batch.to_recipe_results() == expected
+    assert batch.recipe(4) == expected[4]
+    assert any("exceed final volume" in w for w in batch.warnings[4])
+    assert any("purity_fraction" in w for w in batch.warnings[0])
+
+
+def test_batch_scalar_volume_and_output_units():
+    stocks = _stocks()
+    target_sets = _target_sets()[:3]
+
+    batch = compute_recipes_batch(
+        stocks, target_sets, 250, final_volume_unit="uL",
+        output_volume_unit="mL", output_mass_unit="ug",
+    )
+
+    for i, targets in enumerate(target_sets):
+        assert batch.recipe(i) == compute_recipe(
+            stocks, targets, 250, final_volume_unit="uL",
+            output_volume_unit="mL", output_mass_unit="ug",
+        )
+
+
+def test_batch_columns_are_aligned():
+    batch = compute_recipes_batch(_stocks(), _target_sets()[:2], 100)
+
+    assert batch.line_offsets.tolist() == [0, 2, 4]
+    assert batch.line_recipe.tolist() == [0, 0, 1, 1]
+    assert [batch.stock_names[s] for s in batch.line_stock] == ["Tris-HCl", "NaCl", "BSA", "Glycerol"]
+    assert batch.line_is_powder.tolist() == [False, True, False, False]
+    assert batch.add_volume_values[0] == pytest.approx(5000.0)
+    assert batch.add_mass_values[1] == pytest.approx(876.6 / 0.9)
+
+
+@pytest.mark.parametrize(
+    "bad_targets",
+    [
+        [TargetComponent("Unknown", 1, "mM")],
+        [TargetComponent("Tris-HCl", 1, "mg/mL")],
+        [TargetComponent("NaCl", 1, "%")],
+        [TargetComponent("Sucrose", 1, "mM")],
+        [TargetComponent("Tris-HCl", 1, "ppm")],
+        [TargetComponent("PBS", 1, "mM")],
+        [TargetComponent("NaCl", 1, "X")],
+        [TargetComponent("NaCl", 1, "mol/kg")],
+    ],
+)
+def test_batch_raises_same_error_as_compute_recipe(bad_targets):
+    stocks = _stocks()
+    target_sets = [[TargetComponent("Tris-HCl", 50, "mM")], bad_targets]
+
+    with pytest.raises(Exception) as expected:
+        compute_recipe(stocks, bad_targets, 100)
+    with pytest.raises(type(expected.value)) as got:
+        compute_recipes_batch(stocks, target_sets, 100)
+    assert str(got.value) == str(expected.value)
+
+
+def test_batch_volume_count_mismatch_raises():
+    with pytest.raises(ValueError):
+        compute_recipes_batch(_stocks(), _target_sets(), [100, 200])
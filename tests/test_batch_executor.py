@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import json
+
+from stocks_io import StockItem
+from units import parse_concentration
+from jobs import iter_jobs, outcome_to_dict, run_jobs
+from fuzzy_match import CandidateIndex
+from batch_executor import run_jobs_parallel
+from match_cache import MatchCache
+
+
+STOCKS = {
+    "Tris-HCl pH 8": StockItem(name="Tris-HCl pH 8", type="stock_solution",
+                               concentration=parse_concentration(1.0, "M")),
+    "Glycerol": StockItem(name="Glycerol", type="stock_solution", concentration=parse_concentration(50, "%")),
+    "NaCl": StockItem(name="NaCl", type="powder", mw_g_per_mol=58.44, purity_fraction=0.99),
+}
+
+
+def _job_lines(n):
+    names = ["Tris-HCl pH 8", "tris ph 8", "NaCl", "nacl", "glycerol", "Unknown"]
+    units = {"Glycerol": "%", "glycerol": "%"}
+    for i in range(n):
+        name = names[i % len(names)]
+        yield json.dumps({
+            "id": f"job{i}",
+            "targets": [[name, 1 + i % 7, units.get(name, "mM")], ["NaCl", 10 + i % 3, "mM"]],
+            "final_volume": 10 + i % 5,
+        })
+        if i % 50 == 0:
+            yield "{broken"
+
+
+def _dump(outcomes):
+    return [json.dumps(outcome_to_dict(o)) for o in outcomes]
+
+
+def test_parallel_matches_serial_in_order():
+    serial = _dump(run_jobs(STOCKS, iter_jobs(_job_lines(300)), CandidateIndex(STOCKS.keys())))
+    parallel = _dump(run_jobs_parallel(STOCKS, iter_jobs(_job_lines(300)), workers=2, chunk_size=16, fuzzy=True))
+
+    assert parallel == serial
+    assert len(serial) == 306
+    assert any('"matched": {"tris ph 8": "Tris-HCl pH 8"}' in line for line in serial)
+    assert any('"ok": false' in line for line in serial)
+
+
+def test_single_worker_runs_serially():
+    serial = _dump(run_jobs(STOCKS, iter_jobs(_job_lines(20))))
+    assert _dump(run_jobs_parallel(STOCKS, iter_jobs(_job_lines(20)), workers=1)) == serial
+
+
+def test_match_cache_gives_same_outcomes():
+    serial = _dump(run_jobs(STOCKS, iter_jobs(_job_lines(60)), CandidateIndex(STOCKS.keys())))
+    cache = MatchCache()
+    cached = _dump(run_jobs_parallel(STOCKS, iter_jobs(_job_lines(60)), workers=1, fuzzy=True, match_cache=cache))
+    assert cached == serial
+    assert cache.hits > 0 and cache.misses == 4    # "tris ph 8", "nacl", "glycerol", "Unknown"
+    pooled = _dump(run_jobs_parallel(STOCKS, iter_jobs(_job_lines(60)), workers=2, fuzzy=True, match_cache=cache))
+    assert pooled == serial
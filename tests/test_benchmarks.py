@@ -0,0 +1,24 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from bench_suite import compare
+from synthetic import make_catalog, make_target_sets
+from stocks_io import stocks_to_dict
+from batch_calculator import compute_recipes_batch
+
+
+def test_synthetic_batches_are_computable():
+    items = make_catalog(300)
+    assert len({i.name for i in items}) == 300
+
+    batch = compute_recipes_batch(stocks_to_dict(items), make_target_sets(items, 50), 100)
+    assert len(batch) == 50
+
+
+def test_compare_flags_only_slowdowns_beyond_threshold():
+    baseline = {"a[n=1]": {"median_s": 1.0}, "b[n=1]": {"median_s": 1.0}, "c[n=1]": {"median_s": 1.0}}
+    current = {"a[n=1]": {"median_s": 1.2}, "b[n=1]": {"median_s": 1.5}, "d[n=1]": {"median_s": 9.0}}
+
+    assert compare(current, baseline, threshold=0.25) == [("b[n=1]", 1.5)]
@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import io
+import json
+import random
+
+from fuzzy_match import best_match, top_matches
+from bulk_match import BulkMatcher, reconcile_bulk, write_reconciliation
+
+
+CATALOG = [
+    "Tris-HCl pH=8",
+    "Tris-HCl pH 7.5",
+    "Tris",
+    "NaCl",
+    "NaCl 5 M",
+    "KCl",
+    "MgCl2",
+    "Glycerol",
+    "Glycerol 50%",
+    "EDTA",
+    "Guanidine-HCl",
+    "L-Arginine",
+    "",
+]
+
+
+def _catalog(n, seed=0):
+    rng = random.Random(seed)
+    names = list(CATALOG)
+    while len(names) < n:
+        base = rng.choice(CATALOG[:-1])
+        names.append(f"{base} {rng.choice(['lot', 'stock', 'pH 7', '#'])}{rng.randint(1, 99)}")
+    return names
+
+
+def _mutate(rng, s):
+    chars = list(s.lower())
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(chars)) if chars else 0
+        op = rng.random()
+        if op < 0.3 and chars:
+            del chars[i]
+        elif op < 0.6:
+            chars.insert(i, rng.choice("acdehlnst -"))
+        elif chars:
+            chars[i] = rng.choice("acdehlnst")
+    return "".join(chars)
+
+
+def test_bulk_equals_best_match_and_top_matches():
+    names = _catalog(400)
+    rng = random.Random(1)
+    queries = [_mutate(rng, rng.choice(names)) for _ in range(60)] + ["", "t", "tris", "nacl", "zzzz"]
+    matcher = BulkMatcher(names)
+    for q in queries:
+        for k in (1, 5):
+            r = matcher.match(q, k=k, min_score=0.72)
+            assert r.best == best_match(q, names, min_score=0.72), q
+            assert r.top == top_matches(q, names, n=k), q
+
+
+def test_small_catalog_and_threshold():
+    r = BulkMatcher(["NaCl", "KCl"]).match("nacl solution", k=5, min_score=0.99)
+    assert r.best is None
+    assert [m.candidate for m in r.top] == ["NaCl", "KCl"]
+    assert BulkMatcher([]).match("nacl").top == []
+
+
+def test_parallel_keeps_order():
+    names = _catalog(200)
+    queries = ["tris ph 8", "glycerl", "nacl 5m", "edta", "arginine"] * 10
+    serial = list(reconcile_bulk(queries, names, k=3))
+    assert list(reconcile_bulk(queries, names, k=3, workers=2, chunk_size=7)) == serial
+
+
+def test_write_reconciliation_formats():
+    results = list(reconcile_bulk(["nacl", "zzzz"], CATALOG, k=2))
+    out = io.StringIO()
+    assert write_reconciliation(results, out, fmt="jsonl") == {"queries": 2, "unmatched": 1}
+    first, second = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert first["match"] == "NaCl" and first["score"] == 1.0
+    assert [t["candidate"] for t in first["top"]] == ["NaCl", "NaCl 5 M"]
+    assert second["match"] is None
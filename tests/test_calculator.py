@@ -4,7 +4,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 import pytest
 
-from stocks_io import StockItem
+from stocks_io import CompiledStock, StockItem, compile_stock, compile_stocks
 from units import parse_concentration
 from calculator import TargetComponent, compute_recipe
 
@@ -199,3 +199,86 @@ def test_volvol_with_powder_raises():
             final_volume_value=100,
             final_volume_unit="mL",
         )
+
+
+def _mixed_stocks():
+    return {
+        "Tris-HCl": StockItem("Tris-HCl", "stock_solution", parse_concentration(1.0, "M"), notes=" buffer "),
+        "BSA": StockItem("BSA", "stock_solution", parse_concentration(10.0, "mg/mL")),
+        "Glycerol": StockItem("Glycerol", "stock_solution", parse_concentration(50, "%")),
+        "NaCl": StockItem("NaCl", "powder", mw_g_per_mol=58.44, purity_fraction=0.98),
+        "Dye": StockItem("Dye", "powder"),
+        "Empty": StockItem("Empty", "stock_solution"),
+    }
+
+
+def test_compiled_stocks_give_identical_recipes():
+    stocks = _mixed_stocks()
+    compiled = compile_stocks(stocks)
+    assert all(isinstance(c, CompiledStock) for c in compiled.values())
+    assert compiled["Tris-HCl"].conc_base == 1.0
+    assert compiled["BSA"].conc_base == 10.0
+    assert compile_stock(compiled["BSA"]) is compiled["BSA"]
+
+    targets = [
+        TargetComponent("Tris-HCl", 50, "mM"),
+        TargetComponent("BSA", 0.1, "mg/mL"),
+        TargetComponent("Glycerol", 10, "%"),
+        TargetComponent("NaCl", 150, "mM"),
+        TargetComponent("Dye", 3, "ug/mL"),
+    ]
+    assert compute_recipe(compiled, targets, 37.5, "mL") == compute_recipe(stocks, targets, 37.5, "mL")
+
+
+@pytest.mark.parametrize("target", [
+    TargetComponent("Tris-HCl", 1, "mg/mL"),
+    TargetComponent("Dye", 1, "mM"),
+    TargetComponent("Empty", 1, "mM"),
+    TargetComponent("NaCl", 1, "%"),
+])
+def test_compiled_stocks_raise_the_same_errors(target):
+    stocks = _mixed_stocks()
+    messages = []
+    for s in (stocks, compile_stocks(stocks)):
+        with pytest.raises(ValueError) as exc:
+            compute_recipe(s, [target], 10, "mL")
+        messages.append(str(exc.value))
+    assert messages[0] == messages[1]
+
+
+def test_progress_is_reported_per_target_and_can_abort():
+    stocks = _mixed_stocks()
+    targets = [TargetComponent("Tris-HCl", 50, "mM"), TargetComponent("NaCl", 150, "mM")]
+    seen = []
+    compute_recipe(stocks, targets, 10, "mL", progress=lambda message, fraction: seen.append(fraction))
+    assert seen == [0.0, 0.5]
+
+    def stop(message, fraction):
+        if fraction > 0:
+            raise RuntimeError("stop")
+
+    with pytest.raises(RuntimeError):
+        compute_recipe(stocks, targets, 10, "mL", progress=stop)
+
+
+def test_fold_stock_and_percent_wv_targets():
+    # 10X PBS to 1X in 50 mL -> 5 mL; 2% (w/v) sucrose powder in 50 mL -> 1 g
+    stocks = {
+        "PBS": StockItem("PBS", "stock_solution", parse_concentration(10, "X")),
+        "Sucrose": StockItem("Sucrose", "powder"),
+    }
+    result = compute_recipe(
+        stocks,
+        [TargetComponent("PBS", 1, "X"), TargetComponent("Sucrose", 2, "% w/v")],
+        50,
+        "mL",
+        output_volume_unit="mL",
+        output_mass_unit="g",
+    )
+    assert _get_line(result, "PBS").add_volume_value == pytest.approx(5.0)
+    assert _get_line(result, "Sucrose").add_mass_value == pytest.approx(1.0)
+
+    with pytest.raises(ValueError, match="X-fold"):
+        compute_recipe(stocks, [TargetComponent("Sucrose", 1, "X")], 50, "mL")
+    with pytest.raises(ValueError, match="Unsupported target unit"):
+        compute_recipe(stocks, [TargetComponent("PBS", 1, "mol/kg")], 50, "mL")
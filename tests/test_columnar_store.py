@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pickle
+import subprocess
+
+import pytest
+
+from stocks_io import StockItem, stocks_to_dict
+from stock_store import SQLiteStockStore, load_stocks_dict, open_stocks
+from columnar_store import ColumnarStockStore, write_columnar
+from units import parse_concentration
+from calculator import TargetComponent, compute_recipe
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+ITEMS = [
+    StockItem(name="Tris-HCl pH 8", type="stock_solution", concentration=parse_concentration(1.0, "M"), notes="RT"),
+    StockItem(name="NaCl", type="powder", mw_g_per_mol=58.44, purity_fraction=0.99),
+    StockItem(name="Glycérol", type="stock_solution", concentration=parse_concentration(50, "%"), solvent="water"),
+    StockItem(name="BSA", type="stock_solution", concentration=parse_concentration(10, "mg/mL")),
+    StockItem(name="Urea", type="powder"),
+]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = str(tmp_path / "stocks.cols")
+    assert write_columnar(ITEMS, path) == len(ITEMS)
+    return path
+
+
+def test_roundtrip(catalog):
+    store = ColumnarStockStore(catalog)
+    assert len(store) == len(ITEMS)
+    assert store.names() == [i.name for i in ITEMS]
+    assert store.to_dict() == stocks_to_dict(ITEMS)
+    assert store.fetch(["Urea", "Glycérol", "nope"]) == {"Urea": ITEMS[4], "Glycérol": ITEMS[2]}
+    assert "BSA" in store and "bsa" not in store
+    assert pickle.loads(pickle.dumps(store)).to_dict() == store.to_dict()
+
+
+def test_duplicates_keep_last_and_rewrite_replaces(tmp_path):
+    path = str(tmp_path / "dup.cols")
+    newer = StockItem(name="NaCl", type="powder", mw_g_per_mol=58.44)
+    write_columnar(ITEMS + [newer], path)
+    assert ColumnarStockStore(path)["NaCl"] == newer
+
+    write_columnar([], path)
+    empty = ColumnarStockStore(path)
+    assert len(empty) == 0 and empty.names() == [] and "NaCl" not in empty
+    assert sorted(os.listdir(tmp_path)) == ["dup.cols"]
+
+
+def test_compute_recipe_and_open_stocks(catalog):
+    store = open_stocks(catalog)
+    assert isinstance(store, ColumnarStockStore)
+    targets = [TargetComponent("Tris-HCl pH 8", 50, "mM"), TargetComponent("NaCl", 150, "mM")]
+    assert compute_recipe(store, targets, 100) == compute_recipe(stocks_to_dict(ITEMS), targets, 100)
+    assert load_stocks_dict(catalog) == stocks_to_dict(ITEMS)
+
+
+def test_missing_catalog(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ColumnarStockStore(str(tmp_path / "missing.cols"))
+
+
+def test_export_command_from_sqlite(tmp_path):
+    db = str(tmp_path / "stocks.db")
+    SQLiteStockStore(db).import_items(ITEMS)
+    out = str(tmp_path / "exported.cols")
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "columnar_store.py"), db, out],
+        capture_output=True, text=True, check=True,
+    )
+    assert "Wrote 5 stock items" in proc.stdout
+    assert ColumnarStockStore(out).to_dict() == stocks_to_dict(ITEMS)
@@ -0,0 +1,129 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import math
+
+import pytest
+
+from stocks_io import StockItem
+from units import parse_concentration
+from calculator import BRING_TO_VOLUME_NAME, TargetComponent, compute_recipe
+from batch_calculator import compute_recipes_batch
+from dilution import (
+    PipettingLimits,
+    apply_dilutions,
+    dilution_factors,
+    iter_diluted_recipes,
+    needs_dilution,
+    plan_dilution,
+)
+
+
+STOCKS = {
+    "Tris-HCl": StockItem("Tris-HCl", "stock_solution", parse_concentration(1.0, "M"), solvent="water"),
+    "Inhibitor": StockItem("Inhibitor", "stock_solution", parse_concentration(10, "mM"), solvent="DMSO"),
+    "NaCl": StockItem("NaCl", "powder", mw_g_per_mol=58.44),
+}
+LIMITS = PipettingLimits(min_volume=0.5, max_volume=1000, unit="uL")
+
+
+@pytest.mark.parametrize("need, expected", [
+    (0.8, []),
+    (16.7, [20.0]),
+    (2000, [2000.0]),
+    (2001, [50.0, 50.0]),
+    (1e7, [500.0, 500.0, 50.0]),
+])
+def test_dilution_factors_use_fewest_nice_steps(need, expected):
+    factors = dilution_factors(need, 2000, 3)
+    assert factors == expected
+    assert math.prod(factors) >= need
+
+
+def test_dilution_factors_give_up_past_max_steps():
+    assert dilution_factors(1e10, 2000, 3) is None
+    assert dilution_factors(1e10, 2000, 4) is not None
+
+
+def test_plan_dilution_steps_are_pipettable_and_consistent():
+    # 0.0001 uL -> needs 1:5000, i.e. two steps with a 2000x limit
+    plan = plan_dilution("Inhibitor", 1e-4, LIMITS, "DMSO")
+    assert [s.factor for s in plan.steps] == [100.0, 50.0]
+    assert plan.add_volume == pytest.approx(0.5)
+    for prev, step in zip([None] + plan.steps, plan.steps):
+        assert LIMITS.min_volume <= step.aliquot and step.volume <= LIMITS.max_volume
+        assert step.aliquot + step.diluent == pytest.approx(step.volume)
+        if prev is not None:
+            assert prev.volume >= step.aliquot
+    assert plan.steps[-1].volume >= plan.add_volume
+    assert plan_dilution("Tris-HCl", 5.0, LIMITS) is None
+
+
+def test_apply_dilutions_keeps_amounts_and_final_volume():
+    targets = [TargetComponent("Tris-HCl", 50, "mM"), TargetComponent("Inhibitor", 5, "nM"),
+               TargetComponent("NaCl", 150, "mM")]
+    direct = compute_recipe(STOCKS, targets, 1, "mL")
+    diluted = apply_dilutions(direct, LIMITS, STOCKS)
+
+    prep = [l for l in diluted.lines if l.source_type == "dilution"]
+    assert len(prep) == 1 and "DMSO" in prep[0].notes
+    added = [l for l in diluted.lines if l.source_type != "dilution"]
+    inter = next(l for l in added if l.name.startswith("Inhibitor"))
+    assert inter.name == "Inhibitor (1:1000 intermediate)"
+    # same amount of stock reaches the buffer: 0.5 uL of a 1:1000 dilution = 0.0005 uL
+    assert inter.add_volume_value / 1000 == pytest.approx(0.0005)
+    total = sum(l.add_volume_value for l in added if l.add_volume_value is not None)
+    assert total == pytest.approx(1000.0)
+    assert any("below the 0.5 uL minimum" in w for w in diluted.warnings)
+    # untouched lines are the same objects
+    assert added[0] is direct.lines[0]
+
+
+def test_apply_dilutions_returns_same_result_when_pipettable():
+    result = compute_recipe(STOCKS, [TargetComponent("Tris-HCl", 50, "mM")], 1, "mL")
+    assert apply_dilutions(result, LIMITS, STOCKS) is result
+
+
+def test_apply_dilutions_warns_when_out_of_reach_or_too_large():
+    result = compute_recipe(STOCKS, [TargetComponent("Inhibitor", 0.01, "nM"), TargetComponent("Tris-HCl", 500, "mM")],
+                            10, "mL")
+    diluted = apply_dilutions(result, PipettingLimits(max_steps=1), STOCKS)
+    assert any("cannot be diluted within 0.5-1000 uL in 1 step(s)" in w for w in diluted.warnings)
+    assert any("pipette it in 5 portions" in w for w in diluted.warnings)
+
+
+def test_plans_never_exceed_max_volume(monkeypatch):
+    import dilution
+
+    limits = PipettingLimits(min_volume=1, max_volume=4, unit="uL")
+    # every volume of a plan stays within the limits
+    for volume in (0.9, 0.5, 0.26, 0.13):
+        plan = plan_dilution("X", volume, limits)
+        assert plan is not None
+        assert limits.min_volume <= plan.add_volume <= limits.max_volume
+        assert all(s.volume <= limits.max_volume for s in plan.steps)
+
+    # a factor choice that overshoots is rejected, and the caller warns instead
+    monkeypatch.setattr(dilution, "dilution_factors", lambda need, max_factor, max_steps: [5.0, 5.0])
+    limits = PipettingLimits(min_volume=1, max_volume=4.5, unit="uL")
+    assert plan_dilution("X", 0.3, limits) is None       # 0.3 uL x 25 = 7.5 uL to add
+    # 0.03 uL: each 1:5 step would make 5 uL of intermediate
+    result = compute_recipe(STOCKS, [TargetComponent("Inhibitor", 300, "nM")], 1, "mL")
+    diluted = apply_dilutions(result, limits, STOCKS)
+    assert any("cannot be diluted within 1-4.5 uL" in w for w in diluted.warnings)
+    assert not any(l.source_type == "dilution" for l in diluted.lines)
+
+
+def test_batch_only_rebuilds_flagged_recipes():
+    target_sets = [[TargetComponent("Tris-HCl", 50, "mM"), TargetComponent("Inhibitor", v, "nM")]
+                   for v in (5, 500, 50000)]
+    batch = compute_recipes_batch(STOCKS, target_sets, 1, "mL")
+    assert needs_dilution(batch, LIMITS).tolist() == [0, 1]
+
+    recipes = list(iter_diluted_recipes(batch, LIMITS, STOCKS))
+    assert recipes[2] == batch.recipe(2)
+    for r, ts in zip(recipes, target_sets):
+        assert r == apply_dilutions(compute_recipe(STOCKS, ts, 1, "mL"), LIMITS, STOCKS)
+        fill = next(l for l in r.lines if l.name == BRING_TO_VOLUME_NAME)
+        assert fill.add_volume_value < 950.0
@@ -0,0 +1,121 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import csv
+import io
+import json
+import tracemalloc
+
+import pytest
+
+from stocks_io import StockItem
+from units import parse_concentration
+from calculator import TargetComponent, compute_recipe
+from batch_calculator import compute_recipes_batch
+from export import MULTI_RECIPE_FIELDS, export_recipes, recipe_to_rows, write_recipes
+
+
+STOCKS = {
+    "Tris-HCl": StockItem("Tris-HCl", "stock_solution", parse_concentration(1.0, "M"), notes="pH 8"),
+    "NaCl": StockItem("NaCl", "powder", mw_g_per_mol=58.44),
+}
+
+
+def _recipes(n):
+    for i in range(n):
+        targets = [TargetComponent("Tris-HCl", 10 + i % 40, "mM"), TargetComponent("NaCl", 150, "mM")]
+        yield f"r{i}", compute_recipe(STOCKS, targets, 10)
+
+
+def test_write_recipes_csv_tags_rows_with_recipe_id():
+    out = io.StringIO()
+    counts = write_recipes(_recipes(3), out, fmt="csv")
+
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert counts == {"recipes": 3, "rows": 9}
+    assert list(rows[0]) == MULTI_RECIPE_FIELDS
+    assert [r["recipe_id"] for r in rows] == ["r0"] * 3 + ["r1"] * 3 + ["r2"] * 3
+    first = compute_recipe(STOCKS, [TargetComponent("Tris-HCl", 10, "mM"), TargetComponent("NaCl", 150, "mM")], 10)
+    assert [r["name"] for r in rows[:3]] == [r["name"] for r in recipe_to_rows(first)]
+
+
+def test_write_recipes_jsonl_and_default_ids():
+    out = io.StringIO()
+    write_recipes((r for _, r in _recipes(2)), out, fmt="jsonl")
+
+    objs = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [o["recipe_id"] for o in objs] == [1, 2]
+    assert objs[0]["lines"][0]["name"] == "Tris-HCl"
+
+
+@pytest.mark.parametrize("ext", ["csv", "jsonl", "xlsx"])
+def test_export_recipes_formats_from_extension(tmp_path, ext):
+    path = str(tmp_path / f"recipes.{ext}")
+    counts = export_recipes(_recipes(4), path)
+    assert counts["recipes"] == 4
+
+    if ext == "xlsx":
+        from openpyxl import load_workbook
+
+        rows = list(load_workbook(path)["recipes"].iter_rows(values_only=True))
+        assert list(rows[0]) == MULTI_RECIPE_FIELDS
+        assert len(rows) == 1 + 12
+        assert rows[1][:2] == ("r0", "Tris-HCl")
+    elif ext == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            assert len(list(csv.DictReader(f))) == 12
+    else:
+        with open(path, encoding="utf-8") as f:
+            assert len(f.readlines()) == 4
+
+
+def _failing_after(n):
+    yield from _recipes(n)
+    raise RuntimeError("stocks went away")
+
+
+def test_failed_xlsx_export_leaves_no_partial_file(tmp_path, monkeypatch):
+    from openpyxl import Workbook
+    from openpyxl.worksheet import _writer
+
+    path = tmp_path / "recipes.xlsx"
+    temp_files = list(_writer.ALL_TEMP_FILES)
+    with pytest.raises(RuntimeError):
+        export_recipes(_failing_after(3), str(path))
+    assert not path.exists()
+    assert _writer.ALL_TEMP_FILES == temp_files      # the sheet's rows are dropped too
+
+    # a failed export leaves an earlier one alone
+    path.write_bytes(b"previous export")
+    with pytest.raises(RuntimeError):
+        export_recipes(_failing_after(3), str(path))
+    assert path.read_bytes() == b"previous export"
+
+    real_save = Workbook.save
+
+    def failing_save(self, filename):
+        real_save(self, filename)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(Workbook, "save", failing_save)
+    with pytest.raises(OSError):
+        export_recipes(_recipes(3), str(path))
+    assert path.read_bytes() == b"previous export"
+    assert os.listdir(tmp_path) == ["recipes.xlsx"]     # no temporary file left behind
+
+
+def test_export_memory_stays_flat(tmp_path):
+    # a materialized list of 20k recipes would take tens of MB
+    tracemalloc.start()
+    export_recipes(_recipes(20000), str(tmp_path / "many.csv"))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 2 * 1024 * 1024
+
+
+def test_batch_iter_recipes_matches_to_recipe_results():
+    target_sets = [[TargetComponent("Tris-HCl", v, "mM")] + ([TargetComponent("NaCl", 1, "mM")] if v % 2 else [])
+                   for v in range(1, 12)]
+    batch = compute_recipes_batch(STOCKS, target_sets, 10)
+    assert list(batch.iter_recipes(chunk_size=4)) == batch.to_recipe_results()
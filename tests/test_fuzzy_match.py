@@ -0,0 +1,177 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import random
+
+import pytest
+
+from fuzzy_match import CandidateIndex, best_match, normalize_name, similarity, top_matches
+
+
+CATALOG = [
+    "Tris-HCl pH=8",
+    "Tris-HCl pH 7.5",
+    "NaCl",
+    "KCl",
+    "MgCl2",
+    "Imidazole",
+    "Glycerol",
+    "Triton X-100",
+    "Tween-20",
+    "BSA",
+    "DTT",
+    "TCEP",
+    "EDTA",
+    "Guanidine-HCl",
+    "L-Arginine",
+]
+
+
+def _synthetic_catalog(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    names = list(CATALOG)
+    while len(names) < n:
+        word = "".join(rng.choice(letters) for _ in range(rng.randint(4, 10)))
+        names.append(f"{word}-{rng.choice(['HCl', 'pH 7', 'sulfate', '', 'buffer'])}".strip("-"))
+    return names
+
+
+def test_similarity_basics():
+    assert similarity("tris-hcl", "Tris HCl") == 1.0
+    assert similarity("", "NaCl") == 0.0
+    assert similarity("imidazol", "Imidazole") > 0.72
+
+
+@pytest.mark.parametrize("query", ["tris ph 8", "imidazole", "glycrol", "nacl", "triton", "tween 20", "hcl"])
+def test_index_matches_linear_scan(query):
+    index = CandidateIndex(CATALOG)
+
+    assert best_match(query, index) == best_match(query, CATALOG)
+    assert best_match(query, index, min_score=0.5) == best_match(query, CATALOG, min_score=0.5)
+    assert top_matches(query, index, n=5) == top_matches(query, CATALOG, n=5)
+    assert top_matches(query, index, n=len(CATALOG) + 3) == top_matches(query, CATALOG, n=len(CATALOG) + 3)
+
+
+def test_index_scores_equal_similarity_on_large_catalog():
+    names = _synthetic_catalog(2000)
+    index = CandidateIndex(names, shortlist_size=50)
+
+    for query in ["tris ph 8", "arginine", "guanidine hcl", "edta"]:
+        expected = best_match(query, names)
+        got = index.best_match(query)
+        assert got == expected
+        for m in index.top_matches(query, n=3):
+            assert m.score == similarity(query, m.candidate)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_index_equals_linear_scan_beyond_shortlist(seed):
+    names = _synthetic_catalog(1500, seed=seed)
+    # near-duplicates and names sharing no trigram with the queries, but similar letters
+    names += ["Tris HCl pH 8", "tris-hcl-ph-8", "sirt lch hp", "anclx", "lcan", "hcl"]
+    index = CandidateIndex(names, shortlist_size=20)
+    assert len(index) > index.shortlist_size
+
+    for query in ["tris ph 8", "nacl", "glycrol", "guanidine hcl", "sulfate", "ph 7", "xyz buffer", "hcl"]:
+        linear = top_matches(query, names, n=len(names))
+        for min_score in (0.72, 0.5, 0.0):
+            expected = linear[0] if linear[0].score >= min_score else None
+            assert index.best_match(query, min_score=min_score) == expected
+        for n in (1, 5, 30):
+            assert index.top_matches(query, n=n) == linear[:n]
+
+
+def test_index_short_query_falls_back_to_full_scan():
+    index = CandidateIndex(CATALOG)
+    assert index.top_matches("k", n=3) == top_matches("k", CATALOG, n=3)
+
+
+def test_empty_index():
+    index = CandidateIndex([])
+    assert len(index) == 0
+    assert index.best_match("nacl") is None
+    assert index.top_matches("nacl") == []
+
+
+def test_complete_ranks_exact_then_prefix_then_fuzzy():
+    index = CandidateIndex(CATALOG + ["Tris"])
+    names = [m.candidate for m in index.complete("tris", n=4)]
+    assert names == ["Tris", "Tris-HCl pH=8", "Tris-HCl pH 7.5"]
+
+    # no prefix hit: falls through to fuzzy scores
+    fuzzy = index.complete("glycerl")
+    assert fuzzy[0].candidate == "Glycerol"
+    assert fuzzy[0].score == similarity("glycerl", "Glycerol")
+
+
+def test_complete_short_query_uses_prefix_only():
+    index = CandidateIndex(CATALOG)
+    got = index.complete("t", n=3)
+    assert len(got) == 3
+    assert all(normalize_name(m.candidate).startswith("t") for m in got)
+    assert index.complete("") == []
+    assert index.complete("zz") == []
+
+
+def test_index_add_remove_matches_a_fresh_index():
+    rng = random.Random(7)
+    index = CandidateIndex(CATALOG)
+    pool = CATALOG + ["HEPES pH 7.4", "DTT 1M", "Tris base", "NaCl 5M", "EDTA pH 8"]
+    for _ in range(40):
+        present = index.candidates
+        if present and rng.random() < 0.5:
+            index.remove(rng.sample(present, min(2, len(present))))
+        else:
+            index.add([n for n in rng.sample(pool, 2) if n not in present])
+        fresh = CandidateIndex(list(index.candidates))
+        for q in ["tris", "nacl", "hepes 7", "gly", "edta ph8"]:
+            assert index.top_matches(q, n=3) == fresh.top_matches(q, n=3)
+            assert index.complete(q) == fresh.complete(q)
+            assert index.containing(normalize_name(q)) == fresh.containing(normalize_name(q))
+
+    copy = index.copy()
+    copy.remove(copy.candidates[:1])
+    assert len(copy) == len(index) - 1
+
+
+def test_index_updates_keep_catalog_order():
+    rng = random.Random(3)
+    names = list(dict.fromkeys(_synthetic_catalog(300)))
+    index = CandidateIndex(names)
+    for step in range(60):
+        gone = rng.sample(names, 5)
+        new = [f"{n} lot {step}" for n in rng.sample(names, 3)]
+        updated = index.copy()
+        updated.remove(gone)
+        updated.add(new)
+        assert index.candidates == names           # the copy's updates do not leak back
+        names = [n for n in names if n not in gone] + new
+        index = updated
+
+        fresh = CandidateIndex(names)
+        assert index.candidates == names and len(index) == len(names)
+        assert index.fingerprint == fresh.fingerprint
+        for q in ["tris", "hcl lot", "sulfate", "edta ph8", "zz"]:
+            assert index.top_matches(q, n=5) == fresh.top_matches(q, n=5)
+            assert index.complete(q) == fresh.complete(q)
+            assert index.containing(normalize_name(q)) == fresh.containing(normalize_name(q))
+
+
+def test_reindexed_follows_the_given_order():
+    index = CandidateIndex(CATALOG)
+    index.remove(["NaCl"])
+    order = ["KCl", "Tris"] + CATALOG[::-1][:5]
+    assert index.reindexed(order).candidates == order
+    assert index.reindexed(order).fingerprint == CandidateIndex(order).fingerprint
+
+
+def test_complete_ranks_every_prefix_hit():
+    # 40 long names sort before the shortest, best-scoring prefix hit
+    catalog = [f"Trisa buffer stock {i:03d}" for i in range(40)] + ["Trisz"]
+    index = CandidateIndex(catalog)
+    got = index.complete("tris", n=3)
+    assert got[0].candidate == "Trisz"
+    expected = sorted(catalog, key=lambda c: -similarity("tris", c))[:3]
+    assert [(m.candidate, m.score) for m in got] == [(c, similarity("tris", c)) for c in expected]
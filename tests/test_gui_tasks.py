@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import threading
+
+from gui_tasks import BackgroundTask, TaskCancelled
+
+
+def _drain(task):
+    task.join(5)
+    return task.poll()
+
+
+def test_task_reports_progress_then_result():
+    def work(token, progress):
+        progress("step", 0.5)
+        return 42
+
+    task = BackgroundTask(work).start()
+    events = _drain(task)
+    assert events == [("progress", ("step", 0.5)), ("done", 42)]
+    assert not task.running
+
+
+def test_task_error_is_delivered_not_raised():
+    def work(token, progress):
+        raise ValueError("bad sheet")
+
+    events = _drain(BackgroundTask(work).start())
+    kind, exc = events[-1]
+    assert kind == "error"
+    assert isinstance(exc, ValueError) and str(exc) == "bad sheet"
+
+
+def test_cancel_between_stages():
+    gate = threading.Event()
+    reached = []
+
+    def work(token, progress):
+        gate.wait(5)
+        token.check()
+        reached.append(True)
+        return "late"
+
+    task = BackgroundTask(work).start()
+    assert task.running
+    task.cancel()
+    gate.set()
+    assert _drain(task) == [("cancelled", None)]
+    assert reached == []
+
+
+def test_result_after_cancel_is_dropped():
+    gate = threading.Event()
+
+    def work(token, progress):
+        gate.wait(5)
+        return "ignored"
+
+    task = BackgroundTask(work).start()
+    task.cancel()
+    gate.set()
+    assert _drain(task) == [("cancelled", None)]
+
+
+def test_token_check_raises():
+    task = BackgroundTask(lambda t, p: None)
+    task.cancel()
+    try:
+        task.token.check()
+    except TaskCancelled:
+        pass
+    else:
+        raise AssertionError("expected TaskCancelled")
+
+
+def test_checking_progress_raises_once_cancelled():
+    events = []
+    task = BackgroundTask(lambda t, p: None)
+    report = task.token.checking(lambda message, fraction: events.append((message, fraction)))
+    report("stage 1", 0.5)
+    task.cancel()
+    try:
+        report("stage 2", None)
+    except TaskCancelled:
+        pass
+    else:
+        raise AssertionError("expected TaskCancelled")
+    assert events == [("stage 1", 0.5)]
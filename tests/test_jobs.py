@@ -0,0 +1,116 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import csv
+import io
+import json
+
+import pytest
+
+from stocks_io import StockItem
+from units import parse_concentration
+from calculator import TargetComponent, compute_recipe
+from export import recipe_to_dict
+from jobs import RecipeJob, export_outcomes_xlsx, iter_jobs, parse_target_spec, run_jobs, write_outcomes
+
+
+STOCKS = {
+    "Tris-HCl": StockItem(name="Tris-HCl", type="stock_solution", concentration=parse_concentration(1.0, "M")),
+    "NaCl": StockItem(name="NaCl", type="powder", mw_g_per_mol=58.44),
+}
+
+JOB_LINES = [
+    json.dumps({"id": "a", "targets": ["Tris-HCl,50,mM", ["NaCl", 150, "mM"]], "final_volume": 100}),
+    "",
+    json.dumps({"id": "b", "targets": [{"name": "KCl", "value": 1, "unit": "mM"}], "final_volume": 10}),
+    "{not json",
+    json.dumps({"targets": [{"name": "NaCl", "value": 1}], "final_volume": 10}),
+    json.dumps({"id": "c", "targets": ["NaCl,1,M"], "final_volume": 500, "final_unit": "uL", "mass_unit": "ug"}),
+]
+
+
+def test_parse_target_spec_forms():
+    expected = TargetComponent("NaCl", 150.0, "mM")
+    assert parse_target_spec("NaCl, 150, mM") == expected
+    assert parse_target_spec(["NaCl", "150", "mM"]) == expected
+    assert parse_target_spec({"name": "NaCl", "value": 150, "unit": "mM"}) == expected
+    with pytest.raises(ValueError):
+        parse_target_spec("NaCl,150")
+
+
+def test_iter_jobs_reports_bad_lines_inline():
+    items = list(iter_jobs(JOB_LINES, defaults={"vol_unit": "mL"}))
+
+    assert [getattr(i, "job_id") for i in items] == ["a", "b", "4", "5", "c"]
+    assert isinstance(items[0], RecipeJob)
+    assert items[0].output_volume_unit == "mL"
+    assert items[2].error.startswith("Invalid JSON")
+    assert "missing 'unit'" in items[3].error
+
+
+def test_run_jobs_streams_jsonl_and_keeps_going():
+    out = io.StringIO()
+    counts = write_outcomes(run_jobs(STOCKS, iter_jobs(JOB_LINES)), out, fmt="jsonl")
+
+    assert counts == {"jobs": 5, "failed": 3}
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["ok"] for r in records] == [True, False, False, False, True]
+    assert records[1]["error"] == "Component 'KCl' not found in stocks."
+
+    expected = compute_recipe(
+        STOCKS, [TargetComponent("NaCl", 1, "M")], 500, final_volume_unit="uL", output_mass_unit="ug",
+    )
+    assert records[4]["recipe"] == recipe_to_dict(expected)
+
+
+def test_run_jobs_csv_rows():
+    out = io.StringIO()
+    write_outcomes(run_jobs(STOCKS, iter_jobs(JOB_LINES[:3])), out, fmt="csv")
+
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert [r["job_id"] for r in rows] == ["a", "a", "a", "b"]
+    assert rows[1]["name"] == "NaCl"
+    assert rows[3]["error"] == "Component 'KCl' not found in stocks."
+
+
+def test_export_outcomes_xlsx_matches_csv_rows(tmp_path):
+    from openpyxl import load_workbook
+
+    out = io.StringIO()
+    write_outcomes(run_jobs(STOCKS, iter_jobs(JOB_LINES[:3])), out, fmt="csv")
+    expected = list(csv.reader(io.StringIO(out.getvalue())))
+
+    path = str(tmp_path / "jobs.xlsx")
+    counts = export_outcomes_xlsx(run_jobs(STOCKS, iter_jobs(JOB_LINES[:3])), path)
+    rows = list(load_workbook(path)["jobs"].iter_rows(values_only=True))
+    assert counts == {"jobs": 2, "failed": 1}
+
+    def cell(v):
+        v = "" if v is None else v
+        try:
+            return float(v)
+        except ValueError:
+            return v
+
+    assert [[cell(v) for v in r] for r in rows] == [[cell(v) for v in r] for r in expected]
+
+
+def test_run_jobs_is_lazy():
+    def _lines():
+        yield JOB_LINES[0]
+        raise RuntimeError("input must not be read ahead")
+
+    outcomes = run_jobs(STOCKS, iter_jobs(_lines()))
+    assert next(outcomes).ok
+
+
+def test_failed_outcomes_xlsx_export_leaves_no_file(tmp_path):
+    def outcomes():
+        yield from run_jobs(STOCKS, iter_jobs(JOB_LINES[:2]))
+        raise RuntimeError("interrupted")
+
+    path = tmp_path / "jobs.xlsx"
+    with pytest.raises(RuntimeError):
+        export_outcomes_xlsx(outcomes(), str(path))
+    assert not path.exists()
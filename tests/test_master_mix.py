@@ -0,0 +1,159 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import random
+
+import pytest
+
+from stocks_io import StockItem, compile_stock
+from units import parse_concentration, to_grams, to_liters
+from calculator import BRING_TO_VOLUME_NAME, TargetComponent, _target_unit, compute_recipe
+from master_mix import plan_master_mixes
+
+
+STOCKS = {
+    "Tris-HCl": StockItem("Tris-HCl", "stock_solution", parse_concentration(1.0, "M")),
+    "NaCl": StockItem("NaCl", "stock_solution", parse_concentration(5.0, "M")),
+    "MgCl2": StockItem("MgCl2", "stock_solution", parse_concentration(1.0, "M")),
+    "DTT": StockItem("DTT", "powder", mw_g_per_mol=154.25, purity_fraction=0.98),
+    "BSA": StockItem("BSA", "stock_solution", parse_concentration(20, "mg/mL")),
+    "Glycerol": StockItem("Glycerol", "stock_solution", parse_concentration(50, "%v/v")),
+    "PBS": StockItem("PBS", "stock_solution", parse_concentration(10, "X")),
+}
+
+BASE = [
+    TargetComponent("Tris-HCl", 50, "mM"),
+    TargetComponent("NaCl", 150, "mM"),
+    TargetComponent("DTT", 1, "mM"),
+]
+
+
+def _variants(n, seed=0):
+    rng = random.Random(seed)
+    sets = []
+    for i in range(n):
+        ts = list(BASE)
+        ts.append(TargetComponent("MgCl2", rng.choice([1, 2, 5, 10]), "mM"))
+        if i % 2:
+            ts += [TargetComponent("BSA", 0.1, "mg/mL"), TargetComponent("Glycerol", 5, "%v/v")]
+        if i % 7 == 0:
+            ts.append(TargetComponent("PBS", 1, "X"))
+        sets.append(ts)
+    return sets
+
+
+def _final_concentrations(amounts, volume_L):
+    """Concentration of every component (base units) from delivered stock volumes (uL) / masses (mg)."""
+    out = {}
+    for name, amount in amounts.items():
+        item = compile_stock(STOCKS[name])
+        if item.type == "powder":
+            out[name] = to_grams(amount, "mg") * item.purity_fraction / item.mw_g_per_mol / volume_L
+        else:
+            out[name] = to_liters(amount, "uL") * item.conc_base / volume_L
+    return out
+
+
+def _targets_base(targets):
+    out = {}
+    for t in targets:
+        out[t.name] = out.get(t.name, 0.0) + t.final_value * _target_unit(t.final_unit).factor
+    return out
+
+
+def test_final_concentrations_match_direct_preparation():
+    sets = _variants(300)
+    volumes = [100 + 10 * (i % 5) for i in range(len(sets))]
+    plan = plan_master_mixes(STOCKS, sets, volumes, "uL")
+
+    assert plan.mixes, "the shared Tris/NaCl/DTT core should become a master mix"
+    assert plan.steps < plan.direct_steps
+    for i, (targets, volume) in enumerate(zip(sets, volumes)):
+        direct = compute_recipe(STOCKS, targets, volume, "uL")
+        expected = {l.name: l.add_mass_value if l.add_mass_value is not None else l.add_volume_value
+                    for l in direct.lines if l.name != BRING_TO_VOLUME_NAME}
+        delivered = plan.delivered(i)
+        assert delivered == pytest.approx(expected, rel=1e-12)
+
+        conc = _final_concentrations(delivered, volume * 1e-6)
+        assert conc == pytest.approx(_targets_base(targets), rel=1e-12)
+
+        recipe = plan.variant_recipe(i)
+        added = sum(l.add_volume_value for l in recipe.lines if l.add_volume_value is not None)
+        assert added == pytest.approx(volume, rel=1e-12)
+
+
+def test_core_mix_is_shared_by_all_variants():
+    sets = _variants(20)
+    plan = plan_master_mixes(STOCKS, sets, 100, "uL", overage=0.0)
+
+    core = next(m for m in plan.mixes if len(m.variants) == 20)
+    assert {t.name for t in core.targets} == {"Tris-HCl", "NaCl", "DTT"}
+    assert core.factor == 10.0
+    assert core.recipe.final_volume_value == pytest.approx(20 * 100 / 10)
+    # BSA + glycerol are shared by the odd variants: a second mix
+    odd = next(m for m in plan.mixes if m.variants == list(range(1, 20, 2)))
+    assert {t.name for t in odd.targets} == {"BSA", "Glycerol"}
+    assert odd.factor == 5.0   # 10X glycerol would be 50% v/v, i.e. the undiluted stock plus BSA
+    recipe = plan.variant_recipe(1)
+    assert [l.source_type for l in recipe.lines[:2]] == ["master_mix", "master_mix"]
+    assert recipe.lines[0].add_volume_value == pytest.approx(10.0)
+    assert recipe.lines[1].add_volume_value == pytest.approx(20.0)
+
+
+def test_overage_scales_mix_but_not_additions():
+    sets = _variants(10)
+    plain = plan_master_mixes(STOCKS, sets, 100, "uL", overage=0.0)
+    extra = plan_master_mixes(STOCKS, sets, 100, "uL", overage=0.2)
+    assert extra.mixes[0].recipe.final_volume_value == pytest.approx(plain.mixes[0].recipe.final_volume_value * 1.2)
+    assert extra.variant_recipe(3) == plain.variant_recipe(3)
+
+
+def test_mix_that_would_overfill_is_skipped():
+    # 40% glycerol from a 50% stock leaves no room for a 2X mix
+    sets = [[TargetComponent("Glycerol", 40, "%v/v"), TargetComponent("NaCl", 100, "mM")] for _ in range(5)]
+    plan = plan_master_mixes(STOCKS, sets, 100, "uL")
+    assert plan.mixes == []
+    assert plan.delivered(0) == pytest.approx({"Glycerol": 80.0, "NaCl": 2.0})
+
+
+def test_unshared_variants_have_no_mixes_and_errors_match_direct():
+    sets = [[TargetComponent("Tris-HCl", 10 * (i + 1), "mM")] for i in range(3)]
+    plan = plan_master_mixes(STOCKS, sets, 50, "uL")
+    assert plan.mixes == [] and plan.steps == plan.direct_steps
+
+    with pytest.raises(KeyError, match="Nope"):
+        plan_master_mixes(STOCKS, [[TargetComponent("Nope", 1, "mM")]], 50, "uL")
+
+
+def test_scales_to_thousands_of_variants():
+    sets = _variants(5000, seed=1)
+    plan = plan_master_mixes(STOCKS, sets, 200, "uL")
+    assert len(plan) == 5000
+    assert plan.steps < 0.6 * plan.direct_steps
+    i = 4321
+    direct = compute_recipe(STOCKS, sets[i], 200, "uL")
+    expected = {l.name: l.add_mass_value if l.add_mass_value is not None else l.add_volume_value
+                for l in direct.lines if l.name != BRING_TO_VOLUME_NAME}
+    assert plan.delivered(i) == pytest.approx(expected, rel=1e-12)
+
+
+def test_same_value_in_different_unit_kinds_is_not_merged():
+    # 1 mM and 1 mg/L are both 1e-3 in base units (M, g/L); they must stay separate components
+    stocks = {
+        "NaCl": StockItem("NaCl", "powder", mw_g_per_mol=58.44),
+        "KCl": StockItem("KCl", "powder", mw_g_per_mol=74.55),
+    }
+    sets = [
+        [TargetComponent("NaCl", 1, "mM"), TargetComponent("KCl", 1, "mM")],
+        [TargetComponent("NaCl", 1, "mg/L"), TargetComponent("KCl", 1, "mM")],
+    ]
+    plan = plan_master_mixes(stocks, sets, 100, "uL")
+
+    for i, targets in enumerate(sets):
+        direct = compute_recipe(stocks, targets, 100, "uL")
+        expected = {l.name: l.add_mass_value for l in direct.lines if l.name != BRING_TO_VOLUME_NAME}
+        delivered = plan.delivered(i)
+        assert delivered == pytest.approx(expected, rel=1e-12)
+        assert all(type(v) is float for v in delivered.values())
@@ -0,0 +1,102 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import json
+
+from fuzzy_match import CandidateIndex, best_match, top_matches
+from match_cache import MatchCache
+
+
+CATALOG = ["Tris-HCl pH=8", "Tris-HCl pH 7.5", "NaCl", "KCl", "MgCl2", "Glycerol", "EDTA"]
+
+
+def test_results_match_uncached_and_repeat_queries_hit():
+    cache = MatchCache()
+    index = CandidateIndex(CATALOG)
+    for query in ["tris ph 8", "nacl", "glycerl", "zzz"]:
+        assert cache.best_match(query, index) == best_match(query, index)
+        assert cache.top_matches(query, CATALOG, n=3) == top_matches(query, CATALOG, n=3)
+    assert cache.misses == 8 and cache.hits == 0
+
+    # same normalized query, different spelling: served from the cache
+    m = cache.best_match("Tris_pH 8", index)
+    assert cache.hits == 1
+    assert m.query == "Tris_pH 8" and m == best_match("Tris_pH 8", index)
+
+
+def test_threshold_applies_to_cached_best():
+    cache = MatchCache()
+    assert cache.best_match("glycerl", CATALOG, min_score=0.99) is None
+    assert cache.best_match("glycerl", CATALOG, min_score=0.5).candidate == "Glycerol"
+    assert cache.hits == 1
+
+
+def test_lru_eviction():
+    cache = MatchCache(max_entries=2)
+    cache.best_match("nacl", CATALOG)
+    cache.best_match("kcl", CATALOG)
+    cache.best_match("nacl", CATALOG)      # refresh nacl
+    cache.best_match("edta", CATALOG)      # evicts kcl
+    assert len(cache) == 2
+    hits = cache.hits
+    cache.best_match("nacl", CATALOG)
+    assert cache.hits == hits + 1
+    cache.best_match("kcl", CATALOG)
+    assert cache.hits == hits + 1
+
+
+def test_changed_catalog_invalidates():
+    cache = MatchCache()
+    assert cache.best_match("nacl", CATALOG).candidate == "NaCl"
+    renamed = [c if c != "NaCl" else "Sodium chloride" for c in CATALOG]
+    m = cache.best_match("nacl", renamed, min_score=0.0)
+    assert m == best_match("nacl", renamed, min_score=0.0)
+    assert cache.hits == 0 and len(cache) == 2
+
+    # entries of the previous catalog are still there when it comes back
+    assert cache.best_match("nacl", CandidateIndex(CATALOG)).candidate == "NaCl"
+    assert cache.hits == 1
+
+
+def test_plain_catalog_is_hashed_once(monkeypatch):
+    import match_cache
+
+    calls = []
+    real = match_cache.catalog_fingerprint
+    monkeypatch.setattr(match_cache, "catalog_fingerprint", lambda names: calls.append(1) or real(names))
+    cache = MatchCache()
+    for query in ["nacl", "kcl", "tris"]:
+        cache.best_match(query, list(CATALOG))
+        cache.top_matches(query, tuple(CATALOG), n=2)
+    assert len(calls) == 1
+
+    names = list(CATALOG)
+    cache.best_match("nacl", names)
+    names.append("HEPES")                  # edited in place: hashed again
+    assert cache.best_match("hepes", names).candidate == "HEPES"
+    assert len(calls) == 2
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = str(tmp_path / "sub" / "matches.json")
+    cache = MatchCache()
+    cache.best_match("tris ph 8", CATALOG)
+    cache.top_matches("nacl", CATALOG, n=2)
+    cache.save(path)
+
+    restored = MatchCache.load(path)
+    assert len(restored) == 2
+    assert restored.top_matches("nacl", CATALOG, n=2) == top_matches("nacl", CATALOG, n=2)
+    assert restored.best_match("tris ph 8", CATALOG) == best_match("tris ph 8", CATALOG)
+    assert restored.hits == 2 and restored.misses == 0
+
+
+def test_load_ignores_bad_files(tmp_path):
+    assert len(MatchCache.load(str(tmp_path / "missing.json"))) == 0
+    bad = tmp_path / "bad.json"
+    bad.write_text("{not json")
+    assert len(MatchCache.load(str(bad))) == 0
+    old = tmp_path / "old.json"
+    old.write_text(json.dumps({"version": -1, "entries": [["x", "best", "q", 1, []]]}))
+    assert len(MatchCache.load(str(old))) == 0
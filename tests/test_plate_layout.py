@@ -0,0 +1,129 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import io
+
+import pytest
+
+from stocks_io import StockItem
+from units import parse_concentration
+from calculator import BRING_TO_VOLUME_NAME, TargetComponent, compute_recipe
+from plate_layout import (
+    PLATE_WELL_FIELDS,
+    compute_plate,
+    export_plate,
+    parse_well,
+    read_plate_layout,
+    write_plate_wells,
+)
+
+
+STOCKS = {
+    "Tris-HCl": StockItem("Tris-HCl", "stock_solution", parse_concentration(1.0, "M")),
+    "NaCl": StockItem("NaCl", "powder", mw_g_per_mol=58.44, purity_fraction=0.99),
+}
+
+LAYOUT = """plate,well,final_volume,final_unit,component,value,unit
+P1,A01,200,uL,Tris-HCl,50,mM
+P1,A01,,,NaCl,100,mM
+P1,a2,200,uL,Tris-HCl,20,mM
+P2,A1,100,uL,NaCl,150,mM
+P2,B1,100,uL,,,
+"""
+
+
+def _layout():
+    return read_plate_layout(io.StringIO(LAYOUT))
+
+
+def test_parse_well():
+    assert parse_well("a01") == "A1"
+    assert parse_well(" H12 ") == "H12"
+    assert parse_well("AF48") == "AF48"
+    with pytest.raises(ValueError):
+        parse_well("12A")
+
+
+def test_read_plate_layout_groups_rows_by_well():
+    layout = _layout()
+    assert layout.plates == ["P1", "P2"]
+    assert layout.final_volume_unit == "uL"
+    assert [(w.plate, w.well, len(w.targets)) for w in layout.wells] == [
+        ("P1", "A1", 2), ("P1", "A2", 1), ("P2", "A1", 1), ("P2", "B1", 0),
+    ]
+    assert layout.well_labels() == ["P1:A1", "P1:A2", "P2:A1", "P2:B1"]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("well,component,value,unit\nA1,NaCl,1,mM\n", "missing column(s): final_volume"),
+    ("well,final_volume,component,value,unit\nA1,,NaCl,1,mM\n", "line 2: Missing final_volume"),
+    ("well,final_volume,component,value,unit\nA1,10,NaCl,1,mM\nA1,20,NaCl,1,mM\n", "line 3: Well A1 has"),
+    ("well,final_volume,final_unit,component,value,unit\nA1,10,uL,NaCl,1,mM\nA2,1,mL,NaCl,1,mM\n", "final_unit"),
+])
+def test_read_plate_layout_errors(text, message):
+    with pytest.raises(ValueError, match=message.replace("(", r"\(").replace(")", r"\)")):
+        read_plate_layout(io.StringIO(text))
+
+
+def test_compute_plate_matches_per_well_recipes():
+    layout = _layout()
+    result = compute_plate(STOCKS, layout)
+
+    for i, w in enumerate(layout.wells):
+        expected = compute_recipe(STOCKS, w.targets, w.final_volume_value, "uL")
+        assert result.well_recipe(i) == expected
+
+    totals = {(t.plate, t.component): (t.total, t.wells) for t in result.plate_totals}
+    assert totals[("P1", "Tris-HCl")] == (pytest.approx(14.0), 2)
+    assert ("P2", "Tris-HCl") not in totals
+    assert totals[("P2", BRING_TO_VOLUME_NAME)][1] == 2
+
+    consumption = {c.component: c for c in result.consumption}
+    nacl = (0.1 * 200e-6 + 0.15 * 100e-6) * 58.44 / 0.99 * 1000
+    assert consumption["NaCl"].total == pytest.approx(nacl)
+    assert consumption["NaCl"].unit == "mg" and consumption["NaCl"].wells == 2
+    assert consumption[BRING_TO_VOLUME_NAME].total == pytest.approx(600 - 14)
+
+    # the purity warning of both NaCl wells is reported once
+    assert result.warnings == ["'NaCl': adjusted mass for purity_fraction=0.99. [P1:A1, P2:A1]"]
+
+
+def test_compute_plate_names_the_failing_well():
+    layout = read_plate_layout(io.StringIO(
+        "well,final_volume,component,value,unit\nA1,100,NaCl,1,mM\nB7,100,Glycerol,5,%\n"
+    ))
+    with pytest.raises(ValueError, match="Well B7: Component 'Glycerol' not found in stocks."):
+        compute_plate(STOCKS, layout)
+
+
+def test_write_plate_wells_and_xlsx_report(tmp_path):
+    result = compute_plate(STOCKS, _layout())
+    out = io.StringIO()
+    n = write_plate_wells(result, out)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == ",".join(PLATE_WELL_FIELDS)
+    assert n == result.matrix.nnz == len(lines) - 1
+    assert lines[1].startswith("P1,A1,Tris-HCl,10.0,uL,volume")
+
+    path = str(tmp_path / "plate.xlsx")
+    export_plate(result, path)
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    assert wb.sheetnames == ["wells", "plate_totals", "consumption"]
+    assert wb["consumption"].max_row == 1 + len(result.consumption)
+
+
+def test_failed_xlsx_report_leaves_no_file(tmp_path, monkeypatch):
+    import plate_layout
+
+    def broken(items, fields):
+        raise RuntimeError("interrupted")
+        yield
+
+    monkeypatch.setattr(plate_layout, "_total_rows", broken)
+    path = tmp_path / "plate.xlsx"
+    with pytest.raises(RuntimeError):
+        export_plate(compute_plate(STOCKS, _layout()), str(path))
+    assert not path.exists()
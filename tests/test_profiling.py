@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import io
+
+import profiling
+from stocks_io import StockItem, stocks_to_dict
+from calculator import TargetComponent, compute_recipe
+from fuzzy_match import CandidateIndex, best_match
+
+
+def _stocks():
+    return stocks_to_dict([StockItem(name="NaCl", type="powder", mw_g_per_mol=58.44)])
+
+
+def test_nothing_is_recorded_while_disabled():
+    profiling.reset()
+    compute_recipe(_stocks(), [TargetComponent("NaCl", 1, "mM")], 10)
+    with profiling.span("manual"):
+        pass
+    profiling.count("things")
+
+    assert profiling.snapshot() == {"spans": {}, "counters": {}}
+
+
+def test_session_collects_spans_and_counters():
+    out = io.StringIO()
+    with profiling.session(out=out):
+        stocks = _stocks()
+        for _ in range(3):
+            compute_recipe(stocks, [TargetComponent("NaCl", 1, "mM")], 10)
+        best_match("nacl", CandidateIndex(stocks.keys()))
+        with profiling.span("manual"):
+            pass
+
+    assert not profiling.is_enabled()
+    spans = profiling.snapshot()["spans"]
+    assert spans["compute_recipe"].count == 3
+    assert spans["stocks_to_dict"].count == 1
+    assert spans["best_match"].count == 1
+    assert spans["manual"].count == 1
+    assert profiling.snapshot()["counters"]["fuzzy.candidates_scored"] == 1
+
+    text = out.getvalue()
+    assert "PROFILE:" in text and "compute_recipe" in text
+
+
+def test_session_writes_cprofile_dump(tmp_path):
+    path = str(tmp_path / "run.prof")
+    with profiling.session(enabled=False, cprofile_path=path, out=io.StringIO()):
+        compute_recipe(_stocks(), [TargetComponent("NaCl", 1, "mM")], 10)
+
+    import pstats
+    assert pstats.Stats(path).total_calls > 0
@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import csv
+
+import numpy as np
+import pytest
+
+from stocks_io import StockItem
+from units import parse_concentration
+from calculator import BRING_TO_VOLUME_NAME, TargetComponent, compute_recipe
+from batch_calculator import compute_recipes_batch
+from recipe_matrix import MATRIX_FIELDS, export_matrix, load_npz, matrix_from_recipes
+
+
+STOCKS = {
+    "Tris-HCl": StockItem("Tris-HCl", "stock_solution", parse_concentration(1.0, "M")),
+    "NaCl": StockItem("NaCl", "powder", mw_g_per_mol=58.44),
+    "Glycerol": StockItem("Glycerol", "stock_solution", parse_concentration(50, "%v/v")),
+}
+
+
+def _target_sets(n):
+    sets = []
+    for i in range(n):
+        ts = [TargetComponent("Tris-HCl", 10 + i % 7, "mM"), TargetComponent("NaCl", 50 + i, "mM")]
+        if i % 3 == 0:
+            ts.append(TargetComponent("Glycerol", 5, "%v/v"))
+        sets.append(ts)
+    return sets
+
+
+def _expected_dense(results, components):
+    dense = np.zeros((len(components), len(results)))
+    for r, res in enumerate(results):
+        for line in res.lines:
+            v = line.add_mass_value if line.add_mass_value is not None else line.add_volume_value
+            dense[components.index(line.name), r] += v
+    return dense
+
+
+def test_matrix_from_batch_matches_recipes():
+    sets = _target_sets(10)
+    batch = compute_recipes_batch(STOCKS, sets, 1, "mL")
+    m = batch.to_matrix([f"A{i + 1}" for i in range(10)])
+
+    assert m.components == ["Tris-HCl", "NaCl", "Glycerol", BRING_TO_VOLUME_NAME]
+    assert m.quantities == ["volume", "mass", "volume", "volume"]
+    assert m.units == ["uL", "mg", "uL", "uL"]
+    assert m.shape == (4, 10)
+    assert m.nnz == 10 + 10 + 4 + 10
+
+    results = [compute_recipe(STOCKS, ts, 1, "mL") for ts in sets]
+    assert np.array_equal(m.to_dense(), _expected_dense(results, m.components))
+    assert np.array_equal(matrix_from_recipes(results).to_dense(), m.to_dense())
+
+
+def test_repeated_component_is_summed():
+    sets = [[TargetComponent("Tris-HCl", 10, "mM"), TargetComponent("Tris-HCl", 5, "mM")]]
+    m = compute_recipes_batch(STOCKS, sets, 1, "mL").to_matrix()
+    assert m.nnz == 2
+    assert m.to_dense()[0, 0] == pytest.approx(15.0)
+
+
+def test_matrix_from_recipes_rejects_mixed_units():
+    a = compute_recipe(STOCKS, [TargetComponent("NaCl", 50, "mM")], 1, output_mass_unit="mg")
+    b = compute_recipe(STOCKS, [TargetComponent("NaCl", 50, "mM")], 1, output_mass_unit="g")
+    with pytest.raises(ValueError):
+        matrix_from_recipes([a, b])
+
+
+def test_export_csv_and_npz(tmp_path):
+    m = compute_recipes_batch(STOCKS, _target_sets(6), 1, "mL").to_matrix()
+
+    written = export_matrix(m, str(tmp_path / "m.csv"))
+    with open(tmp_path / "m.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert written == m.nnz == len(rows)
+    assert list(rows[0]) == MATRIX_FIELDS
+    assert rows[0]["component"] == "Tris-HCl" and rows[0]["recipe_id"] == "1"
+
+    export_matrix(m, str(tmp_path / "m.npz"))
+    back = load_npz(str(tmp_path / "m.npz"))
+    assert back.components == m.components and back.units == m.units
+    assert back.recipe_ids == [str(i) for i in m.recipe_ids]
+    assert np.array_equal(back.to_dense(), m.to_dense())
+
+
+def test_export_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pandas as pd
+
+    m = compute_recipes_batch(STOCKS, _target_sets(4), 1, "mL").to_matrix()
+    export_matrix(m, str(tmp_path / "m.parquet"))
+    df = pd.read_parquet(tmp_path / "m.parquet")
+    assert list(df.columns) == MATRIX_FIELDS
+    assert len(df) == m.nnz
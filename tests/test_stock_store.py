@@ -0,0 +1,136 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pickle
+import subprocess
+import threading
+
+import pandas as pd
+import pytest
+
+from stocks_io import StockItem, read_stocks_xlsx, stocks_to_dict
+from stock_store import SQLiteStockStore, load_stocks_dict, open_stocks
+from units import parse_concentration
+from calculator import TargetComponent, compute_recipe
+from batch_calculator import compute_recipes_batch
+import profiling
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+ITEMS = [
+    StockItem(name="Tris-HCl pH 8", type="stock_solution", concentration=parse_concentration(1.0, "M"), notes="RT"),
+    StockItem(name="NaCl", type="powder", mw_g_per_mol=58.44, purity_fraction=0.99),
+    StockItem(name="Glycerol", type="stock_solution", concentration=parse_concentration(50, "%"), solvent="water"),
+    StockItem(name="BSA", type="stock_solution", concentration=parse_concentration(10, "mg/mL")),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SQLiteStockStore(str(tmp_path / "stocks.db"))
+    s.import_items(ITEMS)
+    return s
+
+
+def test_roundtrip_and_mapping_interface(store):
+    assert len(store) == 4
+    assert store.names() == [i.name for i in ITEMS]
+    assert store.to_dict() == stocks_to_dict(ITEMS)
+    assert store["NaCl"] == ITEMS[1]
+    assert "BSA" in store and "Nope" not in store
+    with pytest.raises(KeyError):
+        store["Nope"]
+    assert store.fetch(["BSA", "Nope", "BSA"]) == {"BSA": ITEMS[3]}
+
+
+def test_lookup_normalized(store):
+    assert store.lookup_normalized("tris_hcl  PH 8") == ["Tris-HCl pH 8"]
+    assert store.lookup_normalized("tris") == []
+
+
+def test_compute_recipe_fetches_only_referenced_stocks(store):
+    targets = [TargetComponent("Tris-HCl pH 8", 50, "mM"), TargetComponent("NaCl", 150, "mM")]
+    expected = compute_recipe(stocks_to_dict(ITEMS), targets, 100)
+
+    profiling.reset()
+    profiling.enable()
+    try:
+        assert compute_recipe(store, targets, 100) == expected
+    finally:
+        profiling.disable()
+    assert profiling.snapshot()["counters"]["stock_store.fetched"] == 2
+
+    with pytest.raises(KeyError, match="Component 'Nope' not found"):
+        compute_recipe(store, [TargetComponent("Nope", 1, "mM")], 100)
+
+    batch = compute_recipes_batch(store, [targets, targets[:1]], 100)
+    assert batch.recipe(0) == expected
+
+
+def test_merge_import_and_replace(store):
+    store.import_items([StockItem(name="KCl", type="powder", mw_g_per_mol=74.55)], replace=False)
+    assert len(store) == 5
+    # re-imported stocks are updated in place and keep their catalog position
+    diluted = StockItem(name="NaCl", type="stock_solution", concentration=parse_concentration(5, "M"))
+    store.import_items([diluted], replace=False)
+    assert store.names() == [i.name for i in ITEMS] + ["KCl"]
+    assert store["NaCl"] == diluted
+    store.import_items(ITEMS[:1])
+    assert store.names() == ["Tris-HCl pH 8"]
+
+
+def test_threads_and_pickling_share_the_file(store):
+    results = []
+
+    def read():
+        results.append(store.fetch(["NaCl"])["NaCl"])
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [ITEMS[1]] * 4
+
+    clone = pickle.loads(pickle.dumps(store))
+    assert clone.path == store.path and clone.to_dict() == store.to_dict()
+
+
+def test_store_subclass_must_implement_fetch_and_names():
+    from stock_store import StockStore
+
+    class NamesOnly(StockStore):
+        def names(self):
+            return []
+
+    with pytest.raises(TypeError, match="fetch"):
+        NamesOnly()
+
+
+def test_open_stocks_requires_existing_db(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        open_stocks(str(tmp_path / "missing.db"))
+
+
+def test_import_command_and_cli(tmp_path):
+    xlsx = str(tmp_path / "stocks.xlsx")
+    pd.DataFrame([
+        {"name": "Tris-HCl", "type": "stock_solution", "concentration_value": 1, "concentration_unit": "M"},
+        {"name": "NaCl", "type": "powder", "mw_g_per_mol": 58.44},
+    ]).to_excel(xlsx, sheet_name="stocks", index=False)
+    db = str(tmp_path / "catalog.db")
+
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "stock_store.py"), xlsx, db],
+        capture_output=True, text=True, check=True,
+    )
+    assert "Imported 2 stock items" in proc.stdout
+    assert load_stocks_dict(db) == stocks_to_dict(read_stocks_xlsx(xlsx))
+
+    proc = subprocess.run(
+        [sys.executable, os.path.join(SRC, "app_cli.py"), "--stocks", db, "--final-volume", "100",
+         "--target", "NaCl,150,mM"],
+        capture_output=True, text=True, check=True,
+    )
+    assert "NaCl: 876.6 mg" in proc.stdout
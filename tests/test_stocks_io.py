@@ -0,0 +1,112 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+import pytest
+
+from stocks_io import StockItem, read_stocks_xlsx, stocks_to_dict
+from units import parse_concentration
+
+
+def _write_stocks(path, rows, sheet_name="stocks"):
+    pd.DataFrame(rows).to_excel(path, sheet_name=sheet_name, index=False)
+    return str(path)
+
+
+def _rows():
+    return [
+        {"name": "Tris-HCl", "type": "stock_solution", "concentration_value": 1, "concentration_unit": "M",
+         "notes": "pH 8.0"},
+        {"name": None, "type": None},
+        {"name": "BSA", "type": " Stock_Solution ", "concentration_value": "10", "concentration_unit": "mg/mL"},
+        {"name": "NaCl", "type": "powder", "mw_g_per_mol": 58.44, "purity_fraction": 0.99, "solvent": "water"},
+        {"name": "Sucrose", "type": "powder"},
+    ]
+
+
+def test_read_stocks_xlsx_parses_rows(tmp_path):
+    path = _write_stocks(tmp_path / "stocks.xlsx", _rows())
+
+    items = read_stocks_xlsx(path)
+
+    assert items == [
+        StockItem(name="Tris-HCl", type="stock_solution", concentration=parse_concentration(1, "M"),
+                  notes="pH 8.0"),
+        StockItem(name="BSA", type="stock_solution", concentration=parse_concentration(10, "mg/mL")),
+        StockItem(name="NaCl", type="powder", mw_g_per_mol=58.44, purity_fraction=0.99, solvent="water"),
+        StockItem(name="Sucrose", type="powder"),
+    ]
+    assert list(stocks_to_dict(items)) == ["Tris-HCl", "BSA", "NaCl", "Sucrose"]
+
+
+def test_read_stocks_xlsx_missing_required_column(tmp_path):
+    path = _write_stocks(tmp_path / "stocks.xlsx", [{"name": "NaCl"}])
+    with pytest.raises(ValueError, match="Missing required column 'type'"):
+        read_stocks_xlsx(path)
+
+
+@pytest.mark.parametrize(
+    "bad_row, message",
+    [
+        ({"name": "X", "type": "liquid"}, "Invalid type 'liquid' for 'X'"),
+        ({"name": "X", "type": "stock_solution", "concentration_unit": "M"}, "'X' requires concentration_value"),
+        ({"name": "X", "type": "stock_solution", "concentration_value": 1, "concentration_unit": "ppm"},
+         "Unrecognized concentration unit: ppm"),
+        ({"name": "X", "type": "powder", "purity_fraction": 1.5}, "purity_fraction for 'X'"),
+    ],
+)
+def test_read_stocks_xlsx_reports_first_bad_row(tmp_path, bad_row, message):
+    rows = _rows()
+    rows.insert(3, bad_row)
+    # A later, different error must not mask the first one
+    rows.append({"name": "Y", "type": "gel"})
+    path = _write_stocks(tmp_path / "stocks.xlsx", rows)
+
+    with pytest.raises(ValueError, match=message):
+        read_stocks_xlsx(path)
+
+
+def test_read_stocks_xlsx_cache_hit_skips_parsing(tmp_path, monkeypatch):
+    path = _write_stocks(tmp_path / "stocks.xlsx", _rows())
+    cache_dir = str(tmp_path / "cache")
+
+    first = read_stocks_xlsx(path, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    def _no_parse(*args, **kwargs):
+        raise AssertionError("workbook parsed despite a cache hit")
+
+    monkeypatch.setattr(pd, "read_excel", _no_parse)
+    assert read_stocks_xlsx(path, cache_dir=cache_dir) == first
+
+
+def test_read_stocks_xlsx_cache_invalidates_on_change(tmp_path):
+    path = _write_stocks(tmp_path / "stocks.xlsx", _rows())
+    cache_dir = str(tmp_path / "cache")
+    read_stocks_xlsx(path, cache_dir=cache_dir)
+
+    rows = _rows()
+    rows[0]["concentration_value"] = 2
+    _write_stocks(tmp_path / "stocks.xlsx", rows)
+    items = read_stocks_xlsx(path, cache_dir=cache_dir)
+
+    assert items[0].concentration == parse_concentration(2, "M")
+    # The stale entry for the old content is dropped
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_read_stocks_xlsx_cache_is_per_sheet_and_survives_corruption(tmp_path):
+    path = str(tmp_path / "stocks.xlsx")
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(_rows()).to_excel(writer, sheet_name="stocks", index=False)
+        pd.DataFrame(_rows()[:1]).to_excel(writer, sheet_name="freezer", index=False)
+    cache_dir = str(tmp_path / "cache")
+
+    assert len(read_stocks_xlsx(path, cache_dir=cache_dir)) == 4
+    assert len(read_stocks_xlsx(path, sheet_name="freezer", cache_dir=cache_dir)) == 1
+
+    for entry in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, entry), "wb") as f:
+            f.write(b"not a cache file")
+    assert len(read_stocks_xlsx(path, cache_dir=cache_dir)) == 4
@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+import pytest
+
+from stocks_io import StockItem, stocks_to_dict
+from stocks_merge import StockSource, load_stock_sources, merge_stock_lists, parse_source_spec
+from units import parse_concentration
+
+
+def _item(name, molar=1.0):
+    return StockItem(name, "stock_solution", parse_concentration(molar, "M"))
+
+
+def test_parse_source_spec():
+    assert parse_source_spec("a.xlsx") == StockSource("a.xlsx", "stocks")
+    assert parse_source_spec("a.xlsx", "inv") == StockSource("a.xlsx", "inv")
+    assert parse_source_spec("a.xlsx#buffers") == StockSource("a.xlsx", "buffers")
+    assert parse_source_spec("a.xlsx#*").sheet == "*"
+    assert parse_source_spec("lab#2/a.xlsx") == StockSource("lab#2/a.xlsx", "stocks")
+    assert StockSource("cat.db", "ignored").label == "cat.db"
+
+
+@pytest.mark.parametrize("policy, kept, molar", [("first", "A", 1.0), ("last", "B", 2.0)])
+def test_merge_reports_conflicts_and_duplicates(policy, kept, molar):
+    merged = merge_stock_lists(
+        [("A", [_item("Tris"), _item("NaCl")]), ("B", [_item("Tris", 2.0), _item("NaCl"), _item("KCl")])],
+        on_conflict=policy,
+    )
+    assert list(merged.stocks) == ["Tris", "NaCl", "KCl"]
+    assert merged.stocks["Tris"].concentration.value == molar
+    assert merged.sources == {"Tris": kept, "NaCl": "A" if policy == "first" else "B", "KCl": "B"}
+    assert [c.name for c in merged.conflicting] == ["Tris"]
+    assert [c.name for c in merged.duplicates] == ["NaCl"]
+    assert merged.inputs == ["A", "B"]
+
+
+def test_default_policy_matches_stocks_to_dict():
+    items = [_item("Tris"), _item("NaCl"), _item("Tris", 2.0)]
+    merged = merge_stock_lists([("A", items[:2]), ("B", items[2:])])
+    assert merged.stocks == stocks_to_dict(items)
+
+
+def test_merge_error_policy_lists_conflicts():
+    with pytest.raises(ValueError, match="'Tris' in A, B"):
+        merge_stock_lists([("A", [_item("Tris")]), ("B", [_item("Tris", 2.0)])], on_conflict="error")
+    # identical duplicates are not an error
+    merge_stock_lists([("A", [_item("Tris")]), ("B", [_item("Tris")])], on_conflict="error")
+
+
+def test_load_stock_sources_reads_every_sheet_in_order(tmp_path):
+    path = tmp_path / "inv.xlsx"
+    with pd.ExcelWriter(path) as xw:
+        for sheet, molar in [("fridge", 1), ("freezer", 2), ("shelf", 3)]:
+            pd.DataFrame([
+                {"name": "Tris", "type": "stock_solution", "concentration_value": molar, "concentration_unit": "M"},
+                {"name": f"{sheet} only", "type": "powder"},
+            ]).to_excel(xw, sheet_name=sheet, index=False)
+
+    merged = load_stock_sources([parse_source_spec(f"{path}#*")], workers=3)
+    assert merged.inputs == [f"{path}#fridge", f"{path}#freezer", f"{path}#shelf"]
+    assert merged.stocks["Tris"].concentration.value == 3.0
+    assert merged.sources["shelf only"] == f"{path}#shelf"
+    assert merged.conflicting[0].sources == merged.inputs
+
+
+def test_load_stock_sources_names_the_failing_source(tmp_path):
+    path = tmp_path / "bad.xlsx"
+    pd.DataFrame([{"name": "X"}]).to_excel(path, sheet_name="stocks", index=False)
+    with pytest.raises(ValueError, match="bad.xlsx#stocks: Missing required column 'type'"):
+        load_stock_sources([StockSource(str(path)), StockSource(str(path))])
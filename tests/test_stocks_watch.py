@@ -0,0 +1,114 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import stocks_watch
+from gui_tasks import BackgroundTask
+from stocks_io import StockItem
+from stocks_watch import StocksWatcher, diff_stocks
+from units import parse_concentration
+
+
+def _write_stocks(path, rows):
+    pd.DataFrame(rows).to_excel(path, sheet_name="stocks", index=False)
+    # make sure the signature changes even on coarse mtime clocks
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9 * len(rows)))
+    return str(path)
+
+
+TRIS = {"name": "Tris-HCl", "type": "stock_solution", "concentration_value": 1, "concentration_unit": "M"}
+NACL = {"name": "NaCl", "type": "powder", "mw_g_per_mol": 58.44}
+KCL = {"name": "KCl", "type": "powder", "mw_g_per_mol": 74.55}
+
+
+def test_diff_stocks():
+    tris = StockItem("Tris-HCl", "stock_solution", parse_concentration(1, "M"))
+    old = {"Tris-HCl": tris, "NaCl": StockItem("NaCl", "powder", mw_g_per_mol=58.44)}
+    new = {
+        "Tris-HCl": StockItem("Tris-HCl", "stock_solution", parse_concentration(2, "M")),
+        "KCl": StockItem("KCl", "powder"),
+    }
+    diff = diff_stocks(old, new)
+    assert (diff.added, diff.removed, diff.changed) == (["KCl"], ["NaCl"], ["Tris-HCl"])
+    assert not diff_stocks(old, dict(old))
+
+
+def test_watcher_applies_only_the_changes(tmp_path):
+    path = _write_stocks(tmp_path / "stocks.xlsx", [TRIS, NACL])
+    watcher = StocksWatcher(path)
+    seen = []
+    watcher.add_listener(seen.append)
+    assert watcher.poll() is None
+
+    old_nacl = watcher.compiled["NaCl"]
+    old_index = watcher.index
+    _write_stocks(path, [dict(TRIS, concentration_value=2), NACL])
+    diff = watcher.poll()
+    assert diff.changed == ["Tris-HCl"] and not diff.added and not diff.removed
+    assert watcher.compiled["Tris-HCl"].conc_base == 2.0
+    assert watcher.compiled["NaCl"] is old_nacl      # untouched items are kept
+    assert watcher.index is old_index                # same names: index reused
+
+    _write_stocks(path, [dict(TRIS, concentration_value=2), KCL])
+    diff = watcher.poll()
+    assert (diff.added, diff.removed) == (["KCl"], ["NaCl"])
+    assert sorted(watcher.index.candidates) == ["KCl", "Tris-HCl"]
+    assert old_index.candidates == ["Tris-HCl", "NaCl"]  # copy-on-write
+    assert set(watcher.compiled) == {"Tris-HCl", "KCl"}
+    assert [d.names for d in seen] == [["Tris-HCl"], ["KCl", "NaCl"]]
+
+
+def test_watcher_index_matches_a_fresh_load(tmp_path):
+    hepes = {"name": "HEPES", "type": "stock_solution", "concentration_value": 1, "concentration_unit": "M"}
+    path = _write_stocks(tmp_path / "stocks.xlsx", [TRIS, NACL, KCL])
+    watcher = StocksWatcher(path)
+    old_index = watcher.index
+
+    for rows in ([TRIS, KCL, hepes], [hepes, TRIS, KCL], [hepes, NACL, TRIS, KCL]):
+        _write_stocks(path, rows)
+        watcher.poll()
+        fresh = StocksWatcher(path)
+        assert watcher.index.candidates == fresh.index.candidates == [r["name"] for r in rows]
+        assert watcher.index.fingerprint == fresh.index.fingerprint
+        assert list(watcher.compiled) == list(fresh.compiled)
+    assert old_index.candidates == ["Tris-HCl", "NaCl", "KCl"]
+
+
+def test_watcher_keeps_stocks_when_reload_fails(tmp_path):
+    path = _write_stocks(tmp_path / "stocks.xlsx", [TRIS])
+    watcher = StocksWatcher(path)
+    _write_stocks(path, [{"name": "Broken", "type": "stock_solution"}])
+    with pytest.raises(ValueError):
+        watcher.poll()
+    assert list(watcher.stocks) == ["Tris-HCl"]
+
+
+def test_cancel_during_load_stops_before_the_next_stage(tmp_path, monkeypatch):
+    path = _write_stocks(tmp_path / "stocks.xlsx", [TRIS, NACL])
+    reading, release = threading.Event(), threading.Event()
+    compiled = []
+    real_load = stocks_watch.load_stocks_dict
+
+    def slow_load(*args, **kwargs):
+        reading.set()
+        release.wait(5)
+        return real_load(*args, **kwargs)
+
+    monkeypatch.setattr(stocks_watch, "load_stocks_dict", slow_load)
+    monkeypatch.setattr(stocks_watch, "compile_stocks", lambda *a, **k: compiled.append(True))
+
+    task = BackgroundTask(lambda token, progress: StocksWatcher(path, progress=token.checking(progress))).start()
+    assert reading.wait(5)
+    task.cancel()          # arrives while the workbook is being read
+    release.set()
+    task.join(5)
+    events = task.poll()
+    assert events[0] == ("progress", ("Reading stocks", None))
+    assert events[-1] == ("cancelled", None)
+    assert compiled == []
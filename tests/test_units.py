@@ -16,6 +16,9 @@ from units import (
     volvol_to_fraction,
     fraction_to_volvol,
     parse_concentration,
+    lookup_unit,
+    conversion_factor,
+    convert,
 )
 
 
@@ -87,3 +90,35 @@ def test_unsupported_units_raise():
 
     with pytest.raises(ValueError):
         parse_concentration(1, "weird_unit")
+
+
+def test_unit_registry_interns_spellings():
+    assert lookup_unit("mM") is lookup_unit(" mm ")
+    assert lookup_unit("µg/mL") is lookup_unit("ug/ml")
+    assert lookup_unit("% w/v") is lookup_unit("%w/v")
+    assert lookup_unit("mM").dimension == "molar"
+    assert lookup_unit("furlongs") is None
+
+
+def test_conversion_factor_between_compatible_units():
+    assert conversion_factor("M", "mM") == pytest.approx(1e3)
+    assert conversion_factor("mg/mL", "ug/mL") == pytest.approx(1e3)
+    assert convert(2, "% w/v", "mg/mL") == pytest.approx(20.0)   # 2 g/100 mL = 20 g/L
+    assert convert(250, "mmol/kg", "mol/kg") == pytest.approx(0.25)
+    with pytest.raises(ValueError):
+        conversion_factor("mM", "mg/mL")
+    with pytest.raises(ValueError):
+        conversion_factor("mL", "nonsense")
+
+
+def test_parse_concentration_new_dimensions():
+    fold = parse_concentration(10, "X")
+    assert (fold.kind, fold.as_base()) == ("fold", 10.0)
+    wv = parse_concentration(5, "% w/v")
+    assert wv.kind == "massvol"
+    assert wv.as_g_per_L() == pytest.approx(50.0)
+    molal = parse_concentration(500, "mmol/kg")
+    assert molal.kind == "molal"
+    assert molal.as_base() == pytest.approx(0.5)
+    # a bare % stays v/v
+    assert parse_concentration(10, "%").kind == "volvol"